@@ -30,8 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +73,8 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+# Lets the frontend read per-stage timings from fetch() responses
+CORS_EXPOSE_HEADERS = ['server-timing']
 
 ROOT_URLCONF = 'agam.urls'
 
@@ -162,15 +165,160 @@ REST_FRAMEWORK = {
     ],
 }
 
-# File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 26214400  # 25MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 26214400  # 25MB
-FILE_UPLOAD_PERMISSIONS = 0o644
-
 # Temporary file directory
 TEMP_DIR = os.path.join(MEDIA_ROOT, 'temp')
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# File upload settings
+# Uploads are streamed straight to temp files (hashed on the way in) instead of
+# being buffered in memory, so worker memory does not grow with the size limits.
+FILE_UPLOAD_HANDLERS = ['api.upload_handlers.HashingTemporaryFileUploadHandler']
+# Same filesystem as TEMP_DIR, so uploads can be hard-linked into place
+FILE_UPLOAD_TEMP_DIR = os.path.join(TEMP_DIR, 'uploads')
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB, only used if an in-memory handler is configured
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB of non-file form data
+FILE_UPLOAD_PERMISSIONS = 0o644
+
+# Upload size limits enforced by the API
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', str(25 * 1024 * 1024)))  # per file
+MAX_MERGE_UPLOAD_SIZE = int(os.getenv('MAX_MERGE_UPLOAD_SIZE', str(50 * 1024 * 1024)))  # per merge request
+MAX_BATCH_UPLOAD_SIZE = int(os.getenv('MAX_BATCH_UPLOAD_SIZE', str(200 * 1024 * 1024)))  # per batch request
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '50'))
+
+# Concurrent conversions per batch request (api/batch/)
+BATCH_CONVERSION_WORKERS = int(os.getenv('BATCH_CONVERSION_WORKERS', '4'))
+
+# Pipelines (api/pipeline/): maximum steps, and steps run concurrently per request
+PIPELINE_MAX_STEPS = int(os.getenv('PIPELINE_MAX_STEPS', '20'))
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '4'))
+
+# How converted files are sent to clients:
+# 'django' streams them from the worker (sendfile under gunicorn), 'x-accel-redirect'
+# hands them to nginx and 'x-sendfile' to Apache/lighttpd.
+FILE_DELIVERY_BACKEND = os.getenv('FILE_DELIVERY_BACKEND', 'django')
+# Internal nginx location that maps to MEDIA_ROOT (for x-accel-redirect)
+FILE_DELIVERY_ACCEL_PREFIX = os.getenv('FILE_DELIVERY_ACCEL_PREFIX', '/protected-media/')
+# Temp outputs handed to the fronting server are removed after this many seconds
+FILE_DELIVERY_TEMP_TTL = int(os.getenv('FILE_DELIVERY_TEMP_TTL', '600'))
+FILE_DELIVERY_SWEEP_INTERVAL = int(os.getenv('FILE_DELIVERY_SWEEP_INTERVAL', '60'))
+
+# Explicit path to the LibreOffice executable (otherwise searched on PATH and common locations)
+LIBREOFFICE_PATH = os.getenv('LIBREOFFICE_PATH')
+
+# LibreOffice worker pool (warm headless instances used by convert_to_pdf)
+# LIBREOFFICE_POOL_SIZE is per gunicorn worker; set LIBREOFFICE_POOL_HOST_SIZE to
+# share a fixed number of instances across all workers on the host instead.
+LIBREOFFICE_POOL_SIZE = int(os.getenv('LIBREOFFICE_POOL_SIZE', '1'))
+LIBREOFFICE_POOL_HOST_SIZE = int(os.getenv('LIBREOFFICE_POOL_HOST_SIZE', '0'))
+LIBREOFFICE_POOL_MAX_JOBS = int(os.getenv('LIBREOFFICE_POOL_MAX_JOBS', '200'))  # Recycle an instance after N jobs
+LIBREOFFICE_POOL_START_TIMEOUT = int(os.getenv('LIBREOFFICE_POOL_START_TIMEOUT', '60'))  # Seconds
+LIBREOFFICE_POOL_ACQUIRE_TIMEOUT = int(os.getenv('LIBREOFFICE_POOL_ACQUIRE_TIMEOUT', '120'))  # Seconds
+
+# Batch conversions run one soffice process per group of office documents
+LIBREOFFICE_BATCH_SIZE = int(os.getenv('LIBREOFFICE_BATCH_SIZE', '20'))  # Files per soffice run
+LIBREOFFICE_BATCH_TIMEOUT = int(os.getenv('LIBREOFFICE_BATCH_TIMEOUT', '600'))  # Seconds per soffice run
+
+# Conversion result cache (content-addressed, shared by all workers on the host)
+CONVERSION_CACHE_ENABLED = os.getenv('CONVERSION_CACHE_ENABLED', 'True') == 'True'
+CONVERSION_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache')
+CONVERSION_CACHE_MAX_BYTES = int(os.getenv('CONVERSION_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))  # 1GB
+CONVERSION_CACHE_VERSION = '1'  # Bump to invalidate cached results after converter changes
+# Seconds an identical request waits for an in-flight conversion before converting itself
+CONVERSION_SINGLE_FLIGHT_TIMEOUT = int(os.getenv('CONVERSION_SINGLE_FLIGHT_TIMEOUT', '600'))
+
+# Import the conversion libraries when a server process starts rather than on first use
+PRELOAD_CONVERTERS = os.getenv('PRELOAD_CONVERTERS', 'False') == 'True'
+
+# Parallel PDF to DOCX conversion for large documents
+PDF_TO_DOCX_PARALLEL_THRESHOLD = int(os.getenv('PDF_TO_DOCX_PARALLEL_THRESHOLD', '50'))  # Pages
+PDF_TO_DOCX_WORKERS = int(os.getenv('PDF_TO_DOCX_WORKERS', '0'))  # Processes, 0 = one per CPU core
+
+# Parallel text extraction for large PDFs
+PDF_TO_TXT_PARALLEL_THRESHOLD = int(os.getenv('PDF_TO_TXT_PARALLEL_THRESHOLD', '200'))  # Pages
+PDF_TO_TXT_WORKERS = int(os.getenv('PDF_TO_TXT_WORKERS', '0'))  # Processes, 0 = one per CPU core
+
+# PDF to PPTX rendering
+PDF_TO_PPTX_DPI = int(os.getenv('PDF_TO_PPTX_DPI', '150'))
+PDF_TO_PPTX_IMAGE_FORMAT = os.getenv('PDF_TO_PPTX_IMAGE_FORMAT', 'png')  # 'png' or 'jpeg'
+PDF_TO_PPTX_JPEG_QUALITY = int(os.getenv('PDF_TO_PPTX_JPEG_QUALITY', '85'))
+# Below this a page pool costs more than it saves: a page renders in 0.02-0.3s, while a
+# spawned/forkserver worker takes ~0.6s of CPU to start (see README, Benchmarks)
+PDF_TO_PPTX_PARALLEL_THRESHOLD = int(os.getenv('PDF_TO_PPTX_PARALLEL_THRESHOLD', '32'))  # Pages
+PDF_TO_PPTX_WORKERS = int(os.getenv('PDF_TO_PPTX_WORKERS', '0'))  # Processes, 0 = one per CPU core
+
+# Time budgets in seconds; an operation that runs longer is stopped and its subprocesses killed
+CONVERSION_TIME_BUDGETS = {
+    'convert_to_pdf': int(os.getenv('CONVERT_TO_PDF_TIME_BUDGET', '180')),
+    'pdf_to_docx': int(os.getenv('PDF_TO_DOCX_TIME_BUDGET', '900')),
+    'pdf_to_txt': int(os.getenv('PDF_TO_TXT_TIME_BUDGET', '300')),
+    'pdf_to_pptx': int(os.getenv('PDF_TO_PPTX_TIME_BUDGET', '600')),
+    'merge_files': int(os.getenv('MERGE_FILES_TIME_BUDGET', '600')),
+    'merge_images_to_pdf': int(os.getenv('MERGE_IMAGES_TO_PDF_TIME_BUDGET', '300')),
+}
+CANCELLATION_CHECK_INTERVAL = float(os.getenv('CANCELLATION_CHECK_INTERVAL', '0.5'))  # Seconds between checks while blocked
+JOB_CANCEL_POLL_INTERVAL = float(os.getenv('JOB_CANCEL_POLL_INTERVAL', '1'))  # Seconds between checks for a cancelled job
+
+# Conversion executor: worker processes that conversions are handed to, so request threads stay free
+CONVERSION_EXECUTOR_ENABLED = os.getenv('CONVERSION_EXECUTOR_ENABLED', 'True') == 'True'
+CONVERSION_EXECUTOR_WORKERS = int(os.getenv('CONVERSION_EXECUTOR_WORKERS', '0'))  # Processes per web process, 0 = one per CPU core
+CONVERSION_EXECUTOR_MAX_TASKS = int(os.getenv('CONVERSION_EXECUTOR_MAX_TASKS', '500'))  # Replace the workers after N tasks, 0 = never
+CONVERSION_EXECUTOR_TASK_WORKERS = int(os.getenv('CONVERSION_EXECUTOR_TASK_WORKERS', '1'))  # Page-pool processes per executor task, 1 = none
+CONVERSION_EXECUTOR_DIR = os.path.join(MEDIA_ROOT, 'executor')
+# Operations run in the executor; convert_to_pdf mostly waits on LibreOffice, so it stays in the request thread
+CONVERSION_EXECUTOR_OPERATIONS = os.getenv(
+    'CONVERSION_EXECUTOR_OPERATIONS', 'pdf_to_docx,pdf_to_txt,pdf_to_pptx,merge_files,merge_images_to_pdf'
+).split(',')
+# Conversions of each operation running at once per web process, 0 = no limit of its own
+CONVERSION_CONCURRENCY_LIMITS = {
+    'convert_to_pdf': int(os.getenv('CONVERT_TO_PDF_CONCURRENCY', '4')),
+    'pdf_to_docx': int(os.getenv('PDF_TO_DOCX_CONCURRENCY', '2')),
+    'pdf_to_txt': int(os.getenv('PDF_TO_TXT_CONCURRENCY', '4')),
+    'pdf_to_pptx': int(os.getenv('PDF_TO_PPTX_CONCURRENCY', '2')),
+    'merge_files': int(os.getenv('MERGE_FILES_CONCURRENCY', '2')),
+    'merge_images_to_pdf': int(os.getenv('MERGE_IMAGES_TO_PDF_CONCURRENCY', '2')),
+}
+# Seconds a request waits for a free slot before it is turned away with 503
+CONVERSION_QUEUE_TIMEOUT = int(os.getenv('CONVERSION_QUEUE_TIMEOUT', '60'))
+
+# Admission control: a host-wide budget of estimated conversion cost, shared by every web process
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'True') == 'True'
+ADMISSION_BUDGET = float(os.getenv('ADMISSION_BUDGET', '100'))  # Cost units of conversions running at once
+ADMISSION_FAST_LANE_BUDGET = float(os.getenv('ADMISSION_FAST_LANE_BUDGET', '10'))  # Part of the budget kept for cheap requests
+ADMISSION_FAST_LANE_MAX_COST = float(os.getenv('ADMISSION_FAST_LANE_MAX_COST', '2'))  # Requests up to this cost are cheap
+ADMISSION_SECONDS_PER_UNIT = float(os.getenv('ADMISSION_SECONDS_PER_UNIT', '0.5'))  # Rough worker time of a unit, for Retry-After
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv('ADMISSION_MAX_RETRY_AFTER', '120'))  # Seconds
+ADMISSION_TICKET_TTL = int(os.getenv('ADMISSION_TICKET_TTL', '1800'))  # Seconds before a ticket that was never released expires
+ADMISSION_DIR = os.path.join(MEDIA_ROOT, 'admission')
+# Cost of each operation: (base, per page, per megabyte of input); pages are counted for PDF, PPTX and images
+ADMISSION_OPERATION_COSTS = {
+    'convert_to_pdf': (1, 0.05, 1),
+    'pdf_to_docx': (1, 0.3, 0.5),
+    'pdf_to_txt': (0.5, 0.01, 0.1),
+    'pdf_to_pptx': (1, 0.2, 0.5),
+    'merge_files': (1, 0.01, 0.5),
+    'merge_images_to_pdf': (0.5, 0.1, 0.2),
+}
+
+# Database-backed job queue for async uploads and merges
+JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', '2'))  # Threads per web process; 0 leaves jobs to `manage.py run_job_worker`
+JOB_QUEUE_POLL_INTERVAL = float(os.getenv('JOB_QUEUE_POLL_INTERVAL', '2'))  # Seconds between polls when idle
+JOB_QUEUE_STALE_AFTER = int(os.getenv('JOB_QUEUE_STALE_AFTER', '1800'))  # Seconds before a stuck 'processing' job is retried
+JOB_QUEUE_MAX_DEPTH = int(os.getenv('JOB_QUEUE_MAX_DEPTH', '100'))  # Pending + processing jobs before mode=async gets 429; 0 = unlimited
+JOB_QUEUE_RETRY_AFTER = int(os.getenv('JOB_QUEUE_RETRY_AFTER', '30'))  # Retry-After seconds sent with that 429
+
+# Job progress reporting and the Server-Sent Events stream that follows it
+PROGRESS_UPDATE_INTERVAL = float(os.getenv('PROGRESS_UPDATE_INTERVAL', '0.5'))  # Min seconds between progress writes per job
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv('JOB_EVENTS_POLL_INTERVAL', '0.5'))  # Seconds between checks for new progress
+JOB_EVENTS_HEARTBEAT = int(os.getenv('JOB_EVENTS_HEARTBEAT', '10'))  # Seconds between keep-alive comments
+# Seconds before a stream ends and EventSource reconnects; stays under gunicorn's 30s sync worker timeout
+JOB_EVENTS_MAX_DURATION = int(os.getenv('JOB_EVENTS_MAX_DURATION', '25'))
+
+# Per-stage request timing: Server-Timing headers and per-process histograms
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True') == 'True'
+# Histogram bucket upper bounds in seconds
+TIMING_HISTOGRAM_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900]
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -13,4 +13,22 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agam.settings')
 
-application = get_wsgi_application() 
\ No newline at end of file
+application = get_wsgi_application()
+
+# Probe the available converters once per server process, before the first request
+from django.conf import settings  # noqa: E402
+from api.capabilities import get_converter_capabilities  # noqa: E402
+from api.jobs import start_job_workers  # noqa: E402
+from api.utils import preload_converters  # noqa: E402
+
+get_converter_capabilities()
+
+# Conversion libraries otherwise load on first use; preloading suits gunicorn --preload
+if settings.PRELOAD_CONVERTERS:
+    preload_converters()
+
+# Pick up jobs queued before this process started. Under gunicorn this module may be
+# imported by the master (--preload), so the post_worker_init hook in gunicorn.conf.py
+# starts them in each worker process instead
+if not os.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn/'):
+    start_job_workers() 
\ No newline at end of file
@@ -0,0 +1,405 @@
+import os
+import json
+import asyncio
+import math
+import time
+import uuid
+import zipfile
+import threading
+import logging
+from contextlib import contextmanager, asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .executor import ExecutorBusy
+from .locks import file_lock
+from .timing import span
+from .utils import get_file_extension
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg']
+
+# Win32 constants for _windows_process_alive
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+
+class AdmissionRejected(ExecutorBusy):
+    """Raised when the host's conversion budget cannot take a request"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def count_pages(uploaded_file):
+    """
+    Page count of an upload, if it can be had without converting it
+
+    PDFs are opened with fitz, which only reads the page tree; PPTX slides are
+    counted in the archive's listing; an image is one page.
+
+    Returns:
+        int or None: None for formats whose page count is unknown (e.g. DOCX)
+    """
+    extension = get_file_extension(uploaded_file.name)
+    if extension in IMAGE_EXTENSIONS:
+        return 1
+    if extension not in ['pdf', 'pptx']:
+        return None
+
+    try:
+        if hasattr(uploaded_file, 'temporary_file_path'):
+            source = uploaded_file.temporary_file_path()
+        else:
+            uploaded_file.seek(0)
+            source = uploaded_file
+        try:
+            if extension == 'pdf':
+                import fitz
+                if isinstance(source, str):
+                    with fitz.open(source) as doc:
+                        return doc.page_count
+                with fitz.open(stream=source.read(), filetype='pdf') as doc:
+                    return doc.page_count
+            with zipfile.ZipFile(source) as archive:
+                return sum(
+                    1 for name in archive.namelist()
+                    if name.startswith('ppt/slides/slide') and name.endswith('.xml')
+                )
+        finally:
+            if not isinstance(source, str):
+                uploaded_file.seek(0)
+    except Exception as e:
+        # Conversion reports broken files properly; here they just cost by size
+        logger.warning(f"Could not count pages of '{uploaded_file.name}': {str(e)}")
+        return None
+
+
+def estimate_cost(operation, files):
+    """
+    Estimate what a conversion will cost, before any of it is done
+
+    The cost of an operation is a base cost plus per-page and per-megabyte
+    costs of its inputs (ADMISSION_OPERATION_COSTS). A unit is roughly
+    ADMISSION_SECONDS_PER_UNIT seconds of one worker.
+
+    Args:
+        operation (str): The operation, e.g. 'pdf_to_docx'
+        files (list): Uploaded files the operation runs on together
+
+    Returns:
+        float: Cost in units
+    """
+    base, per_page, per_megabyte = settings.ADMISSION_OPERATION_COSTS.get(operation, (1, 0, 0))
+    cost = base
+    for uploaded_file in files:
+        cost += per_megabyte * uploaded_file.size / MEGABYTE
+        if per_page:
+            cost += per_page * (count_pages(uploaded_file) or 0)
+    return round(cost, 2)
+
+
+def estimate_pipeline_cost(pipeline, files):
+    """Cost of a pipeline: every step is counted as if it ran on all the uploads"""
+    return round(sum(estimate_cost(step['op'], files) for step in pipeline['steps']), 2)
+
+
+class AdmissionTicket:
+    """A request's share of the conversion budget, given back with release()"""
+
+    def __init__(self, ledger, ticket_id, cost, lane):
+        self.ledger = ledger
+        self.ticket_id = ticket_id
+        self.cost = cost
+        self.lane = lane
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.ledger.release(self.ticket_id)
+
+
+class AdmissionLedger:
+    """
+    Host-wide conversion budget, shared by every web process through a ledger file.
+
+    Each admitted request holds a ticket for its estimated cost until its
+    conversion is done. Expensive requests share `budget - fast_lane_budget`;
+    cheap ones (cost up to `fast_lane_max_cost`) may use the whole budget, so
+    the fast lane is always left for them. A request costing more than the
+    shared part on its own is admitted when no other expensive request is
+    running, so it is slow but never starved. Tickets of processes that died
+    are dropped.
+    """
+
+    def __init__(self, ledger_dir, budget, fast_lane_budget, fast_lane_max_cost, seconds_per_unit,
+                 max_retry_after, ticket_ttl):
+        self.ledger_path = os.path.join(ledger_dir, 'ledger.json')
+        self.lock_path = os.path.join(ledger_dir, 'ledger.lock')
+        self.budget = budget
+        self.fast_lane_budget = fast_lane_budget
+        self.fast_lane_max_cost = fast_lane_max_cost
+        self.seconds_per_unit = seconds_per_unit
+        self.max_retry_after = max_retry_after
+        self.ticket_ttl = ticket_ttl
+        os.makedirs(ledger_dir, exist_ok=True)
+
+    def admit(self, operation, cost):
+        """
+        Take a ticket for a request
+
+        Returns:
+            AdmissionTicket or None: None if the ledger could not be locked, in
+                which case the request is let through
+
+        Raises:
+            AdmissionRejected: 429 for an expensive request while the shared budget is
+                used up, 503 when not even the fast lane has room
+        """
+        lane = 'fast' if cost <= self.fast_lane_max_cost else 'shared'
+        with file_lock(self.lock_path, timeout=5) as acquired:
+            if not acquired:
+                logger.warning("Admission ledger is locked, letting the request through")
+                return None
+
+            ledger = self._read()
+            now = time.time()
+            tickets = self._live_tickets(ledger['tickets'], now)
+            used = sum(ticket['cost'] for ticket in tickets.values())
+            lane_used = sum(ticket['cost'] for ticket in tickets.values() if ticket['lane'] == lane)
+
+            if lane == 'fast':
+                admitted = used + cost <= self.budget or lane_used + cost <= self.fast_lane_budget
+                limit = self.budget
+            else:
+                admitted = used + cost <= self.budget - self.fast_lane_budget or lane_used == 0
+                limit = self.budget - self.fast_lane_budget
+
+            if not admitted:
+                ledger['tickets'] = tickets
+                ledger['rejected'] = ledger.get('rejected', 0) + 1
+                self._write(ledger)
+                needed = used + cost - limit
+                if lane == 'shared':
+                    # Once the other expensive requests are done there is always room
+                    needed = min(needed, lane_used)
+                retry_after = self._retry_after(tickets, needed, now)
+                logger.warning(
+                    f"Admission: rejected {operation} costing {cost} ({used} of {self.budget} in use)"
+                )
+                if lane == 'fast':
+                    raise AdmissionRejected('Server is at capacity, please retry later', 503, retry_after)
+                raise AdmissionRejected(
+                    'Too many large conversions in progress, please retry later', 429, retry_after
+                )
+
+            ticket_id = uuid.uuid4().hex
+            tickets[ticket_id] = {
+                'operation': operation,
+                'cost': cost,
+                'lane': lane,
+                'pid': os.getpid(),
+                'admitted': now,
+                'expected_end': now + cost * self.seconds_per_unit,
+            }
+            ledger['tickets'] = tickets
+            ledger['admitted'] = ledger.get('admitted', 0) + 1
+            self._write(ledger)
+        return AdmissionTicket(self, ticket_id, cost, lane)
+
+    def release(self, ticket_id):
+        with file_lock(self.lock_path, timeout=5) as acquired:
+            if not acquired:
+                # The ticket expires after ADMISSION_TICKET_TTL
+                logger.warning("Admission ledger is locked, could not release a ticket")
+                return
+            ledger = self._read()
+            if ledger['tickets'].pop(ticket_id, None) is not None:
+                self._write(ledger)
+
+    def status(self):
+        """Budget in use for the health endpoint"""
+        ledger = self._read()
+        tickets = self._live_tickets(ledger['tickets'], time.time())
+        return {
+            'enabled': True,
+            'budget': self.budget,
+            'fast_lane_budget': self.fast_lane_budget,
+            'fast_lane_max_cost': self.fast_lane_max_cost,
+            'in_use': round(sum(ticket['cost'] for ticket in tickets.values()), 2),
+            'requests': {
+                lane: sum(1 for ticket in tickets.values() if ticket['lane'] == lane)
+                for lane in ('fast', 'shared')
+            },
+            'admitted': ledger.get('admitted', 0),
+            'rejected': ledger.get('rejected', 0),
+        }
+
+    def _retry_after(self, tickets, needed, now):
+        """Seconds until tickets costing `needed` are expected to be released"""
+        freed = 0
+        retry_after = self.max_retry_after
+        for ticket in sorted(tickets.values(), key=lambda ticket: ticket['expected_end']):
+            freed += ticket['cost']
+            if freed >= needed:
+                retry_after = ticket['expected_end'] - now
+                break
+        return min(max(1, math.ceil(retry_after)), self.max_retry_after)
+
+    def _live_tickets(self, tickets, now):
+        """Tickets whose process is alive and that have not outlived ADMISSION_TICKET_TTL"""
+        return {
+            ticket_id: ticket for ticket_id, ticket in tickets.items()
+            if now - ticket['admitted'] < self.ticket_ttl and _process_alive(ticket['pid'])
+        }
+
+    def _read(self):
+        try:
+            with open(self.ledger_path, 'r') as f:
+                ledger = json.load(f)
+        except (FileNotFoundError, ValueError):
+            ledger = {}
+        ledger.setdefault('tickets', {})
+        return ledger
+
+    def _write(self, ledger):
+        tmp_path = f"{self.ledger_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(ledger, f)
+        os.replace(tmp_path, self.ledger_path)
+
+
+def _process_alive(pid):
+    """Whether a process is still running"""
+    if pid == os.getpid():
+        return True
+    # On Windows os.kill() terminates the process whatever the signal
+    if os.name == 'nt':
+        return _windows_process_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _windows_process_alive(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.GetExitCodeProcess.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access is denied to a process that exists but belongs to another user
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_admission_ledger():
+    """
+    Get the admission ledger
+
+    Returns:
+        AdmissionLedger or None: None when ADMISSION_CONTROL_ENABLED is off
+    """
+    global _ledger
+
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return None
+
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = AdmissionLedger(
+                ledger_dir=settings.ADMISSION_DIR,
+                budget=settings.ADMISSION_BUDGET,
+                fast_lane_budget=settings.ADMISSION_FAST_LANE_BUDGET,
+                fast_lane_max_cost=settings.ADMISSION_FAST_LANE_MAX_COST,
+                seconds_per_unit=settings.ADMISSION_SECONDS_PER_UNIT,
+                max_retry_after=settings.ADMISSION_MAX_RETRY_AFTER,
+                ticket_ttl=settings.ADMISSION_TICKET_TTL,
+            )
+        return _ledger
+
+
+def admit(operation, files, cost=None):
+    """
+    Admit a request to the conversion budget, or turn it away
+
+    Args:
+        operation (str): The operation, for the estimate and the logs
+        files (list): The uploaded files
+        cost (float, optional): A cost estimated by the caller (e.g. for a pipeline)
+
+    Returns:
+        AdmissionTicket or None: Release it once the conversion is done; None when
+            admission control is off
+
+    Raises:
+        AdmissionRejected: If the budget cannot take the request
+    """
+    ledger = get_admission_ledger()
+    if ledger is None:
+        return None
+    with span('admission'):
+        if cost is None:
+            cost = estimate_cost(operation, files)
+        return ledger.admit(operation, cost)
+
+
+@contextmanager
+def admitted(operation, files, cost=None):
+    """Hold a ticket from admit() while the block runs"""
+    ticket = admit(operation, files, cost)
+    try:
+        yield ticket
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+@asynccontextmanager
+async def admitted_async(operation, files, cost=None):
+    """admitted() for async views: the estimate and the ledger are handled in a worker thread"""
+    ticket = await sync_to_async(admit, thread_sensitive=False)(operation, files, cost)
+    try:
+        yield ticket
+    finally:
+        if ticket is not None:
+            await asyncio.to_thread(ticket.release)
+
+
+def release_on_close(response, ticket):
+    """Hold a ticket until a streamed response, which does its work while it is sent, is closed"""
+    if ticket is not None:
+        response._resource_closers.append(ticket.release)
+    return response
+
+
+def get_admission_status():
+    ledger = get_admission_ledger()
+    return ledger.status() if ledger is not None else {'enabled': False}
@@ -0,0 +1,318 @@
+import os
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import classonlymethod
+from django.utils.http import content_disposition_header
+from django.views import View
+from rest_framework import status
+
+from .models import ProcessedFile, MergeJob
+from .serializers import (
+    ProcessedFileSerializer, MergeJobSerializer,
+    FileUploadSerializer, MergeFilesSerializer
+)
+from .utils import (
+    get_file_extension, stream_pdf_text_without_db,
+    process_file_without_db_async, process_images_to_pdf_without_db_async,
+    merge_files_without_db_async
+)
+from .admission import admit, admitted_async, release_on_close
+from .cancellation import CancellationToken, OperationTimedOut
+from .delivery import deliver_file, deliver_stored_file
+from .executor import ExecutorBusy
+from .jobs import enqueue_processed_file, enqueue_merge_job
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def error_response(error, status_code):
+    return JsonResponse({'error': str(error)}, status=status_code)
+
+
+def timed_out_response(view_name, error):
+    logger.error(f"{view_name}: {str(error)}")
+    return error_response(error, status.HTTP_504_GATEWAY_TIMEOUT)
+
+
+def busy_response(view_name, error):
+    logger.warning(f"{view_name}: {str(error)}")
+    response = error_response(error, error.status_code)
+    if error.retry_after is not None:
+        response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def read_form(request):
+    """The request's form fields and uploaded files in one QueryDict, like DRF's request.data"""
+    data = request.POST.copy()
+    data.update(request.FILES)
+    return data
+
+
+@sync_to_async(thread_sensitive=False)
+def validate_form(request, serializer_class):
+    """Parse the multipart body and validate it, in a worker thread (both read the spooled upload)"""
+    serializer = serializer_class(data=read_form(request))
+    serializer.is_valid()
+    return serializer
+
+
+@sync_to_async(thread_sensitive=False)
+def deliver_file_async(file_path, filename, delete_after=False):
+    """deliver_file for async views, in a worker thread (it stats the file and may move it)"""
+    return deliver_file(file_path, filename, delete_after=delete_after, asynchronous=True)
+
+
+@sync_to_async(thread_sensitive=False)
+def deliver_stored_file_async(request, file_path, filename):
+    """deliver_stored_file for async views, in a worker thread (the conditional and Range handling stat the file)"""
+    return deliver_stored_file(request, file_path, filename, asynchronous=True)
+
+
+async def iterate_in_thread(iterator):
+    """Yield the items of a sync iterator, producing each one in a worker thread"""
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+async def stream_text_response(uploaded_file):
+    """stream_text_response() of the sync views, extracting each page in a worker thread"""
+    ticket = await sync_to_async(admit, thread_sensitive=False)('pdf_to_txt', [uploaded_file])
+    try:
+        stream, output_filename = await sync_to_async(stream_pdf_text_without_db, thread_sensitive=False)(uploaded_file)
+    except BaseException:
+        if ticket is not None:
+            await asyncio.to_thread(ticket.release)
+        raise
+    response = StreamingHttpResponse(iterate_in_thread(stream), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, output_filename)
+    return release_on_close(response, ticket)
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async (ASGI) versions of the API views.
+
+    DRF 3.14 views are sync only, and under ASGI Django runs each of them in a
+    thread that is held while the conversion runs and the file is sent. These
+    views are coroutines: uploads are saved and conversions run off the event
+    loop (worker threads and the conversion executor), and results are
+    streamed from it, so a slow client costs a coroutine rather than a thread.
+    They accept the same multipart requests and return the same responses as
+    their sync counterparts.
+
+    Clients are not followed while a conversion runs: Django 4.2 does not tell
+    an async view that its client went away. Time budgets still apply.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like DRF's APIView: the API is used by token-authenticated clients, not forms
+        view.csrf_exempt = True
+        return view
+
+
+class AsyncFileUploadView(AsyncAPIView):
+    """Async version of FileUploadView"""
+
+    async def post(self, request):
+        logger.info("AsyncFileUploadView: Received POST request")
+
+        serializer = await validate_form(request, FileUploadSerializer)
+
+        if serializer.errors:
+            logger.warning(f"AsyncFileUploadView: Invalid data - {serializer.errors}")
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        uploaded_file = serializer.validated_data['file']
+        operation = serializer.validated_data['operation']
+
+        logger.info(f"AsyncFileUploadView: Processing file '{uploaded_file.name}' with operation '{operation}'")
+
+        try:
+            # Queue the conversion and return the job for polling
+            if serializer.validated_data['mode'] == 'async':
+                data = await sync_to_async(self.enqueue)(request, uploaded_file, operation)
+                return JsonResponse(data, status=status.HTTP_202_ACCEPTED)
+
+            if operation == 'pdf_to_txt' and serializer.validated_data['stream']:
+                logger.info("AsyncFileUploadView: Streaming extracted text")
+                return await stream_text_response(uploaded_file)
+
+            async with admitted_async(operation, [uploaded_file]):
+                output_path, output_filename = await process_file_without_db_async(
+                    uploaded_file, operation, cancel=CancellationToken()
+                )
+
+            logger.info(f"AsyncFileUploadView: Processing complete, sending response with file: {output_filename}")
+
+            # Return the file; it is removed once it has been delivered
+            return await deliver_file_async(output_path, output_filename, delete_after=True)
+
+        except OperationTimedOut as e:
+            return timed_out_response('AsyncFileUploadView', e)
+        except ExecutorBusy as e:
+            return busy_response('AsyncFileUploadView', e)
+        except Exception as e:
+            logger.error(f"AsyncFileUploadView: Error processing file - {str(e)}")
+            return error_response(e, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def enqueue(request, uploaded_file, operation):
+        job = enqueue_processed_file(uploaded_file, operation)
+        return ProcessedFileSerializer(job, context={'request': request}).data
+
+
+class AsyncMergeFilesView(AsyncAPIView):
+    """Async version of MergeFilesView"""
+
+    async def post(self, request):
+        logger.info("AsyncMergeFilesView: Received POST request")
+
+        serializer = await validate_form(request, MergeFilesSerializer)
+
+        if serializer.errors:
+            logger.warning(f"AsyncMergeFilesView: Invalid data - {serializer.errors}")
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        files = serializer.validated_data['files']
+        output_filename = serializer.validated_data['output_filename']
+
+        logger.info(f"AsyncMergeFilesView: Merging {len(files)} files with output filename '{output_filename}'")
+
+        # Mixed merges normalise every file to PDF, so the output is always a PDF
+        mixed = serializer.validated_data['mixed']
+
+        # Ensure all files are of the same type
+        file_types = {get_file_extension(file.name) for file in files}
+        if len(file_types) > 1 and not mixed:
+            logger.warning(f"AsyncMergeFilesView: Files of different types - {file_types}")
+            return error_response('All files must be of the same type for merging', status.HTTP_400_BAD_REQUEST)
+
+        file_type = 'pdf' if mixed else get_file_extension(files[0].name).lower()
+
+        if file_type not in ['pdf', 'docx', 'pptx']:
+            logger.warning(f"AsyncMergeFilesView: Unsupported file type - {file_type}")
+            return error_response(
+                f'File type {file_type} is not supported for merging. Only PDF, DOCX, and PPTX are supported.',
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        # Sanitize output filename
+        output_filename = os.path.basename(output_filename)
+
+        try:
+            # Queue the merge and return the job for polling
+            if serializer.validated_data['mode'] == 'async':
+                data = await sync_to_async(self.enqueue)(request, files, output_filename, file_type)
+                return JsonResponse(data, status=status.HTTP_202_ACCEPTED)
+
+            async with admitted_async('merge_files', files):
+                output_path, output_filename = await merge_files_without_db_async(
+                    files, output_filename, file_type, mixed=mixed, cancel=CancellationToken()
+                )
+
+            logger.info(f"AsyncMergeFilesView: Merge complete, sending response with file: {output_filename}")
+
+            # Return the file; it is removed once it has been delivered
+            return await deliver_file_async(output_path, output_filename, delete_after=True)
+
+        except OperationTimedOut as e:
+            return timed_out_response('AsyncMergeFilesView', e)
+        except ExecutorBusy as e:
+            return busy_response('AsyncMergeFilesView', e)
+        except Exception as e:
+            logger.error(f"AsyncMergeFilesView: Error merging files - {str(e)}")
+            return error_response(e, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def enqueue(request, files, output_filename, file_type):
+        job = enqueue_merge_job(files, output_filename, file_type)
+        return MergeJobSerializer(job, context={'request': request}).data
+
+
+class AsyncImagesToPdfView(AsyncAPIView):
+    """Async version of ImagesToPdfView"""
+
+    async def post(self, request):
+        logger.info("AsyncImagesToPdfView: Received POST request")
+
+        data = await sync_to_async(read_form, thread_sensitive=False)(request)
+
+        if 'files' not in data:
+            logger.warning("AsyncImagesToPdfView: No files provided")
+            return error_response('No files provided', status.HTTP_400_BAD_REQUEST)
+
+        files = data.getlist('files')
+
+        logger.info(f"AsyncImagesToPdfView: Processing {len(files)} images")
+
+        # Check if all files are images
+        for file in files:
+            ext = get_file_extension(file.name)
+            if ext not in ['png', 'jpg', 'jpeg']:
+                logger.warning(f"AsyncImagesToPdfView: Unsupported file format - {ext}")
+                return error_response(
+                    f'Unsupported file format: {ext}. Only PNG, JPG, and JPEG are supported',
+                    status.HTTP_400_BAD_REQUEST
+                )
+
+        output_filename = data.get('output_filename', 'combined_images')
+
+        try:
+            async with admitted_async('merge_images_to_pdf', files):
+                output_path, output_filename = await process_images_to_pdf_without_db_async(
+                    files, output_filename, cancel=CancellationToken()
+                )
+
+            logger.info(f"AsyncImagesToPdfView: Conversion complete, sending response with file: {output_filename}")
+
+            # Return the file; it is removed once it has been delivered
+            return await deliver_file_async(output_path, output_filename, delete_after=True)
+
+        except OperationTimedOut as e:
+            return timed_out_response('AsyncImagesToPdfView', e)
+        except ExecutorBusy as e:
+            return busy_response('AsyncImagesToPdfView', e)
+        except Exception as e:
+            logger.error(f"AsyncImagesToPdfView: Error converting images to PDF - {str(e)}")
+            return error_response(e, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncFileDownloadView(AsyncAPIView):
+    """Async version of FileDownloadView"""
+
+    async def get(self, request, file_id):
+        processed_file = await ProcessedFile.objects.filter(id=file_id).afirst()
+        if processed_file is not None:
+            if processed_file.status != 'completed':
+                return error_response('File is not ready for download', status.HTTP_400_BAD_REQUEST)
+            if not processed_file.processed_file:
+                return error_response('No processed file available', status.HTTP_404_NOT_FOUND)
+            return await deliver_stored_file_async(
+                request, processed_file.processed_file.path, processed_file.processed_filename
+            )
+
+        merge_job = await MergeJob.objects.filter(id=file_id).afirst()
+        if merge_job is None:
+            return error_response('Not found.', status.HTTP_404_NOT_FOUND)
+        if merge_job.status != 'completed':
+            return error_response('File is not ready for download', status.HTTP_400_BAD_REQUEST)
+        if not merge_job.merged_file:
+            return error_response('No merged file available', status.HTTP_404_NOT_FOUND)
+
+        output_filename = f"{merge_job.output_filename}.{merge_job.file_type}"
+        return await deliver_stored_file_async(request, merge_job.merged_file.path, output_filename)
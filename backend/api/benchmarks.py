@@ -0,0 +1,521 @@
+import os
+import sys
+import time
+import random
+import platform
+import resource
+import statistics
+import subprocess
+import multiprocessing
+import json
+import logging
+import fitz  # PyMuPDF
+import openpyxl
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from PIL import Image
+
+from .capabilities import get_converter_capabilities, get_soffice_path
+from .soffice_pool import shutdown_soffice_pool
+from .utils import (
+    CONVERTER_LIBRARIES, convert_to_pdf, pdf_to_txt, pdf_to_docx, pdf_to_pptx,
+    merge_pdf_files, merge_docx_files, merge_pptx_files, merge_images_to_pdf,
+    get_worker_count
+)
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud"
+)
+
+# Merges combine this many inputs, which share the requested pages between them
+MERGE_INPUTS = 4
+
+# Fixtures are seeded, so every run converts exactly the same documents
+FIXTURE_SEED = 1234
+
+
+def make_text_pdf(path, pages, lines_per_page=45):
+    """
+    Write a synthetic text-heavy PDF
+
+    Args:
+        path (str): Output path
+        pages (int): Number of pages
+        lines_per_page (int): Lines of text on each page
+
+    Returns:
+        str: The output path
+    """
+    pdf_document = fitz.open()
+    for page_num in range(pages):
+        page = pdf_document.new_page()
+        text = '\n'.join(f"{page_num + 1}.{line + 1} {LOREM}" for line in range(lines_per_page))
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=7)
+    pdf_document.save(path)
+    pdf_document.close()
+    return path
+
+
+def make_docx(path, pages, paragraphs_per_page=12):
+    """Write a synthetic DOCX with a heading, paragraphs and a page break per page"""
+    document = Document()
+    for page_num in range(pages):
+        document.add_heading(f"Section {page_num + 1}", level=2)
+        for paragraph in range(paragraphs_per_page):
+            document.add_paragraph(f"{page_num + 1}.{paragraph + 1} {LOREM}")
+        if page_num < pages - 1:
+            document.add_page_break()
+    document.save(path)
+    return path
+
+
+def make_pptx(path, slides):
+    """Write a synthetic PPTX with a title and a text box on every slide"""
+    presentation = Presentation()
+    layout = presentation.slide_layouts[5]  # Title only
+    for slide_num in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {slide_num + 1}"
+        text_frame = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(5)).text_frame
+        text_frame.word_wrap = True
+        for line in range(6):
+            paragraph = text_frame.add_paragraph() if line else text_frame.paragraphs[0]
+            paragraph.text = f"{slide_num + 1}.{line + 1} {LOREM}"
+            paragraph.font.size = Pt(14)
+    presentation.save(path)
+    return path
+
+
+def make_xlsx(path, pages, rows_per_page=50, columns=10):
+    """Write a synthetic XLSX with about `rows_per_page` rows of numbers and text per printed page"""
+    rng = random.Random(FIXTURE_SEED)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append([f"Column {column + 1}" for column in range(columns)])
+    for row in range(pages * rows_per_page):
+        sheet.append([row + 1, f"Item {row + 1}"] + [round(rng.uniform(0, 10000), 2) for _ in range(columns - 2)])
+    workbook.save(path)
+    return path
+
+
+def make_image(path, width, height, seed):
+    """
+    Write a synthetic photo-like JPEG
+
+    A smooth gradient with seeded noise on top, so it compresses like a photo
+    rather than like a flat colour.
+    """
+    gradient = Image.linear_gradient('L').resize((width, height))
+    rng = random.Random(seed)
+    noise = Image.frombytes('L', (width // 4, height // 4), rng.randbytes((width // 4) * (height // 4)))
+    noise = noise.resize((width, height))
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    image.save(path, 'JPEG', quality=90)
+    return path
+
+
+def parse_image_size(value):
+    """
+    Parse an image size like '4000x3000'
+
+    Raises:
+        ValueError: If it is not WIDTHxHEIGHT with both at least 4
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Invalid image size {value!r}, expected WIDTHxHEIGHT")
+    if width < 4 or height < 4:
+        raise ValueError('Image size must be at least 4x4')
+    return width, height
+
+
+def _cpu_seconds():
+    """User and system CPU time of this process and its waited-for children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_bytes():
+    """Largest resident set of this process or any of its waited-for children"""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _run_measured(func, connection):
+    try:
+        # A forked process starts out with the resident memory of its parent
+        baseline_rss = _peak_rss_bytes()
+        start_cpu = _cpu_seconds()
+        start = time.perf_counter()
+        output_path = func()
+        wall = time.perf_counter() - start
+        # Stop pooled LibreOffice instances, so their CPU time and memory are counted too
+        shutdown_soffice_pool()
+        connection.send({
+            'wall': wall,
+            'cpu': _cpu_seconds() - start_cpu,
+            'peak_rss': _peak_rss_bytes(),
+            'baseline_rss': baseline_rss,
+            'output_bytes': os.path.getsize(output_path),
+        })
+    except BaseException as e:
+        connection.send({'error': f"{type(e).__name__}: {str(e)}"})
+    finally:
+        connection.close()
+
+
+def measure(func, repeat):
+    """
+    Measure repeated calls of a function, each in a fresh forked process
+
+    A fresh process per run gives every run its own peak RSS and CPU counters,
+    which include worker processes and LibreOffice, and keeps one run's caches
+    and memory from affecting the next.
+
+    Args:
+        func (callable): Runs the operation and returns the path of its output
+        repeat (int): Number of runs
+
+    Returns:
+        dict: min/median/mean wall time and median CPU time in seconds, the
+            largest peak RSS, the RSS the runs started from (inherited from
+            this process) and the output size in bytes
+    """
+    context = multiprocessing.get_context('fork')
+    runs = []
+    for _ in range(repeat):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_run_measured, args=(func, sender))
+        process.start()
+        sender.close()
+        try:
+            run = receiver.recv()
+        except EOFError:
+            run = {'error': f"Benchmark process died with exit code {process.exitcode}"}
+        process.join()
+        if 'error' in run:
+            raise RuntimeError(run['error'])
+        runs.append(run)
+
+    walls = [run['wall'] for run in runs]
+    return {
+        'min': round(min(walls), 4),
+        'median': round(statistics.median(walls), 4),
+        'mean': round(statistics.mean(walls), 4),
+        'cpu_seconds': round(statistics.median(run['cpu'] for run in runs), 4),
+        'peak_rss_bytes': max(run['peak_rss'] for run in runs),
+        'baseline_rss_bytes': min(run['baseline_rss'] for run in runs),
+        'output_bytes': runs[-1]['output_bytes'],
+    }
+
+
+def _input_bytes(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def benchmark_convert_to_pdf(workdir, options):
+    """
+    Convert synthetic DOCX, PPTX and XLSX documents to PDF with LibreOffice
+
+    Returns:
+        list: One result dict per input format
+    """
+    pages = options['pages']
+    if not get_soffice_path():
+        logger.warning("LibreOffice not found, skipping convert_to_pdf")
+        return [dict(operation='convert_to_pdf', pages=pages, skipped='LibreOffice is not installed')]
+
+    results = []
+    for input_format, make_fixture in [('docx', make_docx), ('pptx', make_pptx), ('xlsx', make_xlsx)]:
+        # LibreOffice writes <name>.pdf next to its output first, so keep clear of the PDF fixtures
+        input_path = make_fixture(os.path.join(workdir, f"office_{pages}.{input_format}"), pages)
+        output_path = os.path.join(workdir, f"output_{input_format}.pdf")
+        timing = measure(lambda: convert_to_pdf(input_path, output_path), options['repeat'])
+        results.append(dict(
+            operation='convert_to_pdf', mode=input_format, pages=pages,
+            input_bytes=_input_bytes([input_path]), **timing
+        ))
+    return results
+
+
+def benchmark_pdf_to_txt(workdir, options):
+    """
+    Compare sequential and parallel pdf_to_txt on a synthetic PDF
+
+    Returns:
+        list: One result dict per mode
+    """
+    pages = options['pages']
+    input_path = make_text_pdf(os.path.join(workdir, f"bench_{pages}.pdf"), pages)
+    workers = get_worker_count(options['workers'] or settings.PDF_TO_TXT_WORKERS)
+    sequential_path = os.path.join(workdir, 'sequential.txt')
+    parallel_path = os.path.join(workdir, 'parallel.txt')
+
+    sequential = measure(lambda: pdf_to_txt(input_path, sequential_path, workers=1), options['repeat'])
+    parallel = measure(lambda: pdf_to_txt(input_path, parallel_path, workers=workers), options['repeat'])
+
+    # Both paths must produce the same text in the same order
+    with open(sequential_path, 'rb') as a, open(parallel_path, 'rb') as b:
+        identical = a.read() == b.read()
+
+    input_bytes = _input_bytes([input_path])
+    return [
+        dict(operation='pdf_to_txt', mode='sequential', pages=pages, workers=1, input_bytes=input_bytes, **sequential),
+        dict(
+            operation='pdf_to_txt', mode='parallel', pages=pages, workers=workers, input_bytes=input_bytes,
+            speedup=round(sequential['median'] / parallel['median'], 2), identical_output=identical,
+            **parallel
+        ),
+    ]
+
+
+def benchmark_pdf_to_pptx(workdir, options):
+    """
+    Compare sequential and parallel pdf_to_pptx, with PNG and JPEG slides
+
+    Returns:
+        list: One result dict per mode
+    """
+    pages = options['pages']
+    input_path = make_text_pdf(os.path.join(workdir, f"bench_{pages}.pdf"), pages)
+    workers = get_worker_count(options['workers'] or settings.PDF_TO_PPTX_WORKERS)
+    output_path = os.path.join(workdir, 'output.pptx')
+
+    results = []
+    baseline = None
+    for mode, mode_workers, image_format in [
+        ('sequential', 1, 'png'),
+        ('parallel', workers, 'png'),
+        ('parallel', workers, 'jpeg'),
+    ]:
+        timing = measure(
+            lambda: pdf_to_pptx(input_path, output_path, image_format=image_format, workers=mode_workers),
+            options['repeat'],
+        )
+        baseline = baseline or timing['median']
+        results.append(dict(
+            operation='pdf_to_pptx', mode=mode, image_format=image_format, pages=pages,
+            workers=mode_workers, input_bytes=_input_bytes([input_path]),
+            speedup=round(baseline / timing['median'], 2), **timing
+        ))
+    return results
+
+
+def benchmark_pdf_to_docx(workdir, options):
+    """
+    Compare sequential and parallel pdf_to_docx on a synthetic PDF
+
+    Returns:
+        list: One result dict per mode
+    """
+    pages = options['pages']
+    input_path = make_text_pdf(os.path.join(workdir, f"bench_{pages}.pdf"), pages)
+    workers = get_worker_count(options['workers'] or settings.PDF_TO_DOCX_WORKERS)
+    output_path = os.path.join(workdir, 'output.docx')
+
+    sequential = measure(lambda: pdf_to_docx(input_path, output_path, workers=1), options['repeat'])
+    parallel = measure(lambda: pdf_to_docx(input_path, output_path, workers=workers), options['repeat'])
+
+    input_bytes = _input_bytes([input_path])
+    return [
+        dict(operation='pdf_to_docx', mode='sequential', pages=pages, workers=1, input_bytes=input_bytes, **sequential),
+        dict(
+            operation='pdf_to_docx', mode='parallel', pages=pages, workers=workers, input_bytes=input_bytes,
+            speedup=round(sequential['median'] / parallel['median'], 2), **parallel
+        ),
+    ]
+
+
+def _benchmark_merge(workdir, options, operation, merge, make_fixture, extension):
+    pages = options['pages']
+    pages_per_input = max(1, -(-pages // MERGE_INPUTS))
+    input_paths = [
+        make_fixture(os.path.join(workdir, f"merge_{i}_{pages_per_input}.{extension}"), pages_per_input)
+        for i in range(MERGE_INPUTS)
+    ]
+    output_path = os.path.join(workdir, f"merged.{extension}")
+    timing = measure(lambda: merge(input_paths, output_path), options['repeat'])
+    return [dict(
+        operation=operation, inputs=MERGE_INPUTS, pages=pages_per_input * MERGE_INPUTS,
+        input_bytes=_input_bytes(input_paths), **timing
+    )]
+
+
+def benchmark_merge_pdf_files(workdir, options):
+    """Merge MERGE_INPUTS synthetic PDFs"""
+    return _benchmark_merge(workdir, options, 'merge_pdf_files', merge_pdf_files, make_text_pdf, 'pdf')
+
+
+def benchmark_merge_docx_files(workdir, options):
+    """Merge MERGE_INPUTS synthetic DOCX documents"""
+    return _benchmark_merge(workdir, options, 'merge_docx_files', merge_docx_files, make_docx, 'docx')
+
+
+def benchmark_merge_pptx_files(workdir, options):
+    """Merge MERGE_INPUTS synthetic presentations"""
+    return _benchmark_merge(workdir, options, 'merge_pptx_files', merge_pptx_files, make_pptx, 'pptx')
+
+
+def benchmark_merge_images_to_pdf(workdir, options):
+    """
+    Merge high-resolution synthetic photos into a PDF
+
+    Returns:
+        list: One result dict
+    """
+    width, height = options['image_size']
+    image_paths = [
+        make_image(os.path.join(workdir, f"image_{i}_{width}x{height}.jpg"), width, height, FIXTURE_SEED + i)
+        for i in range(options['images'])
+    ]
+    output_path = os.path.join(workdir, 'images.pdf')
+    timing = measure(lambda: merge_images_to_pdf(image_paths, output_path), options['repeat'])
+    return [dict(
+        operation='merge_images_to_pdf', images=len(image_paths), image_size=f"{width}x{height}",
+        input_bytes=_input_bytes(image_paths), **timing
+    )]
+
+
+BENCHMARKS = {
+    'convert_to_pdf': benchmark_convert_to_pdf,
+    'pdf_to_txt': benchmark_pdf_to_txt,
+    'pdf_to_docx': benchmark_pdf_to_docx,
+    'pdf_to_pptx': benchmark_pdf_to_pptx,
+    'merge_pdf_files': benchmark_merge_pdf_files,
+    'merge_docx_files': benchmark_merge_docx_files,
+    'merge_pptx_files': benchmark_merge_pptx_files,
+    'merge_images_to_pdf': benchmark_merge_images_to_pdf,
+}
+
+# Operations whose input size is set by the number of images rather than pages
+IMAGE_BENCHMARKS = {'merge_images_to_pdf'}
+
+
+# Runs in a fresh interpreter: starts Django like a server process does and
+# loads the URLconf, which imports every view and the conversion layer
+STARTUP_SCRIPT = """
+import importlib, json, resource, sys, time
+
+def peak_rss():
+    # On Linux ru_maxrss survives exec and would report the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+start = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+importlib.import_module(settings.ROOT_URLCONF)
+result = {'startup_seconds': time.perf_counter() - start, 'startup_rss_bytes': peak_rss()}
+
+mode = sys.argv[1]
+if mode != 'lazy':
+    from api.utils import preload_converters
+    libraries = None if mode == 'preload' else [mode]
+    before = time.perf_counter()
+    preload_converters(libraries)
+    result['import_seconds'] = time.perf_counter() - before
+    result['import_rss_bytes'] = peak_rss() - result['startup_rss_bytes']
+
+result['loaded'] = sorted({name.split('.')[0] for name in json.loads(sys.argv[2]) if name in sys.modules})
+print(json.dumps(result))
+"""
+
+
+def measure_startup(mode, repeat):
+    """
+    Measure the start of a server process in fresh interpreters
+
+    Args:
+        mode (str): 'lazy' (conversion libraries load on first use), 'preload'
+            (preload_converters at startup) or the name of one library to import
+        repeat (int): Number of fresh processes to start
+
+    Returns:
+        dict: Median seconds and largest peak RSS of startup (and of the imports,
+            unless lazy), and which conversion libraries were loaded
+    """
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, mode, json.dumps(CONVERTER_LIBRARIES)],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Startup measurement failed: {result.stderr.strip()[-500:]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    row = {
+        'mode': mode,
+        'startup_seconds': round(statistics.median(run['startup_seconds'] for run in runs), 4),
+        'startup_rss_bytes': max(run['startup_rss_bytes'] for run in runs),
+    }
+    if mode != 'lazy':
+        row['import_seconds'] = round(statistics.median(run['import_seconds'] for run in runs), 4)
+        row['import_rss_bytes'] = max(run['import_rss_bytes'] for run in runs)
+    row['loaded'] = runs[-1]['loaded']
+    return row
+
+
+def result_key(row):
+    """What a result measured, so runs on different days can be matched up"""
+    return tuple(
+        (field, row[field])
+        for field in ('operation', 'mode', 'image_format', 'pages', 'workers', 'inputs', 'images', 'image_size')
+        if field in row
+    )
+
+
+def environment_info():
+    """The machine and converter versions a run was made with"""
+    capabilities = get_converter_capabilities()
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'converters': {
+            name: info.get('version') for name, info in capabilities.items() if info.get('available')
+        },
+    }
+
+
+def compare_results(results, baseline):
+    """
+    Compare median wall times with an earlier run
+
+    Args:
+        results (list): Rows of this run
+        baseline (list): Rows of the earlier run
+
+    Returns:
+        list: (key, baseline median, median, relative change) for rows in both runs
+    """
+    baseline_rows = {result_key(row): row for row in baseline if 'median' in row}
+    comparison = []
+    for row in results:
+        before = baseline_rows.get(result_key(row))
+        if before is None or 'median' not in row:
+            continue
+        change = (row['median'] - before['median']) / before['median'] if before['median'] else 0.0
+        comparison.append((result_key(row), before['median'], row['median'], round(change, 4)))
+    return comparison
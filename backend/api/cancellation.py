@@ -0,0 +1,270 @@
+import os
+import time
+import signal
+import select
+import socket
+import threading
+import subprocess
+import logging
+from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class OperationCancelled(Exception):
+    """Raised inside an operation whose cancellation token was cancelled"""
+
+
+class OperationTimedOut(OperationCancelled):
+    """Raised inside an operation that ran past its time budget"""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for one operation.
+
+    Long-running code calls check() between units of work (pages, files,
+    ranges) and bounds any blocking wait with bound(). A token is cancelled when
+    cancel() is called, when its deadline passes, when its parent is cancelled,
+    or when its `poll` callable returns True. `poll` lets a token follow
+    something outside the process, such as a job row or the client connection,
+    and is called at most every `poll_interval` seconds.
+    """
+
+    def __init__(self, timeout=None, parent=None, poll=None, poll_interval=None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.timeout = timeout
+        self.parent = parent
+        self.poll = poll
+        self.poll_interval = settings.CANCELLATION_CHECK_INTERVAL if poll_interval is None else poll_interval
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._last_poll = 0.0
+        self._poll_lock = threading.Lock()
+
+    @classmethod
+    def for_operation(cls, operation, **kwargs):
+        """Token with the time budget configured for an operation in CONVERSION_TIME_BUDGETS"""
+        return cls(timeout=settings.CONVERSION_TIME_BUDGETS.get(operation), **kwargs)
+
+    def cancel(self, reason='Operation was cancelled'):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def _poll(self):
+        now = time.monotonic()
+        with self._poll_lock:
+            if now - self._last_poll < self.poll_interval:
+                return
+            self._last_poll = now
+        try:
+            if self.poll():
+                self.cancel()
+        except Exception as e:
+            logger.warning(f"Cancellation poll failed: {str(e)}")
+
+    def _expired(self):
+        """This token or the nearest ancestor whose deadline has passed, if any"""
+        now = time.monotonic()
+        token = self
+        while token is not None:
+            if token.deadline is not None and now >= token.deadline:
+                return token
+            token = token.parent
+        return None
+
+    @property
+    def cancelled(self):
+        if self._cancelled.is_set() or self._expired() is not None:
+            return True
+        if self.parent is not None and self.parent.cancelled:
+            self.cancel(self.parent.reason or 'Operation was cancelled')
+        if self.poll is not None and not self._cancelled.is_set():
+            self._poll()
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise OperationTimedOut or OperationCancelled if the operation should stop"""
+        expired = self._expired()
+        if expired is not None:
+            raise OperationTimedOut(f"Operation timed out after {expired.timeout}s")
+        if self.cancelled:
+            raise OperationCancelled(self.reason)
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one"""
+        remaining = None
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.monotonic())
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+
+    def bound(self, timeout):
+        """`timeout` cut down to the time that is left (None means no limit)"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+def check_cancelled(cancel):
+    """Call cancel.check() if there is a token"""
+    if cancel is not None:
+        cancel.check()
+
+
+def wait_for_result(future, cancel=None):
+    """
+    Wait for a future's result, checking the token while waiting
+
+    Raises:
+        OperationCancelled: If the token is cancelled first
+    """
+    if cancel is None:
+        return future.result()
+    while True:
+        cancel.check()
+        try:
+            return future.result(timeout=settings.CANCELLATION_CHECK_INTERVAL)
+        except FuturesTimeoutError:
+            continue
+
+
+# Popen arguments that give a child a process group of its own, so kill_process_group()
+# can take it down with everything it spawned. Windows has no POSIX sessions.
+if hasattr(os, 'killpg'):
+    NEW_PROCESS_GROUP = {'start_new_session': True}
+else:
+    NEW_PROCESS_GROUP = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def kill_process_group(process):
+    """Kill a process started with NEW_PROCESS_GROUP and everything it spawned"""
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        return
+
+    # taskkill /T kills the process tree, like killpg does on POSIX
+    try:
+        subprocess.run(
+            ['taskkill', '/F', '/T', '/PID', str(process.pid)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    except OSError:
+        pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+def run_process(cmd, cancel=None, timeout=None):
+    """
+    Run a command to completion, like subprocess.run(capture_output=True, text=True)
+
+    The command runs in its own process group, so on a timeout or cancellation
+    the whole group is killed. soffice in particular is a wrapper that
+    starts soffice.bin, which would otherwise be left running.
+
+    Args:
+        cmd (list): The command
+        cancel (CancellationToken, optional): Stops the command when cancelled
+        timeout (float, optional): Seconds before the command is killed, further bounded by the token
+
+    Returns:
+        subprocess.CompletedProcess
+
+    Raises:
+        subprocess.TimeoutExpired: If `timeout` runs out
+        OperationCancelled: If the token is cancelled or its deadline passes
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **NEW_PROCESS_GROUP
+    )
+    try:
+        while True:
+            wait = settings.CANCELLATION_CHECK_INTERVAL if cancel is not None else None
+            if deadline is not None:
+                left = max(0.0, deadline - time.monotonic())
+                wait = left if wait is None else min(wait, left)
+            try:
+                stdout, stderr = process.communicate(timeout=wait)
+                return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                check_cancelled(cancel)
+    except BaseException:
+        kill_process_group(process)
+        process.communicate()
+        raise
+
+
+@contextmanager
+def kill_on_cancel(cancel, kill):
+    """
+    Call `kill` from a watchdog thread if the token is cancelled while the block runs
+
+    For blocking calls that cannot check a token themselves, such as a UNO call
+    into LibreOffice: killing the process makes the call fail, and check() then
+    turns the failure into OperationCancelled.
+    """
+    if cancel is None:
+        yield
+        return
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(settings.CANCELLATION_CHECK_INTERVAL):
+            if cancel.cancelled:
+                logger.warning(f"Stopping a blocked operation: {cancel.reason or 'time budget exceeded'}")
+                kill()
+                return
+
+    watchdog = threading.Thread(target=watch, name='cancel-watchdog', daemon=True)
+    watchdog.start()
+    try:
+        yield
+    except Exception:
+        cancel.check()
+        raise
+    finally:
+        done.set()
+        watchdog.join()
+
+
+def client_disconnect_poll(request):
+    """
+    Return a poll callable that tells whether the client of a request went away
+
+    Under gunicorn the connection's socket is in the WSGI environ. Once the
+    request body has been read, a socket that is readable but has no data left
+    has been closed by the client. Returns None when the server does not
+    expose the socket (e.g. runserver).
+    """
+    sock = request.META.get('gunicorn.socket')
+    if sock is None:
+        return None
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return False
+            return sock.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    return disconnected
@@ -0,0 +1,167 @@
+import os
+import sys
+import shutil
+import threading
+import logging
+import importlib.util
+import importlib.metadata
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Python conversion backends: name -> (import name, distribution name)
+PYTHON_BACKENDS = {
+    'pymupdf': ('fitz', 'PyMuPDF'),
+    'pdf2docx': ('pdf2docx', 'pdf2docx'),
+    'python-docx': ('docx', 'python-docx'),
+    'python-pptx': ('pptx', 'python-pptx'),
+    'openpyxl': ('openpyxl', 'openpyxl'),
+    'reportlab': ('reportlab', 'reportlab'),
+    'pypdf': ('pypdf', 'pypdf'),
+    'pillow': ('PIL', 'Pillow'),
+    'docx2pdf': ('docx2pdf', 'docx2pdf'),
+}
+
+# Backends each operation needs
+OPERATION_BACKENDS = {
+    'convert_to_pdf': ['pillow', 'reportlab'],
+    'pdf_to_docx': ['pdf2docx'],
+    'pdf_to_txt': ['pymupdf'],
+    'pdf_to_pptx': ['pymupdf', 'python-pptx'],
+    'merge_pdf': ['pypdf'],
+    'merge_docx': ['python-docx'],
+    'merge_pptx': ['python-pptx'],
+    'merge_images_to_pdf': ['pillow'],
+}
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+
+def _find_soffice_path():
+    """
+    Locate the LibreOffice executable without spawning any process
+
+    Returns:
+        str or None: Path to soffice, or None if LibreOffice is not installed
+    """
+    libreoffice_paths = [
+        getattr(settings, 'LIBREOFFICE_PATH', None),  # Explicit override
+        'soffice',  # Default PATH
+        'C:\\Program Files\\LibreOffice\\program\\soffice.exe',  # Common Windows path
+        'C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe',  # 32-bit on 64-bit Windows
+        '/usr/bin/soffice',  # Common Linux path
+        '/Applications/LibreOffice.app/Contents/MacOS/soffice',  # Mac path
+    ]
+
+    for path in libreoffice_paths:
+        if not path:
+            continue
+        try:
+            # For absolute paths, just check if they exist
+            if os.path.isabs(path):
+                if os.path.exists(path):
+                    return path
+            # For 'soffice' in PATH, search PATH directly instead of running which/where
+            else:
+                found = shutil.which(path)
+                if found:
+                    return found
+        except Exception as e:
+            logger.warning(f"Error checking LibreOffice path {path}: {str(e)}")
+
+    return None
+
+
+def _read_soffice_version(soffice_path):
+    """Read the LibreOffice version from the versionrc/version.ini next to the binary"""
+    program_dir = os.path.dirname(os.path.realpath(soffice_path))
+    for name in ('versionrc', 'version.ini', '../Resources/versionrc'):
+        version_file = os.path.join(program_dir, name)
+        if not os.path.isfile(version_file):
+            continue
+        try:
+            values = {}
+            with open(version_file, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    if '=' in line:
+                        key, value = line.split('=', 1)
+                        values[key.strip()] = value.strip()
+            return values.get('ProductVersion') or values.get('BuildVersion') or values.get('buildid')
+        except Exception as e:
+            logger.warning(f"Error reading LibreOffice version from {version_file}: {str(e)}")
+    return None
+
+
+def _probe_python_backend(import_name, distribution):
+    """Check that a library is installed without importing it"""
+    if importlib.util.find_spec(import_name) is None:
+        return {'available': False, 'version': None}
+    try:
+        version = importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    return {'available': True, 'version': version}
+
+
+def _build_capabilities():
+    capabilities = {}
+
+    soffice_path = _find_soffice_path()
+    capabilities['libreoffice'] = {
+        'available': soffice_path is not None,
+        'path': soffice_path,
+        'version': _read_soffice_version(soffice_path) if soffice_path else None,
+        'uno': importlib.util.find_spec('uno') is not None,
+    }
+    if soffice_path:
+        logger.info(f"Found LibreOffice at: {soffice_path}")
+    else:
+        logger.warning("LibreOffice not found. Please install it and ensure 'soffice' is in your system's PATH.")
+
+    for name, (import_name, distribution) in PYTHON_BACKENDS.items():
+        capabilities[name] = _probe_python_backend(import_name, distribution)
+
+    # docx2pdf drives Microsoft Word, so it only works on Windows and macOS
+    capabilities['docx2pdf']['installed'] = capabilities['docx2pdf']['available']
+    capabilities['docx2pdf']['available'] = (
+        capabilities['docx2pdf']['installed'] and sys.platform in ('win32', 'darwin')
+    )
+
+    operations = {}
+    for operation, backends in OPERATION_BACKENDS.items():
+        operations[operation] = all(capabilities[backend]['available'] for backend in backends)
+    # Office formats additionally need LibreOffice (or docx2pdf for DOCX)
+    operations['convert_office_to_pdf'] = (
+        capabilities['libreoffice']['available'] or capabilities['docx2pdf']['available']
+    )
+    capabilities['operations'] = operations
+
+    return capabilities
+
+
+def get_converter_capabilities(refresh=False):
+    """
+    Get the converter capability registry, probing the system on first use
+
+    Args:
+        refresh (bool): Probe again instead of returning the cached registry
+
+    Returns:
+        dict: Detected backends and the operations they enable
+    """
+    global _capabilities
+
+    if _capabilities is not None and not refresh:
+        return _capabilities
+
+    with _capabilities_lock:
+        if _capabilities is None or refresh:
+            _capabilities = _build_capabilities()
+        return _capabilities
+
+
+def get_soffice_path():
+    """Path to the LibreOffice executable found at startup, or None"""
+    return get_converter_capabilities()['libreoffice']['path']
@@ -0,0 +1,354 @@
+import os
+import time
+import asyncio
+import uuid
+import threading
+import logging
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DELIVERY_BACKENDS = ('django', 'x-accel-redirect', 'x-sendfile')
+
+# Bytes read per chunk when streaming a file from an async view
+ASYNC_CHUNK_SIZE = 256 * 1024
+
+
+class TemporaryFileResponse(FileResponse):
+    """
+    FileResponse that deletes its file once the response has been sent.
+
+    Django closes the response when the server is done with it (after the last
+    byte, or when the client goes away), so this is where temp outputs are
+    cleaned up. Under gunicorn the file goes through wsgi.file_wrapper, which
+    sends it with os.sendfile instead of copying it through Python.
+    """
+
+    def __init__(self, *args, delete_path=None, **kwargs):
+        self.delete_path = delete_path
+        super().__init__(*args, **kwargs)
+
+    def close(self):
+        super().close()
+        if self.delete_path:
+            remove_file(self.delete_path)
+            self.delete_path = None
+
+
+async def aiter_file(file_path, start=0, length=None):
+    """
+    Yield the bytes of a file, reading each chunk in a worker thread
+
+    Args:
+        file_path (str): Path of the file
+        start (int): Offset of the first byte
+        length (int, optional): Bytes to send, None for the rest of the file
+    """
+    f = await asyncio.to_thread(open, file_path, 'rb')
+    try:
+        if start:
+            f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = ASYNC_CHUNK_SIZE if remaining is None else min(ASYNC_CHUNK_SIZE, remaining)
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class AsyncFileResponse(StreamingHttpResponse):
+    """
+    Response that streams a file to an ASGI server from the event loop.
+
+    Django's ASGI handler can only serve FileResponse's sync iterator by
+    reading the whole file into memory first. Here each chunk is read in a
+    worker thread and sent by the event loop, so a slow client costs a
+    coroutine instead of a thread. Like TemporaryFileResponse, it can delete
+    its file once the response is closed.
+    """
+
+    def __init__(self, file_path, start=0, length=None, delete_path=None, **kwargs):
+        self.delete_path = delete_path
+        super().__init__(aiter_file(file_path, start, length), **kwargs)
+        self['Content-Length'] = str(os.path.getsize(file_path) - start if length is None else length)
+
+    def close(self):
+        super().close()
+        if self.delete_path:
+            remove_file(self.delete_path)
+            self.delete_path = None
+
+
+def remove_file(file_path):
+    """Remove a temp file, logging instead of raising on failure"""
+    logger.debug(f"Cleaning up temporary file {file_path}")
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error cleaning up file {file_path} - {str(e)}")
+
+
+def get_delivery_backend():
+    backend = getattr(settings, 'FILE_DELIVERY_BACKEND', 'django')
+    if backend not in DELIVERY_BACKENDS:
+        logger.warning(f"Unknown FILE_DELIVERY_BACKEND '{backend}', using 'django'")
+        return 'django'
+    return backend
+
+
+def _media_relative_path(file_path):
+    """Path of a file relative to MEDIA_ROOT, or None if it lives elsewhere"""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath([media_root, real_path]) != media_root:
+        return None
+    return os.path.relpath(real_path, media_root)
+
+
+def _handed_off_dir():
+    path = os.path.join(settings.TEMP_DIR, 'delivered')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _hand_off(file_path):
+    """
+    Move a temp output where the fronting server can read it after we return
+
+    The file can't be deleted when the response is closed, because the fronting
+    server only starts reading it then; sweep_handed_off_files removes it later.
+    """
+    handed_off_path = os.path.join(_handed_off_dir(), f"{uuid.uuid4().hex}_{os.path.basename(file_path)}")
+    os.replace(file_path, handed_off_path)
+    # The TTL counts from the hand-off, not from when the conversion started
+    os.utime(handed_off_path)
+    return handed_off_path
+
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def sweep_handed_off_files(force=False):
+    """Remove handed-off files older than FILE_DELIVERY_TEMP_TTL seconds"""
+    global _last_sweep
+
+    now = time.time()
+    with _sweep_lock:
+        if not force and now - _last_sweep < settings.FILE_DELIVERY_SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+
+    handed_off_dir = _handed_off_dir()
+    for filename in os.listdir(handed_off_dir):
+        file_path = os.path.join(handed_off_dir, filename)
+        try:
+            if now - os.path.getmtime(file_path) > settings.FILE_DELIVERY_TEMP_TTL:
+                os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sweeping delivered file {file_path} - {str(e)}")
+
+
+def file_validators(file_path):
+    """
+    ETag and Last-Modified of a stored file
+
+    Returns:
+        tuple: (strong ETag derived from mtime and size, mtime as a Unix timestamp)
+    """
+    stat = os.stat(file_path)
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', int(stat.st_mtime)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """
+    Parse a Range header for a file of `size` bytes
+
+    Only a single byte range is supported; anything else is ignored and the
+    whole file is sent, which RFC 9110 allows.
+
+    Returns:
+        tuple or None: Inclusive (start, end), or None to send the whole file
+
+    Raises:
+        RangeNotSatisfiable: If the range lies outside the file
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+
+    first, last = (part.strip() for part in spec.split('-', 1))
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if end < start and last:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request's If-Range precondition (if any) still holds"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # If-Range requires a strong comparison
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _range_response(file_path, start, end, size, content_type, asynchronous=False):
+    """206 response streaming bytes start..end (inclusive) of a file"""
+    if asynchronous:
+        response = AsyncFileResponse(file_path, start, end - start + 1, status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        return response
+
+    def stream():
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(FileResponse.block_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    response = StreamingHttpResponse(stream(), status=206, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def deliver_stored_file(request, file_path, filename, content_type='application/octet-stream', asynchronous=False):
+    """
+    Send a stored file with conditional GET and byte-range support
+
+    ETag and Last-Modified come from the file's mtime and size. Matching
+    If-None-Match / If-Modified-Since requests get a 304, and a single byte
+    range gets a 206 so interrupted downloads can resume and PDF viewers can
+    load pages progressively. With a fronting-server backend, ranges are left
+    to that server.
+
+    Args:
+        request: The incoming request
+        file_path (str): Path of the stored file
+        filename (str): Download filename for Content-Disposition
+        content_type (str): Content-Type of the response
+        asynchronous (bool): Stream the file from the event loop (for async views)
+
+    Returns:
+        HttpResponse: 200, 206, 304, 412 or 416 response
+    """
+    etag, last_modified = file_validators(file_path)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        size = os.path.getsize(file_path)
+        byte_range = None
+        if get_delivery_backend() == 'django' and if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = parse_range_header(request.headers.get('Range'), size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+
+        if byte_range is not None:
+            response = _range_response(file_path, byte_range[0], byte_range[1], size, content_type, asynchronous)
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+        else:
+            response = deliver_file(file_path, filename, content_type=content_type, asynchronous=asynchronous)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def deliver_file(file_path, filename, content_type='application/octet-stream', delete_after=False,
+                 asynchronous=False):
+    """
+    Build the response that sends a file to the client
+
+    With FILE_DELIVERY_BACKEND = 'x-accel-redirect' (nginx) or 'x-sendfile'
+    (Apache/lighttpd) the fronting server sends the file and the worker is free
+    as soon as the headers are written. The default 'django' backend streams it
+    from the worker, using sendfile where the server supports it.
+
+    Args:
+        file_path (str): Path of the file to send
+        filename (str): Download filename for Content-Disposition
+        content_type (str): Content-Type of the response
+        delete_after (bool): Remove the file once it has been delivered
+        asynchronous (bool): Stream the file from the event loop (for async views under ASGI)
+
+    Returns:
+        HttpResponse: The response to return from the view
+    """
+    backend = get_delivery_backend()
+    relative_path = _media_relative_path(file_path) if backend == 'x-accel-redirect' else None
+
+    if backend == 'django' or (backend == 'x-accel-redirect' and relative_path is None):
+        if asynchronous:
+            response = AsyncFileResponse(
+                file_path, content_type=content_type, delete_path=file_path if delete_after else None
+            )
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+            return response
+        return TemporaryFileResponse(
+            open(file_path, 'rb'),
+            content_type=content_type,
+            as_attachment=True,
+            filename=filename,
+            delete_path=file_path if delete_after else None,
+        )
+
+    if delete_after:
+        sweep_handed_off_files()
+        file_path = _hand_off(file_path)
+        if relative_path is not None:
+            relative_path = _media_relative_path(file_path)
+
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    if backend == 'x-accel-redirect':
+        prefix = settings.FILE_DELIVERY_ACCEL_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = quote(f"{prefix}/{relative_path.replace(os.sep, '/')}")
+    else:
+        response['X-Sendfile'] = os.path.realpath(file_path)
+    return response
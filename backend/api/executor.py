@@ -0,0 +1,435 @@
+import os
+import time
+import uuid
+import atexit
+import asyncio
+import threading
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+from .cancellation import CancellationToken, OperationCancelled, check_cancelled, wait_for_result
+from .timing import span, collect_stages, merge_stages
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusy(Exception):
+    """Raised when a conversion waited CONVERSION_QUEUE_TIMEOUT seconds without getting a slot"""
+
+    status_code = 503
+    retry_after = None
+
+
+class OperationLimits:
+    """
+    Per-operation concurrency limits of one web process.
+
+    A conversion takes a slot of its operation before it runs and gives it back
+    once it has finished, so a burst of one expensive operation (pdf_to_docx)
+    queues on its own limit instead of occupying every executor worker and
+    request thread. Operations without a limit only wait for the executor.
+    """
+
+    def __init__(self, limits):
+        self.limits = {operation: limit for operation, limit in limits.items() if limit > 0}
+        self._semaphores = {operation: threading.BoundedSemaphore(limit) for operation, limit in self.limits.items()}
+        self._lock = threading.Lock()
+        self._running = {}
+        self._waiting = {}
+
+    def _count(self, counts, operation, change):
+        with self._lock:
+            counts[operation] = counts.get(operation, 0) + change
+
+    def acquire(self, operation, cancel=None, timeout=None):
+        """
+        Wait for a slot, checking the token while waiting
+
+        Raises:
+            ExecutorBusy: If no slot frees up within `timeout` seconds
+            OperationCancelled: If the token is cancelled first
+        """
+        semaphore = self._semaphores.get(operation)
+        if semaphore is not None:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            self._count(self._waiting, operation, 1)
+            try:
+                while not semaphore.acquire(timeout=settings.CANCELLATION_CHECK_INTERVAL):
+                    check_cancelled(cancel)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise ExecutorBusy(
+                            f"Too many {operation} conversions in progress, please retry later"
+                        )
+            finally:
+                self._count(self._waiting, operation, -1)
+        self._count(self._running, operation, 1)
+
+    async def acquire_async(self, operation, cancel=None, timeout=None):
+        """acquire() for async views: waits on the event loop instead of blocking a thread"""
+        semaphore = self._semaphores.get(operation)
+        if semaphore is not None:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            self._count(self._waiting, operation, 1)
+            try:
+                while not semaphore.acquire(blocking=False):
+                    check_cancelled(cancel)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise ExecutorBusy(
+                            f"Too many {operation} conversions in progress, please retry later"
+                        )
+                    await asyncio.sleep(settings.CANCELLATION_CHECK_INTERVAL)
+            finally:
+                self._count(self._waiting, operation, -1)
+        self._count(self._running, operation, 1)
+
+    def release(self, operation):
+        self._count(self._running, operation, -1)
+        semaphore = self._semaphores.get(operation)
+        if semaphore is not None:
+            semaphore.release()
+
+    def status(self):
+        with self._lock:
+            return {
+                operation: {
+                    'limit': self.limits.get(operation),
+                    'running': self._running.get(operation, 0),
+                    'waiting': self._waiting.get(operation, 0),
+                }
+                for operation in sorted(set(self.limits) | set(self._running))
+            }
+
+
+# True in the executor's worker processes, where conversions run inline
+_in_worker = False
+
+
+def in_executor_worker():
+    """Whether this process is one of the conversion executor's workers"""
+    return _in_worker
+
+
+def _init_worker():
+    """Set up a freshly spawned worker process"""
+    global _in_worker
+    _in_worker = True
+
+    import django
+    django.setup()
+
+    from .soffice_pool import disable_soffice_pool
+    from .utils import preload_converters
+
+    # The LibreOffice pool is sized per web process; workers run soffice one-shot
+    disable_soffice_pool()
+    # Workers exist to convert, so they pay for the conversion libraries up front
+    preload_converters()
+
+
+def _run_task(func, args, kwargs, timeout, cancel_path):
+    """
+    Run a conversion in a worker process
+
+    The caller's token cannot cross the process boundary, so the worker gets
+    one with the time that was left, which also stops once the caller creates
+    the file at `cancel_path`.
+
+    Returns:
+        tuple: (result, stage durations recorded while converting)
+    """
+    cancel = CancellationToken(timeout=timeout, poll=lambda: os.path.exists(cancel_path))
+    with collect_stages() as timing:
+        result = func(*args, cancel=cancel, **kwargs)
+    return result, timing.stages
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ConversionExecutor:
+    """
+    Bounded pool of worker processes that conversions are handed to.
+
+    The request thread (or job thread) that submits a conversion only waits for
+    it, so under gunicorn's gthread workers the other threads of the process
+    keep answering health checks, job polls and downloads while conversions
+    run. Workers are started with 'spawn' rather than forked from a process
+    that is already running request and job threads.
+
+    After `max_tasks` tasks the worker processes are replaced, to bound leaks in
+    the conversion libraries. ProcessPoolExecutor's own max_tasks_per_child can
+    deadlock before Python 3.12, so the whole pool is retired instead: it
+    finishes the tasks it has while a new one takes the next.
+    """
+
+    def __init__(self, workers, max_tasks=None):
+        self.pid = os.getpid()
+        self.workers = workers
+        self.max_tasks = max_tasks
+        self.broken = False
+        self.submitted = 0
+        os.makedirs(settings.CONVERSION_EXECUTOR_DIR, exist_ok=True)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._pool_tasks = 0
+        self._pool = self._start_pool()
+
+    def _start_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+
+    def _submit(self, *args):
+        with self._lock:
+            if self.max_tasks and self._pool_tasks >= self.max_tasks:
+                retired, self._pool = self._pool, self._start_pool()
+                retired.shutdown(wait=False)
+                self._pool_tasks = 0
+            future = self._pool.submit(*args)
+            self._pool_tasks += 1
+            self.submitted += 1
+            self._running += 1
+            return future
+
+    def _task_done(self):
+        with self._lock:
+            self._running -= 1
+
+    def _start(self, func, args, kwargs, cancel, on_done):
+        """Submit a task; returns (future, path of the file that tells the worker to stop)"""
+        cancel_path = os.path.join(settings.CONVERSION_EXECUTOR_DIR, f"{uuid.uuid4().hex}.cancel")
+        try:
+            check_cancelled(cancel)
+            timeout = cancel.remaining() if cancel is not None else None
+            future = self._submit(_run_task, func, args, kwargs, timeout, cancel_path)
+        except BaseException as e:
+            if isinstance(e, BrokenProcessPool):
+                self.broken = True
+            if on_done is not None:
+                on_done()
+            raise
+
+        def done(future):
+            self._task_done()
+            _remove(cancel_path)
+            if on_done is not None:
+                on_done()
+
+        future.add_done_callback(done)
+        return future, cancel_path
+
+    @staticmethod
+    def _stop(future, cancel_path):
+        """Tell a running worker to stop; a queued task is simply dropped"""
+        if not future.cancel():
+            open(cancel_path, 'w').close()
+            if future.done():
+                _remove(cancel_path)
+
+    def run(self, func, args, kwargs, cancel=None, on_done=None):
+        """
+        Run func(*args, cancel=..., **kwargs) in a worker and wait for its result
+
+        Arguments, keyword arguments and the result must be picklable; a
+        progress callback such as JobProgressReporter is recreated in the
+        worker and reports from there.
+
+        Args:
+            cancel (CancellationToken, optional): Stops the conversion in the worker when cancelled
+            on_done (callable, optional): Called once the worker has finished with the task, even
+                after the caller stopped waiting for it
+
+        Raises:
+            OperationCancelled: If the token is cancelled first; the worker stops within
+                CANCELLATION_CHECK_INTERVAL seconds
+        """
+        future, cancel_path = self._start(func, args, kwargs, cancel, on_done)
+        try:
+            result, stages = wait_for_result(future, cancel)
+        except OperationCancelled:
+            self._stop(future, cancel_path)
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the whole pool on next use
+            self.broken = True
+            raise
+        merge_stages(stages)
+        return result
+
+    async def run_async(self, func, args, kwargs, cancel=None, on_done=None):
+        """run() for async views: the event loop waits for the worker, no thread is held"""
+        future, cancel_path = self._start(func, args, kwargs, cancel, on_done)
+        waiter = asyncio.wrap_future(future)
+        try:
+            while True:
+                check_cancelled(cancel)
+                try:
+                    # shield() keeps a timed-out wait from cancelling the task itself
+                    result, stages = await asyncio.wait_for(
+                        asyncio.shield(waiter), settings.CANCELLATION_CHECK_INTERVAL
+                    )
+                    break
+                except asyncio.TimeoutError:
+                    continue
+        except (OperationCancelled, asyncio.CancelledError):
+            # Nobody waits for the result any more
+            waiter.cancel()
+            self._stop(future, cancel_path)
+            raise
+        except BrokenProcessPool:
+            self.broken = True
+            raise
+        merge_stages(stages)
+        return result
+
+    def status(self):
+        with self._lock:
+            running = self._running
+        return {'workers': self.workers, 'running': running, 'submitted': self.submitted, 'broken': self.broken}
+
+    def shutdown(self):
+        with self._lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+_limits = None
+_executor_lock = threading.Lock()
+
+
+def get_operation_limits():
+    """The per-operation concurrency limits of this process"""
+    global _limits
+    with _executor_lock:
+        if _limits is None:
+            _limits = OperationLimits(settings.CONVERSION_CONCURRENCY_LIMITS)
+        return _limits
+
+
+def get_conversion_executor():
+    """
+    The conversion executor of this process, created on first use
+
+    Returns:
+        ConversionExecutor or None: None when CONVERSION_EXECUTOR_ENABLED is off
+            or inside an executor worker
+    """
+    global _executor
+
+    if not settings.CONVERSION_EXECUTOR_ENABLED or _in_worker:
+        return None
+
+    with _executor_lock:
+        # A forked process (gunicorn --preload) must not share its parent's executor
+        if _executor is not None and _executor.pid != os.getpid():
+            _executor = None
+
+        if _executor is not None and _executor.broken:
+            _executor.shutdown()
+            _executor = None
+
+        if _executor is None:
+            workers = settings.CONVERSION_EXECUTOR_WORKERS
+            workers = workers if workers > 0 else (os.cpu_count() or 1)
+            _executor = ConversionExecutor(workers, settings.CONVERSION_EXECUTOR_MAX_TASKS)
+            logger.info(f"Created conversion executor with {workers} worker(s) for process {os.getpid()}")
+
+        return _executor
+
+
+_DEFAULT = object()
+
+
+def run_conversion(operation, func, *args, cancel=None, queue_timeout=_DEFAULT, **kwargs):
+    """
+    Run a conversion under its operation's concurrency limit, in the executor if it is one of
+    CONVERSION_EXECUTOR_OPERATIONS and in the calling thread otherwise
+
+    Args:
+        operation (str): Operation whose limit applies, e.g. 'pdf_to_docx'
+        func (callable): Module-level function taking a `cancel` keyword, such as convert_file
+        cancel (CancellationToken, optional): Stops the wait and the conversion when cancelled
+        queue_timeout (float, optional): Seconds to wait for a slot, None to wait as long as it
+            takes; defaults to CONVERSION_QUEUE_TIMEOUT
+
+    Returns:
+        The result of func
+
+    Raises:
+        ExecutorBusy: If no slot frees up in time
+    """
+    if queue_timeout is _DEFAULT:
+        queue_timeout = settings.CONVERSION_QUEUE_TIMEOUT
+
+    limits = get_operation_limits()
+    with span('queue'):
+        limits.acquire(operation, cancel, queue_timeout)
+
+    executor = None
+    try:
+        if operation in settings.CONVERSION_EXECUTOR_OPERATIONS:
+            executor = get_conversion_executor()
+        if executor is None:
+            return func(*args, cancel=cancel, **kwargs)
+    finally:
+        if executor is None:
+            limits.release(operation)
+
+    # The slot is given back when the worker is done, not when the caller stops waiting
+    return executor.run(func, args, kwargs, cancel, on_done=lambda: limits.release(operation))
+
+
+async def run_conversion_async(operation, func, *args, cancel=None, queue_timeout=_DEFAULT, **kwargs):
+    """
+    run_conversion() for async views
+
+    Waits for the slot and the result on the event loop. Operations that are
+    not run in the executor get a worker thread for the conversion itself.
+    """
+    if queue_timeout is _DEFAULT:
+        queue_timeout = settings.CONVERSION_QUEUE_TIMEOUT
+
+    limits = get_operation_limits()
+    with span('queue'):
+        await limits.acquire_async(operation, cancel, queue_timeout)
+
+    executor = None
+    try:
+        if operation in settings.CONVERSION_EXECUTOR_OPERATIONS:
+            executor = get_conversion_executor()
+        if executor is None:
+            return await asyncio.to_thread(func, *args, cancel=cancel, **kwargs)
+    finally:
+        if executor is None:
+            limits.release(operation)
+
+    return await executor.run_async(func, args, kwargs, cancel, on_done=lambda: limits.release(operation))
+
+
+def get_executor_status():
+    """Describe the executor and operation limits of this process for the health endpoint"""
+    executor = _executor if _executor is not None and _executor.pid == os.getpid() else None
+    status = {
+        'enabled': settings.CONVERSION_EXECUTOR_ENABLED,
+        'started': executor is not None,
+        'operations': get_operation_limits().status(),
+    }
+    if executor is not None:
+        status.update(executor.status())
+    return status
+
+
+@atexit.register
+def shutdown_conversion_executor():
+    if _executor is not None and _executor.pid == os.getpid():
+        _executor.shutdown()
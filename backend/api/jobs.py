@@ -0,0 +1,340 @@
+import os
+import threading
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cancellation import CancellationToken
+from .models import ProcessedFile, MergeJob, MergeFile
+from .progress import JobProgressReporter
+from .executor import ExecutorBusy, run_conversion
+from .utils import get_file_extension, convert_file, merge_files
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(ExecutorBusy):
+    """Raised when JOB_QUEUE_MAX_DEPTH jobs are already waiting or running"""
+
+    status_code = 429
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def queue_depth():
+    """Number of jobs that are pending or processing"""
+    return sum(
+        model.objects.filter(status__in=['pending', 'processing']).count()
+        for model in (ProcessedFile, MergeJob)
+    )
+
+
+def check_queue_depth():
+    """
+    Turn a new job away while the queue is full
+
+    The check and the insert that follows are not atomic, so concurrent requests can
+    overshoot the limit by a few jobs; it bounds the backlog, not an exact count.
+
+    Raises:
+        JobQueueFull: JOB_QUEUE_MAX_DEPTH jobs are already queued or running
+    """
+    max_depth = settings.JOB_QUEUE_MAX_DEPTH
+    if max_depth <= 0:
+        return
+    depth = queue_depth()
+    if depth >= max_depth:
+        raise JobQueueFull(
+            f"Job queue is full ({depth}/{max_depth} jobs waiting or running), please retry later",
+            settings.JOB_QUEUE_RETRY_AFTER,
+        )
+
+
+def get_job_queue_status():
+    """Queue depth against its limit, for the health check"""
+    return {
+        "depth": queue_depth(),
+        "max_depth": settings.JOB_QUEUE_MAX_DEPTH,
+    }
+
+
+def enqueue_processed_file(uploaded_file, operation):
+    """
+    Store an upload as a pending ProcessedFile for the job workers
+
+    Args:
+        uploaded_file: The uploaded file object
+        operation (str): The operation to perform (e.g., 'convert_to_pdf')
+
+    Returns:
+        ProcessedFile: The queued job
+
+    Raises:
+        JobQueueFull: The queue is full; nothing is stored
+    """
+    check_queue_depth()
+    job = ProcessedFile.objects.create(
+        original_filename=uploaded_file.name,
+        file_type=get_file_extension(uploaded_file.name),
+        file=uploaded_file,
+        operation=operation,
+        status='pending',
+    )
+    logger.info(f"Queued ProcessedFile job {job.id} ({operation})")
+    get_job_worker_pool().notify()
+    return job
+
+
+def enqueue_merge_job(files, output_filename, file_type):
+    """
+    Store uploads as a pending MergeJob for the job workers
+
+    Args:
+        files: List of uploaded file objects, in merge order
+        output_filename (str): Name for the output file
+        file_type (str): Type of files being merged (pdf, docx, pptx)
+
+    Returns:
+        MergeJob: The queued job
+
+    Raises:
+        JobQueueFull: The queue is full; nothing is stored
+    """
+    check_queue_depth()
+
+    # Workers only see the job once all of its files are stored
+    with transaction.atomic():
+        job = MergeJob.objects.create(
+            output_filename=output_filename,
+            file_type=file_type,
+            status='pending',
+        )
+        for order, uploaded_file in enumerate(files):
+            MergeFile.objects.create(
+                merge_job=job,
+                original_filename=uploaded_file.name,
+                file=uploaded_file,
+                order=order,
+            )
+    logger.info(f"Queued MergeJob {job.id} ({len(files)} {file_type} files)")
+    get_job_worker_pool().notify()
+    return job
+
+
+def _claimable():
+    """Pending jobs, plus processing jobs whose worker went away"""
+    stale_before = timezone.now() - timedelta(seconds=settings.JOB_QUEUE_STALE_AFTER)
+    return Q(status='pending') | Q(status='processing', updated_at__lt=stale_before)
+
+
+def claim_next_job():
+    """
+    Atomically claim the oldest queued job
+
+    The claim is a conditional UPDATE, so concurrent workers in any process never
+    pick up the same job.
+
+    Returns:
+        ProcessedFile or MergeJob or None
+    """
+    candidates = []
+    for model in (ProcessedFile, MergeJob):
+        for job_id, created_at in model.objects.filter(_claimable()).order_by('created_at').values_list('id', 'created_at')[:10]:
+            candidates.append((created_at, model, job_id))
+
+    for _, model, job_id in sorted(candidates, key=lambda candidate: candidate[0]):
+        claimed = model.objects.filter(_claimable(), id=job_id).update(
+            status='processing', updated_at=timezone.now(),
+            progress_stage='', progress_current=0, progress_total=0,
+        )
+        if claimed:
+            return model.objects.get(id=job_id)
+
+    return None
+
+
+def cancel_job(job):
+    """
+    Cancel a pending or running job
+
+    A running job notices within JOB_CANCEL_POLL_INTERVAL seconds and stops,
+    killing any LibreOffice process it started.
+
+    Returns:
+        bool: False if the job had already finished
+    """
+    cancelled = type(job).objects.filter(id=job.id, status__in=['pending', 'processing']).update(
+        status='cancelled', error_message='Cancelled by the client', updated_at=timezone.now()
+    )
+    if cancelled:
+        logger.info(f"Cancelled job {job.id}")
+    return bool(cancelled)
+
+
+def _cancellation_token(job):
+    """Token that is cancelled once the job is no longer 'processing' (i.e. it was cancelled)"""
+    model = type(job)
+    return CancellationToken(
+        poll=lambda: not model.objects.filter(id=job.id, status='processing').exists(),
+        poll_interval=settings.JOB_CANCEL_POLL_INTERVAL,
+    )
+
+
+def _save_finished_job(job, stored_file):
+    """Save a finished job, unless it was cancelled in the meantime"""
+    # Keep the last reported progress rather than the values loaded at claim time
+    job.refresh_from_db(fields=['progress_stage', 'progress_current', 'progress_total'])
+    with transaction.atomic():
+        # Locks the row, so a concurrent cancel either lands first or waits for this save
+        if type(job).objects.select_for_update().filter(id=job.id, status='processing').exists():
+            job.save()
+            return
+    logger.info(f"Job {job.id} was cancelled, discarding its result")
+    if stored_file:
+        stored_file.delete(save=False)
+
+
+def run_processed_file(job):
+    """Run a claimed ProcessedFile job and store its result"""
+    output_path = None
+    try:
+        output_path, output_filename = run_conversion(
+            job.operation, convert_file, job.file.path, job.original_filename, job.operation,
+            progress=JobProgressReporter(job), cancel=_cancellation_token(job), queue_timeout=None,
+        )
+        with open(output_path, 'rb') as f:
+            job.processed_file.save(output_filename, File(f), save=False)
+        job.processed_filename = output_filename
+        job.status = 'completed'
+        job.error_message = None
+        logger.info(f"ProcessedFile job {job.id} completed")
+    except Exception as e:
+        logger.error(f"ProcessedFile job {job.id} failed: {str(e)}")
+        job.status = 'failed'
+        job.error_message = str(e)
+    finally:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+    _save_finished_job(job, job.processed_file)
+
+
+def run_merge_job(job):
+    """Run a claimed MergeJob and store its result"""
+    output_path = None
+    try:
+        file_paths = [merge_file.file.path for merge_file in job.files.all()]
+        # Mixed merges are stored as 'pdf' jobs whose files are not all PDFs
+        mixed = any(get_file_extension(file_path) != job.file_type for file_path in file_paths)
+        output_path = run_conversion(
+            'merge_files', merge_files, file_paths, job.output_filename, job.file_type, mixed=mixed,
+            progress=JobProgressReporter(job), cancel=_cancellation_token(job), queue_timeout=None,
+        )
+        with open(output_path, 'rb') as f:
+            job.merged_file.save(f"{os.path.basename(job.output_filename)}.{job.file_type}", File(f), save=False)
+        job.status = 'completed'
+        job.error_message = None
+        logger.info(f"MergeJob {job.id} completed")
+    except Exception as e:
+        logger.error(f"MergeJob {job.id} failed: {str(e)}")
+        job.status = 'failed'
+        job.error_message = str(e)
+    finally:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+    _save_finished_job(job, job.merged_file)
+
+
+def run_job(job):
+    if isinstance(job, MergeJob):
+        run_merge_job(job)
+    else:
+        run_processed_file(job)
+
+
+class JobWorkerPool:
+    """
+    Worker threads that process queued jobs from the database.
+
+    The database is the only queue store, so any number of web processes and
+    dedicated `manage.py run_job_worker` processes can share the work.
+    """
+
+    def __init__(self, workers, poll_interval):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.pid = os.getpid()
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.workers} job worker thread(s) in process {self.pid}")
+
+    def notify(self):
+        """Wake the workers up because a job was queued"""
+        self.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = None
+            try:
+                close_old_connections()
+                job = claim_next_job()
+                if job is not None:
+                    run_job(job)
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+            finally:
+                close_old_connections()
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_job_worker_pool(workers=None):
+    """Get the job worker pool of this process"""
+    global _pool
+
+    with _pool_lock:
+        # A pool inherited across fork has no running threads in this process
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = JobWorkerPool(
+                workers=workers if workers is not None else settings.JOB_QUEUE_WORKERS,
+                poll_interval=settings.JOB_QUEUE_POLL_INTERVAL,
+            )
+        return _pool
+
+
+def start_job_workers():
+    """Start this process's job workers if they are enabled"""
+    if settings.JOB_QUEUE_WORKERS > 0:
+        get_job_worker_pool().start()
@@ -0,0 +1,357 @@
+import io
+import os
+import math
+import sys
+import time
+import uuid
+import random
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+import logging
+from django.conf import settings
+
+from .benchmarks import make_text_pdf, make_docx, make_image
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Request types the load generator can replay, as `--mix` names
+REQUEST_TYPES = [
+    'upload:convert_to_pdf',
+    'upload:pdf_to_txt',
+    'upload:pdf_to_docx',
+    'upload:pdf_to_pptx',
+    'merge:pdf',
+    'merge:mixed',
+    'images-to-pdf',
+]
+
+DEFAULT_MIX = 'upload:pdf_to_txt=4,upload:pdf_to_docx=2,upload:convert_to_pdf=1,merge:pdf=2,images-to-pdf=1'
+
+
+def parse_mix(spec):
+    """
+    Parse a request mix like 'upload:pdf_to_txt=4,merge:pdf=1'
+
+    Returns:
+        dict: Request type -> weight
+
+    Raises:
+        ValueError: If a type is unknown or a weight is not a positive number
+    """
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in REQUEST_TYPES:
+            raise ValueError(f"Unknown request type {name!r}. Valid types: {', '.join(REQUEST_TYPES)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name}: {weight!r}")
+        if mix[name] <= 0:
+            raise ValueError(f"Weight for {name} must be positive")
+    return mix
+
+
+def make_fixtures(workdir, pages, image_size):
+    """
+    Write the input files the requests upload
+
+    Returns:
+        dict: Fixture name -> (path, content type)
+    """
+    width, height = image_size
+    return {
+        'pdf': (make_text_pdf(os.path.join(workdir, 'load.pdf'), pages), 'application/pdf'),
+        'pdf2': (make_text_pdf(os.path.join(workdir, 'load2.pdf'), pages), 'application/pdf'),
+        'docx': (
+            make_docx(os.path.join(workdir, 'load.docx'), pages),
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        ),
+        'jpg': (make_image(os.path.join(workdir, 'load.jpg'), width, height, 1), 'image/jpeg'),
+        'jpg2': (make_image(os.path.join(workdir, 'load2.jpg'), width, height, 2), 'image/jpeg'),
+    }
+
+
+def encode_multipart(fields, files):
+    """
+    Encode a multipart/form-data body
+
+    Args:
+        fields (dict): Form fields
+        files (list): (field name, file name, content type, bytes) tuples
+
+    Returns:
+        tuple: (body bytes, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        )
+    for name, filename, content_type, content in files:
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8')
+        )
+        body.write(content)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('utf-8'))
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class RequestFactory:
+    """
+    Build the HTTP requests of each type from the fixtures.
+
+    By default a few unique bytes are appended to every uploaded file. PDF,
+    JPEG and ZIP-based formats ignore trailing data, and it keeps repeated
+    uploads from being served by the conversion result cache, which would
+    otherwise make the load look much lighter than real traffic.
+    """
+
+    def __init__(self, base_url, fixtures, unique_inputs=True):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.unique_inputs = unique_inputs
+        self.contents = {}
+        for name, (path, content_type) in fixtures.items():
+            with open(path, 'rb') as f:
+                self.contents[name] = (os.path.basename(path), content_type, f.read())
+
+    def _file(self, field, fixture):
+        filename, content_type, content = self.contents[fixture]
+        if self.unique_inputs:
+            content += f"\n%{uuid.uuid4().hex}\n".encode('ascii')
+        return field, filename, content_type, content
+
+    def build(self, request_type):
+        """
+        Returns:
+            urllib.request.Request
+        """
+        kind, _, variant = request_type.partition(':')
+        if kind == 'upload':
+            path = 'upload/'
+            fixture = 'docx' if variant == 'convert_to_pdf' else 'pdf'
+            fields, files = {'operation': variant}, [self._file('file', fixture)]
+        elif kind == 'merge':
+            path = 'merge/'
+            second = 'docx' if variant == 'mixed' else 'pdf2'
+            fields = {'output_filename': 'load', 'file_type': 'pdf', 'mixed': str(variant == 'mixed').lower()}
+            files = [self._file('files', 'pdf'), self._file('files', second)]
+        else:
+            path = 'images-to-pdf/'
+            fields, files = {'output_filename': 'load'}, [self._file('files', 'jpg'), self._file('files', 'jpg2')]
+
+        body, content_type = encode_multipart(fields, files)
+        return urllib.request.Request(
+            self.base_url + path, data=body, method='POST', headers={'Content-Type': content_type}
+        )
+
+
+def send(request, timeout):
+    """
+    Send a request and read the whole response
+
+    Returns:
+        tuple: (HTTP status or None, response bytes, error message or None)
+    """
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, len(response.read()), None
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, 0, f"HTTP {e.code}"
+    except Exception as e:
+        return None, 0, f"{type(e).__name__}: {str(e)}"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def summarize(samples, elapsed):
+    """
+    Latency distribution and throughput of a list of samples
+
+    Args:
+        samples (list): (request type, latency in seconds, status, bytes, error) tuples
+        elapsed (float): Seconds the samples were collected over
+
+    Returns:
+        dict
+    """
+    latencies = sorted(sample[1] for sample in samples)
+    errors = [sample for sample in samples if sample[4] is not None]
+    succeeded = len(samples) - len(errors)
+    return {
+        'requests': len(samples),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4) if samples else 0.0,
+        'throughput': round(succeeded / elapsed, 3) if elapsed else 0.0,
+        'p50': _round(percentile(latencies, 0.50)),
+        'p90': _round(percentile(latencies, 0.90)),
+        'p99': _round(percentile(latencies, 0.99)),
+        'max': _round(latencies[-1] if latencies else None),
+        'mean': _round(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 4)
+
+
+def run_level(factory, mix, concurrency, duration, timeout, seed):
+    """
+    Keep `concurrency` requests in flight for `duration` seconds
+
+    Each client thread sends its next request as soon as the previous one has
+    been answered (a closed loop), picking request types by their weights in
+    the mix.
+
+    Returns:
+        dict: Summary of the level overall and per request type, plus the errors seen
+    """
+    samples = []
+    samples_lock = threading.Lock()
+    types, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.monotonic() < deadline:
+            request_type = rng.choices(types, weights)[0]
+            request = factory.build(request_type)
+            start = time.perf_counter()
+            status, size, error = send(request, timeout)
+            sample = (request_type, time.perf_counter() - start, status, size, error)
+            with samples_lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests in flight at the deadline still finish, so count the time they took
+    elapsed = time.monotonic() - start
+
+    by_type = {}
+    for request_type in types:
+        type_samples = [sample for sample in samples if sample[0] == request_type]
+        if type_samples:
+            by_type[request_type] = summarize(type_samples, elapsed)
+
+    error_counts = {}
+    for sample in samples:
+        if sample[4] is not None:
+            error_counts[sample[4]] = error_counts.get(sample[4], 0) + 1
+
+    return dict(
+        concurrency=concurrency, elapsed=round(elapsed, 3), **summarize(samples, elapsed),
+        by_type=by_type, error_messages=error_counts,
+    )
+
+
+def find_knee(levels, min_gain=0.1, max_error_rate=0.01):
+    """
+    Find where the server saturates
+
+    The knee is the highest concurrency that still raised throughput by at
+    least `min_gain` over the previous level without pushing the error rate
+    past `max_error_rate`. Beyond it, extra clients only queue and latency
+    grows.
+
+    Args:
+        levels (list): run_level results in increasing concurrency
+
+    Returns:
+        dict: The knee level's concurrency, throughput and p99, and why the next level did not scale,
+            or None if there are no levels
+    """
+    if not levels:
+        return None
+    knee = levels[0]
+    reason = None
+    for level in levels[1:]:
+        if level['error_rate'] > max_error_rate:
+            reason = f"error rate {level['error_rate']:.1%} at concurrency {level['concurrency']}"
+            break
+        if level['throughput'] < knee['throughput'] * (1 + min_gain):
+            reason = (
+                f"throughput {level['throughput']}/s at concurrency {level['concurrency']} "
+                f"is less than {min_gain:.0%} above {knee['throughput']}/s"
+            )
+            break
+        knee = level
+    return {
+        'concurrency': knee['concurrency'],
+        'throughput': knee['throughput'],
+        'p99': knee['p99'],
+        'saturated': reason is not None,
+        'reason': reason or 'throughput was still growing at the highest concurrency tested',
+    }
+
+
+class LocalServer:
+    """
+    A gunicorn server for the project, started for the duration of a load test
+
+    Runs the same WSGI application as the Dockerfile with the given number of
+    workers, so the knee can be measured for that worker count. With more than
+    one thread per worker gunicorn uses threaded (gthread) workers, as the
+    Dockerfile does; with one it uses sync workers.
+    """
+
+    def __init__(self, workers, port, timeout=120, threads=1):
+        self.workers = workers
+        self.threads = threads
+        self.port = port
+        self.timeout = timeout
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/api/"
+
+    def start(self, startup_timeout=60):
+        cmd = [
+            sys.executable, '-m', 'gunicorn',
+            '--workers', str(self.workers),
+            '--worker-class', 'gthread' if self.threads > 1 else 'sync',
+            '--threads', str(self.threads),
+            '--bind', f"127.0.0.1:{self.port}",
+            '--timeout', str(self.timeout),
+            'agam.wsgi:application',
+        ]
+        logger.info(f"Starting gunicorn: {' '.join(cmd)}")
+        self.process = subprocess.Popen(cmd, cwd=settings.BASE_DIR)
+
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {self.process.returncode}")
+            status, _, _ = send(urllib.request.Request(self.base_url + 'health/'), timeout=5)
+            if status == 200:
+                return
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"gunicorn did not answer within {startup_timeout}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
@@ -0,0 +1,86 @@
+import os
+import time
+from contextlib import contextmanager
+
+# fcntl is POSIX only; Windows falls back to msvcrt byte-range locks
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(lock_file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _still_linked(path, lock_file):
+    """Whether `path` still names the locked file, which a previous holder may have removed"""
+    try:
+        path_stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    file_stat = os.fstat(lock_file.fileno())
+    return (path_stat.st_dev, path_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino)
+
+
+@contextmanager
+def file_lock(path, blocking=True, timeout=None, poll_interval=0.05):
+    """
+    Hold an exclusive lock on a lock file, shared by every process on the host
+
+    The holder may remove the lock file while holding the lock (e.g. once the
+    work it guards is done). Whoever was waiting on the removed file then
+    locks the file now at `path` instead, so two holders never overlap.
+
+    Args:
+        path (str): Path to the lock file (created if missing)
+        blocking (bool): Wait for the lock instead of giving up immediately
+        timeout (float, optional): Maximum seconds to wait when blocking
+        poll_interval (float): Seconds between attempts while waiting
+
+    Yields:
+        bool: True if the lock was acquired
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        lock_file = open(path, 'a+')
+        try:
+            acquired = _try_lock(lock_file)
+            while not acquired and blocking:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                time.sleep(poll_interval)
+                acquired = _try_lock(lock_file)
+            if not acquired or _still_linked(path, lock_file):
+                break
+            _unlock(lock_file)
+        except BaseException:
+            lock_file.close()
+            raise
+        lock_file.close()
+
+    with lock_file:
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _unlock(lock_file)
@@ -0,0 +1,69 @@
+import json
+import shutil
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import BENCHMARKS, IMAGE_BENCHMARKS, environment_info, compare_results, parse_image_size
+
+
+class Command(BaseCommand):
+    help = 'Benchmark conversion and merge operations on synthetic fixtures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operation', choices=sorted(BENCHMARKS), action='append',
+                            help='Operation to benchmark (repeatable, default: all)')
+        parser.add_argument('--pages', type=int, nargs='+', default=[500],
+                            help='Input sizes in pages (slides for PPTX); each size is benchmarked')
+        parser.add_argument('--images', type=int, default=10, help='Images merged by merge_images_to_pdf')
+        parser.add_argument('--image-size', default='4000x3000', help='Size of the synthetic images, WIDTHxHEIGHT')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+        parser.add_argument('--workers', type=int, default=0, help='Worker processes for parallel modes (0 = setting)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare median wall times with')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['images'] < 1 or min(options['pages']) < 1:
+            raise CommandError('--repeat, --pages and --images must be positive')
+        try:
+            image_size = parse_image_size(options['image_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            # Older result files are a bare list of rows
+            baseline = baseline['results'] if isinstance(baseline, dict) else baseline
+
+        results = []
+        workdir = tempfile.mkdtemp(prefix='agam_bench_')
+        try:
+            for operation in options['operation'] or sorted(BENCHMARKS):
+                # Image merges are sized by --images, so they run once
+                sizes = [None] if operation in IMAGE_BENCHMARKS else options['pages']
+                for pages in sizes:
+                    self.stdout.write(f"Benchmarking {operation}" + (f" ({pages} pages)..." if pages else "..."))
+                    rows = BENCHMARKS[operation](workdir, {
+                        'pages': pages,
+                        'repeat': options['repeat'],
+                        'workers': options['workers'],
+                        'images': options['images'],
+                        'image_size': image_size,
+                    })
+                    for row in rows:
+                        self.stdout.write('  ' + ', '.join(f"{key}={value}" for key, value in row.items()))
+                    results.extend(rows)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        if baseline is not None:
+            self.stdout.write('Median wall time compared with ' + options['compare'] + ':')
+            for key, before, after, change in compare_results(results, baseline):
+                label = ', '.join(f"{field}={value}" for field, value in key)
+                self.stdout.write(f"  {label}: {before}s -> {after}s ({change:+.1%})")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,35 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import measure_startup
+from api.utils import CONVERTER_LIBRARIES
+
+
+class Command(BaseCommand):
+    help = 'Measure server process startup time and memory, with and without preloading the conversion libraries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per measurement')
+        parser.add_argument('--per-library', action='store_true',
+                            help='Also measure the import of each conversion library on its own')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive')
+
+        modes = ['lazy', 'preload'] + (CONVERTER_LIBRARIES if options['per_library'] else [])
+        results = []
+        for mode in modes:
+            self.stdout.write(f"Measuring {mode}...")
+            try:
+                row = measure_startup(mode, options['repeat'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stdout.write('  ' + ', '.join(f"{key}={value}" for key, value in row.items()))
+            results.append(row)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
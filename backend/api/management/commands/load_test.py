@@ -0,0 +1,106 @@
+import json
+import shutil
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import parse_image_size
+from api.loadtest import (
+    DEFAULT_MIX, RequestFactory, LocalServer, parse_mix, make_fixtures, run_level, find_knee
+)
+
+
+class Command(BaseCommand):
+    help = 'Replay a mix of upload, merge and images-to-pdf requests against a server at rising concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api/', help='Base URL of the API under test')
+        parser.add_argument('--start-server', type=int, metavar='WORKERS',
+                            help='Start gunicorn with this many workers for the test instead of using --url')
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Threads per worker for --start-server; more than 1 uses gthread workers')
+        parser.add_argument('--port', type=int, default=8765, help='Port for --start-server')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Weighted request types, e.g. "upload:pdf_to_txt=4,merge:pdf=1"')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                            help='Concurrent clients at each level, in increasing order')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds per concurrency level')
+        parser.add_argument('--timeout', type=float, default=120, help='Seconds before a request counts as failed')
+        parser.add_argument('--pages', type=int, default=5, help='Pages in the uploaded PDFs and DOCX')
+        parser.add_argument('--image-size', default='2000x1500', help='Size of the uploaded images, WIDTHxHEIGHT')
+        parser.add_argument('--allow-cache-hits', action='store_true',
+                            help='Upload identical files, so repeats can be served by the result cache')
+        parser.add_argument('--knee-gain', type=float, default=0.1,
+                            help='Minimum relative throughput gain for a level to count as still scaling')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the request mix')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        levels = options['concurrency']
+        if min(levels) < 1 or levels != sorted(levels):
+            raise CommandError('--concurrency must be positive and in increasing order')
+        if options['duration'] <= 0 or options['pages'] < 1 or options['threads'] < 1:
+            raise CommandError('--duration, --pages and --threads must be positive')
+        try:
+            mix = parse_mix(options['mix'])
+            image_size = parse_image_size(options['image_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        server = None
+        base_url = options['url']
+        if options['start_server']:
+            server = LocalServer(
+                options['start_server'], options['port'], timeout=int(options['timeout']), threads=options['threads']
+            )
+            self.stdout.write(
+                f"Starting gunicorn with {options['start_server']} worker(s) of {options['threads']} thread(s) "
+                f"on port {options['port']}..."
+            )
+            try:
+                server.start()
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            base_url = server.base_url
+
+        results = []
+        workdir = tempfile.mkdtemp(prefix='agam_load_')
+        try:
+            fixtures = make_fixtures(workdir, options['pages'], image_size)
+            factory = RequestFactory(base_url, fixtures, unique_inputs=not options['allow_cache_hits'])
+            for concurrency in levels:
+                self.stdout.write(f"Concurrency {concurrency} for {options['duration']}s...")
+                level = run_level(factory, mix, concurrency, options['duration'], options['timeout'], options['seed'])
+                self.stdout.write(
+                    f"  {level['requests']} requests, {level['throughput']}/s, errors {level['error_rate']:.1%}, "
+                    f"p50 {level['p50']}s, p90 {level['p90']}s, p99 {level['p99']}s"
+                )
+                for request_type, summary in level['by_type'].items():
+                    self.stdout.write(
+                        f"    {request_type}: {summary['requests']} requests, p50 {summary['p50']}s, "
+                        f"p99 {summary['p99']}s, errors {summary['error_rate']:.1%}"
+                    )
+                for message, count in level['error_messages'].items():
+                    self.stdout.write(self.style.WARNING(f"    {count} x {message}"))
+                results.append(level)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            if server is not None:
+                server.stop()
+
+        knee = find_knee(results, min_gain=options['knee_gain'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Knee at concurrency {knee['concurrency']}: {knee['throughput']}/s, p99 {knee['p99']}s ({knee['reason']})"
+        ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'url': base_url,
+                    'server_workers': options['start_server'],
+                    'server_threads': options['threads'],
+                    'mix': mix,
+                    'duration': options['duration'],
+                    'levels': results,
+                    'knee': knee,
+                }, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import get_job_worker_pool
+
+
+class Command(BaseCommand):
+    help = 'Process queued ProcessedFile and MergeJob jobs from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=max(1, settings.JOB_QUEUE_WORKERS),
+            help='Number of worker threads',
+        )
+
+    def handle(self, *args, **options):
+        pool = get_job_worker_pool(workers=options['threads'])
+        pool.start()
+        self.stdout.write(f"Processing jobs with {options['threads']} thread(s), press Ctrl+C to stop")
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
@@ -11,6 +11,7 @@ class ProcessedFile(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     )
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -22,6 +23,10 @@ class ProcessedFile(models.Model):
     operation = models.CharField(max_length=20)  # e.g., 'convert_to_pdf', 'merge', etc.
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True, null=True)
+    # Progress of a running job, e.g. stage 'converting', 12 of 40 pages
+    progress_stage = models.CharField(max_length=20, blank=True, default='')
+    progress_current = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -55,6 +60,7 @@ class MergeJob(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     )
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -63,6 +69,10 @@ class MergeJob(models.Model):
     merged_file = models.FileField(upload_to='merged/', blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True, null=True)
+    # Progress of a running job, e.g. stage 'converting', 12 of 40 pages
+    progress_stage = models.CharField(max_length=20, blank=True, default='')
+    progress_current = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -0,0 +1,136 @@
+import os
+import zlib
+import shutil
+from PIL import Image
+
+# Pages are sized as if images were printed at this resolution (matches the old Pillow output)
+IMAGE_RESOLUTION = 100.0
+
+# JPEG colour modes that can be embedded in a PDF without decoding
+PASSTHROUGH_JPEG_MODES = {
+    'L': b'/DeviceGray',
+    'RGB': b'/DeviceRGB',
+}
+
+
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer that emits one image page at a time.
+
+    Every page is written to the output file as soon as it is added, so memory
+    use is bounded by a single image no matter how many pages there are. JPEG
+    files are copied into the PDF as-is (DCTDecode), without a decode/re-encode
+    cycle; other images are decoded once and stored losslessly (FlateDecode).
+    """
+
+    # Object 1 is the page tree and object 2 the catalog; both are written last
+    PAGES_ID = 1
+    CATALOG_ID = 2
+
+    def __init__(self, output_file):
+        self._file = output_file
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self._file.write(data)
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _begin_object(self, obj_id):
+        self._offsets[obj_id] = self._file.tell()
+        self._write(f"{obj_id} 0 obj\n".encode('ascii'))
+
+    def _write_object(self, obj_id, body):
+        self._begin_object(obj_id)
+        self._write(body + b'\nendobj\n')
+
+    def _write_stream_object(self, obj_id, entries, length, data=None, path=None):
+        """Write a stream object from bytes, or by copying a file in chunks"""
+        self._begin_object(obj_id)
+        self._write(b'<< ' + entries + f" /Length {length} >>\nstream\n".encode('ascii'))
+        if path is not None:
+            with open(path, 'rb') as source:
+                shutil.copyfileobj(source, self._file, 1024 * 1024)
+        else:
+            self._write(data)
+        self._write(b'\nendstream\nendobj\n')
+
+    def add_image_page(self, image_path):
+        """
+        Append a page showing one image
+
+        Args:
+            image_path (str): Path to a PNG or JPEG image
+        """
+        # Opening only reads the header; pixel data is decoded on demand
+        with Image.open(image_path) as img:
+            width, height = img.size
+            if img.format == 'JPEG' and img.mode in PASSTHROUGH_JPEG_MODES:
+                color_space = PASSTHROUGH_JPEG_MODES[img.mode]
+                data = None
+                length = os.path.getsize(image_path)
+                filter_name = b'/DCTDecode'
+            else:
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+                color_space = b'/DeviceRGB'
+                data = zlib.compress(img.tobytes(), 6)
+                length = len(data)
+                filter_name = b'/FlateDecode'
+
+        page_width = width * 72.0 / IMAGE_RESOLUTION
+        page_height = height * 72.0 / IMAGE_RESOLUTION
+
+        image_id = self._new_id()
+        self._write_stream_object(
+            image_id,
+            b'/Type /XObject /Subtype /Image'
+            + f" /Width {width} /Height {height}".encode('ascii')
+            + b' /ColorSpace ' + color_space
+            + b' /BitsPerComponent 8 /Filter ' + filter_name,
+            length,
+            data=data,
+            path=image_path if data is None else None,
+        )
+        del data
+
+        content = f"q {page_width:.4f} 0 0 {page_height:.4f} 0 0 cm /Im0 Do Q".encode('ascii')
+        content_id = self._new_id()
+        self._write_stream_object(content_id, b'', len(content), data=content)
+
+        page_id = self._new_id()
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R "
+            f"/MediaBox [0 0 {page_width:.4f} {page_height:.4f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>".encode('ascii'),
+        )
+        self._page_ids.append(page_id)
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode('ascii'),
+        )
+        self._write_object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>".encode('ascii'))
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write(''.join(lines).encode('ascii'))
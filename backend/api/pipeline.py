@@ -0,0 +1,253 @@
+import os
+import re
+import uuid
+import shutil
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+
+from .cancellation import CancellationToken, OperationCancelled
+from .executor import ExecutorBusy, run_conversion
+from .utils import (
+    get_temp_dir, get_file_extension, save_uploaded_file,
+    convert_file, merge_files, merge_images_to_pdf
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Operations that take exactly one input and map onto convert_file
+SINGLE_INPUT_OPERATIONS = ['convert_to_pdf', 'pdf_to_docx', 'pdf_to_txt', 'pdf_to_pptx']
+
+PIPELINE_OPERATIONS = SINGLE_INPUT_OPERATIONS + ['merge_files', 'merge_images_to_pdf']
+
+STEP_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+FILE_REF_PATTERN = re.compile(r'^file:(\d+)$')
+
+IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg']
+
+
+class PipelineError(ValueError):
+    """Raised for an invalid pipeline or a step that fails"""
+
+
+def parse_pipeline(spec, file_names):
+    """
+    Validate a pipeline description and put its steps in dependency order
+
+    A pipeline is a small DAG of existing operations:
+
+        {
+            "steps": [
+                {"id": "photos", "op": "merge_images_to_pdf", "inputs": ["file:1", "file:2"]},
+                {"id": "book", "op": "merge_files", "inputs": ["file:0", "photos"]}
+            ],
+            "output": "book",
+            "output_filename": "album"
+        }
+
+    Inputs refer to uploaded files by position ("file:0") or to earlier steps
+    by id. "output" defaults to the last step.
+
+    Args:
+        spec (dict): The pipeline description
+        file_names (list): Names of the uploaded files, in order
+
+    Returns:
+        dict: The pipeline with its steps in topological order
+
+    Raises:
+        PipelineError: If the pipeline is invalid
+    """
+    if not isinstance(spec, dict):
+        raise PipelineError('Pipeline must be a JSON object')
+
+    steps = spec.get('steps')
+    if not isinstance(steps, list) or not steps:
+        raise PipelineError('Pipeline must have a non-empty list of steps')
+    if len(steps) > settings.PIPELINE_MAX_STEPS:
+        raise PipelineError(f"Pipeline has more than {settings.PIPELINE_MAX_STEPS} steps")
+
+    by_id = {}
+    for step in steps:
+        if not isinstance(step, dict):
+            raise PipelineError('Each step must be a JSON object')
+        step_id = step.get('id')
+        if not isinstance(step_id, str) or not STEP_ID_PATTERN.match(step_id):
+            raise PipelineError(f"Invalid step id: {step_id!r}")
+        if step_id in by_id:
+            raise PipelineError(f"Duplicate step id: {step_id}")
+        if step.get('op') not in PIPELINE_OPERATIONS:
+            raise PipelineError(
+                f"Step {step_id}: invalid op {step.get('op')!r}. Valid ops: {', '.join(PIPELINE_OPERATIONS)}"
+            )
+        inputs = step.get('inputs')
+        if not isinstance(inputs, list) or not inputs or not all(isinstance(ref, str) for ref in inputs):
+            raise PipelineError(f"Step {step_id}: inputs must be a non-empty list of references")
+        by_id[step_id] = {'id': step_id, 'op': step['op'], 'inputs': list(inputs)}
+
+    for step in by_id.values():
+        for ref in step['inputs']:
+            match = FILE_REF_PATTERN.match(ref)
+            if match:
+                if int(match.group(1)) >= len(file_names):
+                    raise PipelineError(f"Step {step['id']}: {ref} does not match an uploaded file")
+            elif ref not in by_id:
+                raise PipelineError(f"Step {step['id']}: unknown input {ref!r}")
+            # Steps only produce documents, so images can only come straight from the uploads
+            if step['op'] == 'merge_images_to_pdf' and (
+                not match or get_file_extension(file_names[int(match.group(1))]) not in IMAGE_EXTENSIONS
+            ):
+                raise PipelineError(
+                    f"Step {step['id']}: merge_images_to_pdf inputs must be uploaded PNG or JPEG images, not {ref}"
+                )
+        if step['op'] in SINGLE_INPUT_OPERATIONS and len(step['inputs']) != 1:
+            raise PipelineError(f"Step {step['id']}: {step['op']} takes exactly one input")
+        if step['op'] == 'merge_files' and len(step['inputs']) < 2:
+            raise PipelineError(f"Step {step['id']}: merge_files needs at least two inputs")
+
+    # Kahn's algorithm; whatever is left over is part of a cycle
+    dependencies = {
+        step_id: {ref for ref in step['inputs'] if ref in by_id}
+        for step_id, step in by_id.items()
+    }
+    ordered = []
+    remaining = dict(dependencies)
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps - set(ordered)]
+        if not ready:
+            raise PipelineError(f"Pipeline has a cycle between steps: {', '.join(sorted(remaining))}")
+        for step_id in ready:
+            ordered.append(step_id)
+            del remaining[step_id]
+
+    output = spec.get('output', steps[-1].get('id'))
+    if output not in by_id:
+        raise PipelineError(f"Unknown output step: {output!r}")
+
+    output_filename = spec.get('output_filename')
+    if output_filename is not None and not isinstance(output_filename, str):
+        raise PipelineError('output_filename must be a string')
+
+    return {
+        'steps': [by_id[step_id] for step_id in ordered],
+        'dependencies': dependencies,
+        'output': output,
+        'output_filename': os.path.basename(output_filename) if output_filename else None,
+    }
+
+
+def _run_step(step, inputs, workspace, cancel=None):
+    """
+    Run one step on its resolved inputs
+
+    Args:
+        step (dict): The step
+        inputs (list): (path, name) of each input, in order
+        workspace (str): Directory that holds the pipeline's intermediate files
+        cancel (CancellationToken, optional): Stops the step when cancelled
+
+    Returns:
+        tuple: (output_path, output_name) inside the workspace
+    """
+    op = step['op']
+    if op in SINGLE_INPUT_OPERATIONS:
+        input_path, input_name = inputs[0]
+        output_path, output_name = run_conversion(op, convert_file, input_path, input_name, op, cancel=cancel)
+    elif op == 'merge_images_to_pdf':
+        output_path = run_conversion(
+            'merge_images_to_pdf', merge_images_to_pdf, [path for path, _ in inputs], cancel=cancel
+        )
+        output_name = f"{step['id']}.pdf"
+    else:
+        paths = [path for path, _ in inputs]
+        extensions = {get_file_extension(path) for path in paths}
+        # Mixed inputs are normalised to PDF; same-type inputs keep their type
+        mixed = len(extensions) > 1 or extensions.pop() not in ['pdf', 'docx', 'pptx']
+        file_type = 'pdf' if mixed else get_file_extension(paths[0])
+        output_path = run_conversion(
+            'merge_files', merge_files, paths, step['id'], file_type, mixed=mixed, cancel=cancel
+        )
+        output_name = f"{step['id']}.{get_file_extension(output_path)}"
+
+    # Keep intermediates in the workspace so they go away with it; the prefix keeps them
+    # apart from the saved uploads (input_<i>.<ext>) whatever the step is called
+    workspace_path = os.path.join(workspace, f"step_{step['id']}.{get_file_extension(output_path)}")
+    shutil.move(output_path, workspace_path)
+    return workspace_path, output_name
+
+
+def run_pipeline(files, spec, cancel=None):
+    """
+    Run a pipeline of operations on uploaded files in a private workspace
+
+    Intermediate results never leave the server. Steps whose inputs are ready
+    run concurrently on a bounded thread pool (PIPELINE_WORKERS), so
+    independent branches of the DAG run in parallel.
+
+    Args:
+        files: List of uploaded file objects
+        spec (dict): The pipeline description (see parse_pipeline)
+        cancel (CancellationToken, optional): Stops every running step when cancelled
+
+    Returns:
+        tuple: (output_path, output_filename)
+
+    Raises:
+        PipelineError: If the pipeline is invalid or a step fails
+        OperationCancelled: If `cancel` is cancelled or a step runs out of time
+        ExecutorBusy: If a step cannot get a conversion slot
+    """
+    pipeline = parse_pipeline(spec, [uploaded_file.name for uploaded_file in files])
+    # Cancelled when a step fails, so the steps still running stop early
+    abort = CancellationToken(parent=cancel)
+    workspace = tempfile.mkdtemp(prefix='pipeline_', dir=get_temp_dir())
+    try:
+        artifacts = {}
+        for i, uploaded_file in enumerate(files):
+            input_path = os.path.join(workspace, f"input_{i}.{get_file_extension(uploaded_file.name)}")
+            save_uploaded_file(uploaded_file, input_path)
+            artifacts[f"file:{i}"] = (input_path, uploaded_file.name)
+
+        steps = {step['id']: step for step in pipeline['steps']}
+        pending = list(steps)
+        running = {}
+        workers = max(1, settings.PIPELINE_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pipeline') as executor:
+            try:
+                while pending or running:
+                    # Start every step whose inputs are all available
+                    for step_id in [s for s in pending if pipeline['dependencies'][s] <= artifacts.keys()]:
+                        step = steps[step_id]
+                        inputs = [artifacts[ref] for ref in step['inputs']]
+                        logger.info(f"Pipeline: running step {step_id} ({step['op']})")
+                        running[executor.submit(_run_step, step, inputs, workspace, abort)] = step_id
+                        pending.remove(step_id)
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        step_id = running.pop(future)
+                        try:
+                            artifacts[step_id] = future.result()
+                        except (OperationCancelled, ExecutorBusy):
+                            # Not the step's fault: the views answer these with 504/503/429
+                            raise
+                        except Exception as e:
+                            raise PipelineError(f"Step {step_id} ({steps[step_id]['op']}) failed: {str(e)}")
+            except Exception:
+                abort.cancel('Another pipeline step failed')
+                for future in running:
+                    future.cancel()
+                raise
+
+        output_path, output_name = artifacts[pipeline['output']]
+        if pipeline['output_filename']:
+            output_name = f"{pipeline['output_filename']}.{get_file_extension(output_path)}"
+
+        # Move the result out before the workspace is removed
+        final_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.{get_file_extension(output_path)}")
+        os.replace(output_path, final_path)
+        return final_path, output_name
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
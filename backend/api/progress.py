@@ -0,0 +1,143 @@
+import json
+import time
+import threading
+import logging
+from django.conf import settings
+from django.utils import timezone
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def report_progress(progress, stage, current=0, total=0):
+    """
+    Pass progress to a callback, if there is one
+
+    Converters take an optional `progress(stage, current, total)` callable and
+    report through this helper, so a failing reporter never fails a conversion.
+
+    Args:
+        progress (callable or None): The callback
+        stage (str): What is happening, e.g. 'converting' or 'merging'
+        current (int): Units done so far (pages or files)
+        total (int): Units in this stage, 0 if unknown
+    """
+    if progress is None:
+        return
+    try:
+        progress(stage, current, total)
+    except Exception as e:
+        logger.warning(f"Progress reporting failed: {str(e)}")
+
+
+class JobProgressReporter:
+    """
+    Progress callback that records a job's progress on its database row.
+
+    Writes are throttled to one per PROGRESS_UPDATE_INTERVAL seconds, except
+    that a new stage or the last unit of a stage is always written. Every write
+    also bumps updated_at, so a job that keeps reporting is never taken for a
+    stuck one and reclaimed by another worker.
+    """
+
+    def __init__(self, job, interval=None):
+        self.model = type(job)
+        self.job_id = job.id
+        self.interval = settings.PROGRESS_UPDATE_INTERVAL if interval is None else interval
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._last_stage = None
+
+    def __getstate__(self):
+        # Sent to conversion executor workers, which report from their own process
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, current, total):
+        now = time.monotonic()
+        with self._lock:
+            finished = total and current >= total
+            if stage == self._last_stage and not finished and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+            self._last_stage = stage
+
+        self.model.objects.filter(id=self.job_id, status='processing').update(
+            progress_stage=stage,
+            progress_current=current,
+            progress_total=total,
+            updated_at=timezone.now(),
+        )
+
+
+# Milliseconds an EventSource waits before reconnecting after a stream ends
+EVENT_STREAM_RETRY = 3000
+
+JOB_STATE_FIELDS = ('status', 'progress_stage', 'progress_current', 'progress_total', 'error_message')
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def job_event_stream(model, job_id, download_url=None):
+    """
+    Yield Server-Sent Events that follow an async job until it finishes
+
+    The job row is polled every JOB_EVENTS_POLL_INTERVAL seconds and a
+    'progress' event is sent whenever its status or progress changes. The
+    stream ends with a 'completed', 'failed' or 'cancelled' event, or after
+    JOB_EVENTS_MAX_DURATION seconds, in which case the EventSource reconnects
+    and picks up from the current state. Keep-alive comments are sent while
+    nothing changes, so idle connections are not dropped by proxies.
+
+    Args:
+        model: ProcessedFile or MergeJob
+        job_id: Id of the job
+        download_url (str, optional): Sent with the 'completed' event
+
+    Yields:
+        bytes: Encoded events
+    """
+    yield f"retry: {EVENT_STREAM_RETRY}\n\n".encode('utf-8')
+
+    started = last_sent = time.monotonic()
+    last_state = None
+    while True:
+        job = model.objects.filter(id=job_id).values(*JOB_STATE_FIELDS).first()
+        if job is None:
+            yield format_event('failed', {'id': str(job_id), 'error': 'Job not found'})
+            return
+
+        state = tuple(job[field] for field in JOB_STATE_FIELDS)
+        if state != last_state:
+            last_state = state
+            last_sent = time.monotonic()
+            yield format_event('progress', {
+                'id': str(job_id),
+                'status': job['status'],
+                'stage': job['progress_stage'],
+                'current': job['progress_current'],
+                'total': job['progress_total'],
+            })
+
+        if job['status'] == 'completed':
+            yield format_event('completed', {'id': str(job_id), 'download_url': download_url})
+            return
+        if job['status'] in ('failed', 'cancelled'):
+            yield format_event(job['status'], {'id': str(job_id), 'error': job['error_message']})
+            return
+
+        now = time.monotonic()
+        if now - started >= settings.JOB_EVENTS_MAX_DURATION:
+            return
+        if now - last_sent >= settings.JOB_EVENTS_HEARTBEAT:
+            last_sent = now
+            yield b': keep-alive\n\n'
+        time.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
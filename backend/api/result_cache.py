@@ -0,0 +1,225 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+import logging
+from django.conf import settings
+
+from .capabilities import get_converter_capabilities, OPERATION_BACKENDS
+from .locks import file_lock
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Backends whose versions make up the converter version of each cached operation
+CACHED_OPERATION_BACKENDS = {
+    'convert_to_pdf': ['libreoffice', 'docx2pdf'] + OPERATION_BACKENDS['convert_to_pdf'],
+    'pdf_to_docx': OPERATION_BACKENDS['pdf_to_docx'],
+    'pdf_to_txt': OPERATION_BACKENDS['pdf_to_txt'],
+    'pdf_to_pptx': OPERATION_BACKENDS['pdf_to_pptx'],
+}
+
+
+def converter_version(operation):
+    """
+    Version string of the converters behind an operation
+
+    Args:
+        operation (str): Conversion operation, e.g. 'pdf_to_docx'
+
+    Returns:
+        str: Backend versions joined together, plus CONVERSION_CACHE_VERSION
+    """
+    capabilities = get_converter_capabilities()
+    parts = [f"cache={getattr(settings, 'CONVERSION_CACHE_VERSION', '1')}"]
+    for backend in CACHED_OPERATION_BACKENDS.get(operation, []):
+        info = capabilities.get(backend, {})
+        if info.get('available'):
+            parts.append(f"{backend}={info.get('version')}")
+    return ';'.join(parts)
+
+
+class ConversionResultCache:
+    """
+    Disk-backed conversion results keyed by (input SHA-256, operation, converter version).
+
+    Entries are written atomically, so concurrent gunicorn workers can share the
+    cache. Reads refresh an entry's mtime and eviction removes the least recently
+    used entries once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.lock_path = os.path.join(cache_dir, 'cache.lock')
+        self.stats_path = os.path.join(cache_dir, 'stats.json')
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+    def make_key(self, input_digest, operation, params=None):
+        """
+        Build the cache key for a conversion
+
+        Args:
+            input_digest (str): SHA-256 hex digest of the input bytes
+            operation (str): Conversion operation
+            params (dict, optional): Options that change the output (e.g. DPI)
+
+        Returns:
+            str: Hex key
+        """
+        material = json.dumps(
+            [input_digest, operation, converter_version(operation), params or {}],
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.entries_dir, key[:2], key)
+
+    def get(self, key, output_path, record_miss=True):
+        """
+        Materialise a cached result at `output_path`
+
+        Args:
+            key (str): Cache key from make_key
+            output_path (str): Where to put the result
+            record_miss (bool): Count a miss in the stats (off for re-checks)
+
+        Returns:
+            bool: True on a cache hit
+        """
+        entry_path = self._entry_path(key)
+        try:
+            _link_or_copy(entry_path, output_path)
+        except FileNotFoundError:
+            if record_miss:
+                self._bump('misses')
+            return False
+
+        # Refresh the entry for LRU eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        self._bump('hits')
+        logger.info(f"Conversion cache hit for {key}")
+        return True
+
+    def put(self, key, source_path):
+        """Store a conversion result under `key`"""
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            _link_or_copy(source_path, tmp_path)
+            # Atomic, so readers never see a partially written entry
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.error(f"Error storing conversion result in cache: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in `max_bytes`"""
+        # Only one process needs to evict at a time; the others just skip
+        with file_lock(self.lock_path, blocking=False) as acquired:
+            if not acquired:
+                return
+
+            entries = []
+            total_size = 0
+            for root, _, filenames in os.walk(self.entries_dir):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total_size += stat.st_size
+
+            if total_size <= self.max_bytes:
+                return
+
+            # Evict down to 90% so we don't evict again on the next put
+            target_size = int(self.max_bytes * 0.9)
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= target_size:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    self._bump('evictions')
+                except FileNotFoundError:
+                    pass
+
+    def _bump(self, counter):
+        """Increment a counter shared by every worker process"""
+        with file_lock(self.lock_path + '.stats', timeout=1) as acquired:
+            if not acquired:
+                return
+            stats = self._read_stats()
+            stats[counter] = stats.get(counter, 0) + 1
+            tmp_path = f"{self.stats_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, self.stats_path)
+
+    def _read_stats(self):
+        try:
+            with open(self.stats_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def stats(self):
+        """Hit/miss/eviction counters for the health endpoint"""
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        stats.update(self._read_stats())
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+def _link_or_copy(source_path, destination_path):
+    """Hard-link a file, falling back to a copy across filesystems"""
+    try:
+        os.link(source_path, destination_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source_path, destination_path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Get the conversion result cache
+
+    Returns:
+        ConversionResultCache or None: None when CONVERSION_CACHE_ENABLED is off
+    """
+    global _cache
+
+    if not getattr(settings, 'CONVERSION_CACHE_ENABLED', True):
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ConversionResultCache(
+                cache_dir=getattr(settings, 'CONVERSION_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache')),
+                max_bytes=getattr(settings, 'CONVERSION_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+            )
+        return _cache
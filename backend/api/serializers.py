@@ -1,5 +1,20 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 from .models import ProcessedFile, MergeJob, MergeFile
+from .pipeline import parse_pipeline, PipelineError
+
+SUPPORTED_EXTENSIONS = ['docx', 'pptx', 'xlsx', 'txt', 'png', 'jpg', 'jpeg', 'pdf']
+
+VALID_OPERATIONS = [
+    'convert_to_pdf', 'pdf_to_docx', 'pdf_to_txt',
+    'pdf_to_pptx', 'pdf_to_xlsx'
+]
+
+
+def format_size(size):
+    """Format a byte count as whole megabytes for error messages"""
+    return f"{size // (1024 * 1024)}MB"
 
 
 class ProcessedFileSerializer(serializers.ModelSerializer):
@@ -11,16 +26,20 @@ class ProcessedFileSerializer(serializers.ModelSerializer):
         model = ProcessedFile
         fields = [
             'id', 'original_filename', 'processed_filename', 'file_type', 
-            'operation', 'status', 'error_message', 'created_at', 
+            'operation', 'status', 'error_message', 'progress_stage',
+            'progress_current', 'progress_total', 'created_at',
             'updated_at', 'download_url'
         ]
-        read_only_fields = ['id', 'status', 'error_message', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'status', 'error_message', 'progress_stage', 'progress_current',
+            'progress_total', 'created_at', 'updated_at'
+        ]
     
     def get_download_url(self, obj):
         if obj.processed_file and obj.status == 'completed':
             request = self.context.get('request')
             if request is not None:
-                return request.build_absolute_uri(obj.processed_file.url)
+                return request.build_absolute_uri(reverse('file-download', args=[obj.id]))
         return None
 
 
@@ -43,16 +62,20 @@ class MergeJobSerializer(serializers.ModelSerializer):
         model = MergeJob
         fields = [
             'id', 'output_filename', 'file_type', 'status', 
-            'error_message', 'created_at', 'updated_at', 
+            'error_message', 'progress_stage', 'progress_current',
+            'progress_total', 'created_at', 'updated_at',
             'files', 'download_url'
         ]
-        read_only_fields = ['id', 'status', 'error_message', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'status', 'error_message', 'progress_stage', 'progress_current',
+            'progress_total', 'created_at', 'updated_at'
+        ]
     
     def get_download_url(self, obj):
         if obj.merged_file and obj.status == 'completed':
             request = self.context.get('request')
             if request is not None:
-                return request.build_absolute_uri(obj.merged_file.url)
+                return request.build_absolute_uri(reverse('file-download', args=[obj.id]))
         return None
 
 
@@ -61,32 +84,31 @@ class FileUploadSerializer(serializers.Serializer):
     
     file = serializers.FileField()
     operation = serializers.CharField(max_length=20)
+    # 'async' queues a job and returns its id instead of the converted file
+    mode = serializers.ChoiceField(choices=['sync', 'async'], default='sync', required=False)
+    # Stream pdf_to_txt output page by page instead of building the whole file first
+    stream = serializers.BooleanField(default=False, required=False)
     
     def validate_file(self, value):
-        # Check file size (25MB limit)
-        if value.size > 26214400:  # 25MB in bytes
-            raise serializers.ValidationError("File size exceeds the 25MB limit.")
+        # Check file size
+        if value.size > settings.MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(f"File size exceeds the {format_size(settings.MAX_UPLOAD_SIZE)} limit.")
         
         # Get file extension
         file_name = value.name
         extension = file_name.split('.')[-1].lower()
         
         # Check if extension is supported
-        supported_extensions = ['docx', 'pptx', 'xlsx', 'txt', 'png', 'jpg', 'jpeg', 'pdf']
-        if extension not in supported_extensions:
+        if extension not in SUPPORTED_EXTENSIONS:
             raise serializers.ValidationError(
-                f"Unsupported file format. Supported formats: {', '.join(supported_extensions)}"
+                f"Unsupported file format. Supported formats: {', '.join(SUPPORTED_EXTENSIONS)}"
             )
         
         return value
     
     def validate_operation(self, value):
-        valid_operations = [
-            'convert_to_pdf', 'pdf_to_docx', 'pdf_to_txt',
-            'pdf_to_pptx', 'pdf_to_xlsx'
-        ]
-        if value not in valid_operations:
-            raise serializers.ValidationError(f"Invalid operation. Valid operations: {', '.join(valid_operations)}")
+        if value not in VALID_OPERATIONS:
+            raise serializers.ValidationError(f"Invalid operation. Valid operations: {', '.join(VALID_OPERATIONS)}")
         return value
 
 
@@ -99,6 +121,10 @@ class MergeFilesSerializer(serializers.Serializer):
         max_length=20
     )
     output_filename = serializers.CharField(max_length=255)
+    # 'async' queues a job and returns its id instead of the merged file
+    mode = serializers.ChoiceField(choices=['sync', 'async'], default='sync', required=False)
+    # Accept any mix of convert_to_pdf input formats and merge them into one PDF
+    mixed = serializers.BooleanField(default=False, required=False)
     
     def validate_files(self, files):
         if not files:
@@ -109,26 +135,124 @@ class MergeFilesSerializer(serializers.Serializer):
         
         # Check total size
         total_size = sum(file.size for file in files)
-        if total_size > 52428800:  # 50MB in bytes
-            raise serializers.ValidationError("Total file size exceeds the 50MB limit.")
+        if total_size > settings.MAX_MERGE_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"Total file size exceeds the {format_size(settings.MAX_MERGE_UPLOAD_SIZE)} limit."
+            )
         
         # Check individual file sizes
         for file in files:
-            if file.size > 26214400:  # 25MB in bytes
-                raise serializers.ValidationError(f"File {file.name} exceeds the 25MB limit.")
+            if file.size > settings.MAX_UPLOAD_SIZE:
+                raise serializers.ValidationError(
+                    f"File {file.name} exceeds the {format_size(settings.MAX_UPLOAD_SIZE)} limit."
+                )
         
+        return files
+    
+    def validate(self, data):
         # Check file types
-        extensions = [file.name.split('.')[-1].lower() for file in files]
+        extensions = [file.name.split('.')[-1].lower() for file in data['files']]
+        
+        if data.get('mixed'):
+            # Every file is normalised to PDF first, so any convert_to_pdf input will do
+            unsupported = sorted(set(extensions) - set(SUPPORTED_EXTENSIONS))
+            if unsupported:
+                raise serializers.ValidationError({'files': [
+                    f"Unsupported file format for merging: {', '.join(unsupported)}. "
+                    f"Supported formats: {', '.join(SUPPORTED_EXTENSIONS)}"
+                ]})
+            return data
         
         # Check if all files have the same extension
         if len(set(extensions)) != 1:
-            raise serializers.ValidationError("All files must be of the same type for merging.")
+            raise serializers.ValidationError({'files': [
+                "All files must be of the same type for merging. Set mixed=true to merge different types into a PDF."
+            ]})
         
         # Check if extension is supported for merging
         supported_merge_extensions = ['pdf', 'docx', 'pptx']
         if extensions[0] not in supported_merge_extensions:
-            raise serializers.ValidationError(
+            raise serializers.ValidationError({'files': [
                 f"Unsupported file format for merging. Supported formats: {', '.join(supported_merge_extensions)}"
+            ]})
+        
+        return data
+
+
+class BatchConvertSerializer(serializers.Serializer):
+    """Serializer for converting many files with one operation"""
+    
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_FILES
+    )
+    operation = serializers.CharField(max_length=20)
+    
+    def validate_files(self, files):
+        # Check total size
+        total_size = sum(file.size for file in files)
+        if total_size > settings.MAX_BATCH_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"Total file size exceeds the {format_size(settings.MAX_BATCH_UPLOAD_SIZE)} limit."
             )
         
-        return files 
\ No newline at end of file
+        # Check individual file sizes and types
+        for file in files:
+            if file.size > settings.MAX_UPLOAD_SIZE:
+                raise serializers.ValidationError(
+                    f"File {file.name} exceeds the {format_size(settings.MAX_UPLOAD_SIZE)} limit."
+                )
+            extension = file.name.split('.')[-1].lower()
+            if extension not in SUPPORTED_EXTENSIONS:
+                raise serializers.ValidationError(
+                    f"Unsupported file format for {file.name}. Supported formats: {', '.join(SUPPORTED_EXTENSIONS)}"
+                )
+        
+        return files
+    
+    def validate_operation(self, value):
+        if value not in VALID_OPERATIONS:
+            raise serializers.ValidationError(f"Invalid operation. Valid operations: {', '.join(VALID_OPERATIONS)}")
+        return value
+
+
+class PipelineSerializer(serializers.Serializer):
+    """Serializer for running a pipeline of operations on uploaded files"""
+    
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_FILES
+    )
+    # JSON description of the steps, sent as a form field
+    pipeline = serializers.JSONField(binary=True)
+    
+    def validate_files(self, files):
+        # Check total size
+        total_size = sum(file.size for file in files)
+        if total_size > settings.MAX_BATCH_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"Total file size exceeds the {format_size(settings.MAX_BATCH_UPLOAD_SIZE)} limit."
+            )
+        
+        # Check individual file sizes and types
+        for file in files:
+            if file.size > settings.MAX_UPLOAD_SIZE:
+                raise serializers.ValidationError(
+                    f"File {file.name} exceeds the {format_size(settings.MAX_UPLOAD_SIZE)} limit."
+                )
+            extension = file.name.split('.')[-1].lower()
+            if extension not in SUPPORTED_EXTENSIONS:
+                raise serializers.ValidationError(
+                    f"Unsupported file format for {file.name}. Supported formats: {', '.join(SUPPORTED_EXTENSIONS)}"
+                )
+        
+        return files
+    
+    def validate(self, data):
+        try:
+            parse_pipeline(data['pipeline'], [file.name for file in data['files']])
+        except PipelineError as e:
+            raise serializers.ValidationError({'pipeline': [str(e)]})
+        return data
@@ -0,0 +1,350 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import atexit
+import logging
+from pathlib import Path
+from django.conf import settings
+
+from .cancellation import NEW_PROCESS_GROUP, kill_on_cancel, kill_process_group
+
+# The UNO bridge ships with LibreOffice (python3-uno on Debian/Ubuntu), not with pip
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+    UNO_AVAILABLE = True
+except ImportError:
+    uno = None
+    UNO_AVAILABLE = False
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# LibreOffice export filter for each supported input format
+PDF_EXPORT_FILTERS = {
+    'docx': 'writer_pdf_Export',
+    'pptx': 'impress_pdf_Export',
+    'xlsx': 'calc_pdf_Export',
+}
+
+
+class SofficePoolError(Exception):
+    """Raised when a pooled LibreOffice instance cannot perform a conversion"""
+
+
+def _property(name, value):
+    """Build a UNO PropertyValue"""
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class SofficeInstance:
+    """A single long-lived headless LibreOffice process with its own user profile"""
+
+    def __init__(self, soffice_path, index, base_dir):
+        self.soffice_path = soffice_path
+        self.index = index
+        # Pipe names and profiles are per process so gunicorn workers never share an instance
+        self.pipe_name = f"agam_soffice_{os.getpid()}_{index}"
+        self.profile_dir = os.path.join(base_dir, f"profile_{os.getpid()}_{index}")
+        self.process = None
+        self.desktop = None
+        self.jobs_done = 0
+        self.restarts = 0
+        self.started_at = None
+
+    def start(self, timeout):
+        """Start LibreOffice and connect to it over the UNO bridge"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        cmd = [
+            self.soffice_path,
+            '--headless',
+            '--invisible',
+            '--nologo',
+            '--nodefault',
+            '--norestore',
+            '--nolockcheck',
+            f'-env:UserInstallation={Path(self.profile_dir).as_uri()}',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ]
+        logger.info(f"Starting pooled LibreOffice instance {self.index}: {' '.join(cmd)}")
+        # Own process group, so kill() takes soffice.bin down with the soffice wrapper
+        self.process = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **NEW_PROCESS_GROUP
+        )
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except NoConnectException:
+                if self.process.poll() is not None:
+                    self.stop()
+                    raise SofficePoolError(f"LibreOffice instance {self.index} exited during startup")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise SofficePoolError(f"LibreOffice instance {self.index} did not start within {timeout}s")
+                time.sleep(0.25)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+        self.jobs_done = 0
+        self.started_at = time.time()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def is_healthy(self):
+        """Check that the process is alive and answers over the bridge"""
+        if not self.is_running() or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_path, output_path):
+        """
+        Convert an office document to PDF inside this instance
+
+        Args:
+            input_path (str): Path to the input DOCX/PPTX/XLSX file
+            output_path (str): Path for the output PDF file
+        """
+        file_ext = os.path.splitext(input_path)[1][1:].lower()
+        filter_name = PDF_EXPORT_FILTERS.get(file_ext)
+        if filter_name is None:
+            raise ValueError(f"Unsupported file format for LibreOffice pool: {file_ext}")
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            '_blank',
+            0,
+            (_property('Hidden', True), _property('ReadOnly', True)),
+        )
+        if document is None:
+            raise SofficePoolError(f"LibreOffice could not open {input_path}")
+
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                (_property('FilterName', filter_name),),
+            )
+        finally:
+            document.close(True)
+
+        self.jobs_done += 1
+
+    def stop(self):
+        """Terminate the LibreOffice process"""
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                kill_process_group(self.process)
+                self.process.wait()
+            self.process = None
+
+    def kill(self):
+        """Kill the LibreOffice process group at once, e.g. to abort a hung conversion"""
+        if self.process is not None:
+            kill_process_group(self.process)
+
+    def restart(self, timeout):
+        self.stop()
+        self.restarts += 1
+        self.start(timeout)
+
+    def status(self):
+        return {
+            'index': self.index,
+            'running': self.is_running(),
+            'pid': self.process.pid if self.process is not None else None,
+            'jobs_done': self.jobs_done,
+            'restarts': self.restarts,
+            'started_at': self.started_at,
+        }
+
+
+class SofficePool:
+    """
+    Pool of warm LibreOffice instances for a single worker process.
+
+    Instances are started lazily on first use, health-checked before every job and
+    restarted after a failure or after `max_jobs` conversions.
+    """
+
+    def __init__(self, soffice_path, size, max_jobs, start_timeout, acquire_timeout, base_dir):
+        self.soffice_path = soffice_path
+        self.size = size
+        self.max_jobs = max_jobs
+        self.start_timeout = start_timeout
+        self.acquire_timeout = acquire_timeout
+        self.base_dir = base_dir
+        self.pid = os.getpid()
+        self._instances = [SofficeInstance(soffice_path, i, base_dir) for i in range(size)]
+        self._idle = queue.Queue()
+        for instance in self._instances:
+            self._idle.put(instance)
+
+    def convert(self, input_path, output_path, cancel=None):
+        """
+        Convert an office document to PDF on the next idle instance
+
+        Args:
+            input_path (str): Path to the input DOCX/PPTX/XLSX file
+            output_path (str): Path for the output PDF file
+            cancel (CancellationToken, optional): Kills the instance if cancelled mid-conversion
+
+        Returns:
+            str: Path to the generated PDF file
+        """
+        acquire_timeout = cancel.bound(self.acquire_timeout) if cancel is not None else self.acquire_timeout
+        try:
+            instance = self._idle.get(timeout=acquire_timeout)
+        except queue.Empty:
+            raise SofficePoolError(f"No LibreOffice instance became available within {self.acquire_timeout}s")
+
+        try:
+            if not instance.is_healthy():
+                if instance.process is not None:
+                    logger.warning(f"LibreOffice instance {instance.index} failed its health check, restarting")
+                instance.restart(self.start_timeout)
+
+            try:
+                # A hung UNO call cannot be interrupted, so the instance is killed instead
+                with kill_on_cancel(cancel, instance.kill):
+                    instance.convert(input_path, output_path)
+            except Exception:
+                # A failed job may leave the instance in a bad state
+                instance.stop()
+                raise
+
+            if instance.jobs_done >= self.max_jobs:
+                logger.info(f"LibreOffice instance {instance.index} reached {self.max_jobs} jobs, recycling")
+                instance.stop()
+        finally:
+            self._idle.put(instance)
+
+        if not os.path.exists(output_path):
+            raise SofficePoolError(f"LibreOffice pool did not produce {output_path}")
+
+        return output_path
+
+    def status(self):
+        return {
+            'size': self.size,
+            'max_jobs': self.max_jobs,
+            'idle': self._idle.qsize(),
+            'instances': [instance.status() for instance in self._instances],
+        }
+
+    def shutdown(self):
+        for instance in self._instances:
+            instance.stop()
+            shutil.rmtree(instance.profile_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_disabled = False
+
+
+def get_pool_size():
+    """
+    Number of LibreOffice instances for this worker process.
+
+    LIBREOFFICE_POOL_HOST_SIZE, when set, is shared out across the gunicorn workers
+    (WEB_CONCURRENCY); otherwise LIBREOFFICE_POOL_SIZE applies to each worker.
+    """
+    host_size = getattr(settings, 'LIBREOFFICE_POOL_HOST_SIZE', None)
+    if host_size:
+        workers = max(1, int(os.environ.get('WEB_CONCURRENCY', '1')))
+        return max(1, host_size // workers)
+    return getattr(settings, 'LIBREOFFICE_POOL_SIZE', 1)
+
+
+def disable_soffice_pool():
+    """
+    Keep this process from starting a LibreOffice pool
+
+    For the conversion executor's worker processes: pool sizes are counted per
+    web process, so a pool in every executor worker as well would multiply the
+    instances on the host past LIBREOFFICE_POOL_SIZE / LIBREOFFICE_POOL_HOST_SIZE.
+    convert_to_pdf runs soffice once per conversion there instead, bounded by
+    the executor's per-operation limits.
+    """
+    global _pool_disabled
+    _pool_disabled = True
+
+
+def get_soffice_pool(soffice_path):
+    """
+    Get the LibreOffice pool for this process, creating it on first use
+
+    Returns:
+        SofficePool or None: None when the pool is disabled or UNO is not installed
+    """
+    global _pool
+
+    if not UNO_AVAILABLE or _pool_disabled:
+        return None
+
+    size = get_pool_size()
+    if size <= 0:
+        return None
+
+    with _pool_lock:
+        # A pool inherited across fork belongs to the parent process
+        if _pool is not None and _pool.pid != os.getpid():
+            _pool = None
+
+        if _pool is None or _pool.soffice_path != soffice_path:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = SofficePool(
+                soffice_path,
+                size=size,
+                max_jobs=getattr(settings, 'LIBREOFFICE_POOL_MAX_JOBS', 200),
+                start_timeout=getattr(settings, 'LIBREOFFICE_POOL_START_TIMEOUT', 60),
+                acquire_timeout=getattr(settings, 'LIBREOFFICE_POOL_ACQUIRE_TIMEOUT', 120),
+                base_dir=os.path.join(settings.MEDIA_ROOT, 'soffice_pool'),
+            )
+            logger.info(f"Created LibreOffice pool with {size} instance(s) for process {os.getpid()}")
+
+        return _pool
+
+
+def get_pool_status():
+    """Describe the pool of this process for the health endpoint"""
+    if not UNO_AVAILABLE:
+        return {'enabled': False, 'reason': 'UNO bridge (python3-uno) is not installed'}
+    if _pool_disabled:
+        return {'enabled': False, 'reason': 'Disabled in conversion executor workers'}
+    if _pool is None or _pool.pid != os.getpid():
+        return {'enabled': get_pool_size() > 0, 'started': False}
+    return dict(enabled=True, started=True, **_pool.status())
+
+
+@atexit.register
+def shutdown_soffice_pool():
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.shutdown()
@@ -0,0 +1,1166 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .admission import AdmissionLedger, AdmissionRejected
+from .cancellation import CancellationToken, OperationCancelled, OperationTimedOut, run_process
+from .delivery import RangeNotSatisfiable, parse_range_header, file_validators, deliver_stored_file
+from .executor import ConversionExecutor, ExecutorBusy
+from .jobs import JobQueueFull, _claimable, claim_next_job, cancel_job, enqueue_merge_job
+from .locks import file_lock
+from .models import ProcessedFile, MergeJob
+from .pdf_writer import StreamingPdfWriter
+from .pipeline import PipelineError, parse_pipeline
+from .progress import job_event_stream
+from .result_cache import ConversionResultCache
+from .soffice_pool import SofficePoolError
+from .utils import (
+    CACHED_OPERATION_OPTIONS, convert_office_batch_to_pdf, convert_to_pdf, pdf_to_pptx, pdf_to_txt,
+    get_worker_count, split_page_ranges, worker_process_pool
+)
+from .zip_stream import ZipStreamWriter
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def write_image(self, name, mode, size, format, color=128):
+        from PIL import Image
+
+        path = os.path.join(self.temp_dir, name)
+        Image.new(mode, size, color).save(path, format=format)
+        return path
+
+
+def make_pdf(path, page_count):
+    """Write a PDF whose pages say 'Page 1', 'Page 2', ..."""
+    import fitz
+
+    with fitz.open() as doc:
+        for page_num in range(page_count):
+            doc.new_page().insert_text((72, 72), f"Page {page_num + 1}")
+        doc.save(path)
+    return path
+
+
+def start_patch(test, target, **kwargs):
+    """Patch `target` for the rest of a test"""
+    patcher = mock.patch(target, **kwargs)
+    test.addCleanup(patcher.stop)
+    return patcher.start()
+
+
+def fake_soffice(cmd, cancel=None, timeout=None):
+    """run_process() stand-in for `soffice --convert-to pdf --outdir DIR FILE...`"""
+    output_dir = cmd[cmd.index('--outdir') + 1]
+    for input_path in cmd[cmd.index('--outdir') + 2:]:
+        with open(input_path, 'rb') as f:
+            if f.read() == b'broken':
+                continue
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        with open(os.path.join(output_dir, f"{stem}.pdf"), 'wb') as f:
+            f.write(b'%PDF-1.4\n')
+    return subprocess.CompletedProcess(cmd, 0, '', '')
+
+
+class SofficePoolFallbackTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.input_path = self.write_file('report.docx', b'docx')
+        self.output_path = os.path.join(self.temp_dir, 'out', 'result.pdf')
+        os.makedirs(os.path.dirname(self.output_path))
+        start_patch(self, 'api.utils.get_soffice_path', return_value='/usr/bin/soffice')
+        start_patch(self, 'api.utils.get_converter_capabilities', return_value={'docx2pdf': {'available': False}})
+
+    def test_pooled_conversion(self):
+        pool = mock.Mock()
+        with mock.patch('api.utils.get_soffice_pool', return_value=pool), \
+                mock.patch('api.utils.run_process') as run_process:
+            self.assertEqual(convert_to_pdf(self.input_path, self.output_path), self.output_path)
+        pool.convert.assert_called_once()
+        run_process.assert_not_called()
+
+    def test_pool_failure_falls_back_to_a_new_soffice_process(self):
+        pool = mock.Mock()
+        pool.convert.side_effect = SofficePoolError('instance died')
+        with mock.patch('api.utils.get_soffice_pool', return_value=pool), \
+                mock.patch('api.utils.run_process', side_effect=fake_soffice) as run_process:
+            convert_to_pdf(self.input_path, self.output_path)
+        run_process.assert_called_once()
+        self.assertTrue(os.path.exists(self.output_path))
+
+    def test_without_a_pool(self):
+        with mock.patch('api.utils.get_soffice_pool', return_value=None), \
+                mock.patch('api.utils.run_process', side_effect=fake_soffice):
+            convert_to_pdf(self.input_path, self.output_path)
+        self.assertTrue(os.path.exists(self.output_path))
+
+    def test_failure_without_any_converter(self):
+        failed = subprocess.CompletedProcess([], 1, '', 'error')
+        with mock.patch('api.utils.get_soffice_pool', return_value=None), \
+                mock.patch('api.utils.run_process', return_value=failed):
+            with self.assertRaisesMessage(Exception, 'Failed to convert DOCX to PDF'):
+                convert_to_pdf(self.input_path, self.output_path)
+
+
+class ConversionResultCacheTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ConversionResultCache(os.path.join(self.temp_dir, 'cache'), max_bytes=100)
+
+    def test_key_is_stable(self):
+        self.assertEqual(
+            self.cache.make_key('abc', 'pdf_to_docx', {'workers': 2, 'parallel_threshold': 10}),
+            self.cache.make_key('abc', 'pdf_to_docx', {'parallel_threshold': 10, 'workers': 2}),
+        )
+
+    def test_key_depends_on_input_operation_and_params(self):
+        key = self.cache.make_key('abc', 'pdf_to_docx', {'workers': 2})
+        self.assertNotEqual(key, self.cache.make_key('abd', 'pdf_to_docx', {'workers': 2}))
+        self.assertNotEqual(key, self.cache.make_key('abc', 'pdf_to_txt', {'workers': 2}))
+        self.assertNotEqual(key, self.cache.make_key('abc', 'pdf_to_docx', {'workers': 4}))
+        self.assertNotEqual(key, self.cache.make_key('abc', 'pdf_to_docx'))
+
+    @override_settings(CONVERSION_CACHE_VERSION='2')
+    def test_key_depends_on_cache_version(self):
+        key = self.cache.make_key('abc', 'pdf_to_docx')
+        with self.settings(CONVERSION_CACHE_VERSION='3'):
+            self.assertNotEqual(key, self.cache.make_key('abc', 'pdf_to_docx'))
+
+    def test_output_affecting_settings_are_cached_options(self):
+        with self.settings(PDF_TO_DOCX_PARALLEL_THRESHOLD=50):
+            options = CACHED_OPERATION_OPTIONS['pdf_to_docx']()
+        with self.settings(PDF_TO_DOCX_PARALLEL_THRESHOLD=10):
+            self.assertNotEqual(options, CACHED_OPERATION_OPTIONS['pdf_to_docx']())
+
+    def test_get_after_put(self):
+        key = self.cache.make_key('abc', 'pdf_to_txt')
+        output_path = os.path.join(self.temp_dir, 'out.txt')
+        self.assertFalse(self.cache.get(key, output_path))
+
+        self.cache.put(key, self.write_file('result.txt', b'hello'))
+        self.assertTrue(self.cache.get(key, output_path))
+        with open(output_path, 'rb') as f:
+            self.assertEqual(f.read(), b'hello')
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        keys = [self.cache.make_key(digest, 'pdf_to_txt') for digest in ('a', 'b', 'c')]
+        self.cache.put(keys[0], self.write_file('a', b'a' * 40))
+        self.cache.put(keys[1], self.write_file('b', b'b' * 40))
+
+        # Make the first entry older, then read it so the second one is least recently used
+        now = time.time()
+        os.utime(self.cache._entry_path(keys[0]), (now - 20, now - 20))
+        os.utime(self.cache._entry_path(keys[1]), (now - 10, now - 10))
+        self.assertTrue(self.cache.get(keys[0], os.path.join(self.temp_dir, 'hit')))
+
+        self.cache.put(keys[2], self.write_file('c', b'c' * 40))
+
+        self.assertTrue(os.path.exists(self.cache._entry_path(keys[0])))
+        self.assertFalse(os.path.exists(self.cache._entry_path(keys[1])))
+        self.assertTrue(os.path.exists(self.cache._entry_path(keys[2])))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+
+@override_settings(JOB_QUEUE_STALE_AFTER=60)
+class JobQueueTests(TestCase):
+    def create_job(self, minutes_ago, status='pending'):
+        return ProcessedFile.objects.create(
+            original_filename='report.pdf', file_type='pdf', file='uploads/report.pdf',
+            operation='pdf_to_txt', status=status, created_at=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+    def test_claims_oldest_job_once(self):
+        newer = self.create_job(1)
+        older = MergeJob.objects.create(
+            output_filename='merged', file_type='pdf', created_at=timezone.now() - timedelta(minutes=2)
+        )
+
+        claimed = claim_next_job()
+        self.assertIsInstance(claimed, MergeJob)
+        self.assertEqual((claimed.id, claimed.status), (older.id, 'processing'))
+        self.assertEqual(claim_next_job().id, newer.id)
+        self.assertIsNone(claim_next_job())
+
+    def test_claim_is_conditional(self):
+        job = self.create_job(1)
+        calls = []
+
+        def claimable():
+            calls.append(None)
+            # The first two calls list both models; another worker claims the job before the UPDATE
+            if len(calls) == 3:
+                ProcessedFile.objects.filter(id=job.id).update(status='processing')
+            return _claimable()
+
+        with mock.patch('api.jobs._claimable', claimable):
+            self.assertIsNone(claim_next_job())
+
+    def test_reclaims_stale_processing_jobs(self):
+        stale = self.create_job(10, status='processing')
+        fresh = self.create_job(5, status='processing')
+        ProcessedFile.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(minutes=2))
+
+        self.assertEqual(claim_next_job().id, stale.id)
+        self.assertIsNone(claim_next_job())
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'processing')
+
+    def test_cancel_job(self):
+        pending = self.create_job(1)
+        self.assertTrue(cancel_job(pending))
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'cancelled')
+        self.assertIsNone(claim_next_job())
+
+        completed = self.create_job(1, status='completed')
+        self.assertFalse(cancel_job(completed))
+        self.assertFalse(cancel_job(pending))
+
+    @override_settings(JOB_QUEUE_MAX_DEPTH=2, JOB_QUEUE_RETRY_AFTER=45)
+    def test_full_queue_rejects_new_jobs(self):
+        self.create_job(1)
+        self.create_job(1, status='completed')
+        MergeJob.objects.create(output_filename='merged', file_type='pdf', status='processing')
+
+        with self.assertRaises(JobQueueFull) as raised:
+            enqueue_merge_job([SimpleUploadedFile('a.pdf', b'%PDF')], 'merged', 'pdf')
+        self.assertEqual((raised.exception.status_code, raised.exception.retry_after), (429, 45))
+
+        responses = [
+            self.client.post('/api/upload/', {
+                'file': SimpleUploadedFile('report.pdf', b'%PDF'), 'operation': 'pdf_to_txt', 'mode': 'async',
+            }),
+            self.client.post('/api/merge/', {
+                'files': [SimpleUploadedFile('a.pdf', b'%PDF'), SimpleUploadedFile('b.pdf', b'%PDF')],
+                'output_filename': 'merged', 'mode': 'async',
+            }),
+        ]
+        for response in responses:
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '45')
+        self.assertEqual((ProcessedFile.objects.count(), MergeJob.objects.count()), (2, 1))
+
+
+class SplitPageRangesTests(SimpleTestCase):
+    def test_even_split(self):
+        self.assertEqual(split_page_ranges(10, 2), [(0, 5), (5, 10)])
+
+    def test_uneven_split(self):
+        self.assertEqual(split_page_ranges(10, 3), [(0, 4), (4, 8), (8, 10)])
+
+    def test_more_parts_than_pages(self):
+        self.assertEqual(split_page_ranges(2, 5), [(0, 1), (1, 2)])
+
+    def test_degenerate_input(self):
+        self.assertEqual(split_page_ranges(0, 4), [])
+        self.assertEqual(split_page_ranges(3, 0), [(0, 3)])
+
+
+class ParallelPdfToTxtTests(TempDirMixin, SimpleTestCase):
+    def test_parallel_output_matches_sequential(self):
+        input_path = make_pdf(os.path.join(self.temp_dir, 'input.pdf'), 9)
+        sequential_path = pdf_to_txt(input_path, os.path.join(self.temp_dir, 'sequential.txt'), workers=1)
+        parallel_path = pdf_to_txt(input_path, os.path.join(self.temp_dir, 'parallel.txt'), workers=2)
+
+        with open(sequential_path, encoding='utf-8') as sequential, open(parallel_path, encoding='utf-8') as parallel:
+            text = parallel.read()
+            self.assertEqual(text, sequential.read())
+        self.assertLess(text.index('Page 2'), text.index('Page 9'))
+
+
+
+class PdfToPptxTests(TempDirMixin, SimpleTestCase):
+    def test_short_documents_are_rendered_in_process(self):
+        input_path = make_pdf(os.path.join(self.temp_dir, 'deck.pdf'), 4)
+        with mock.patch('api.utils.worker_process_pool') as pool:
+            output_path = pdf_to_pptx(input_path, os.path.join(self.temp_dir, 'deck.pptx'), dpi=20)
+        pool.assert_not_called()
+
+        from pptx import Presentation
+        self.assertEqual(len(Presentation(output_path).slides), 4)
+
+    @override_settings(PDF_TO_PPTX_PARALLEL_THRESHOLD=4, PDF_TO_PPTX_WORKERS=2)
+    def test_long_documents_are_rendered_in_parallel(self):
+        input_path = make_pdf(os.path.join(self.temp_dir, 'deck.pdf'), 4)
+        sequential_path = pdf_to_pptx(input_path, os.path.join(self.temp_dir, 'sequential.pptx'), dpi=20, workers=1)
+        with mock.patch('api.utils.worker_process_pool', wraps=worker_process_pool) as pool:
+            parallel_path = pdf_to_pptx(input_path, os.path.join(self.temp_dir, 'parallel.pptx'), dpi=20)
+        pool.assert_called_once_with(2)
+
+        from pptx import Presentation
+        slide_images = [
+            [slide.shapes[0].image.blob for slide in Presentation(path).slides]
+            for path in (sequential_path, parallel_path)
+        ]
+        self.assertEqual(slide_images[0], slide_images[1])
+
+
+class StreamingPdfWriterTests(TempDirMixin, SimpleTestCase):
+    def write_pdf(self, image_paths):
+        output_path = os.path.join(self.temp_dir, 'output.pdf')
+        with open(output_path, 'wb') as f:
+            writer = StreamingPdfWriter(f)
+            for image_path in image_paths:
+                writer.add_image_page(image_path)
+            writer.close()
+        self.assertEqual(writer.page_count, len(image_paths))
+        with open(output_path, 'rb') as f:
+            return output_path, f.read()
+
+    def test_jpeg_is_embedded_unchanged(self):
+        image_path = self.write_image('photo.jpg', 'RGB', (200, 100), 'JPEG')
+        _, data = self.write_pdf([image_path])
+        with open(image_path, 'rb') as f:
+            self.assertIn(f.read(), data)
+        self.assertIn(b'/Filter /DCTDecode', data)
+        self.assertIn(b'/ColorSpace /DeviceRGB', data)
+
+    def test_grayscale_jpeg_is_embedded_unchanged(self):
+        image_path = self.write_image('scan.jpg', 'L', (50, 50), 'JPEG')
+        _, data = self.write_pdf([image_path])
+        with open(image_path, 'rb') as f:
+            self.assertIn(f.read(), data)
+        self.assertIn(b'/ColorSpace /DeviceGray', data)
+
+    def test_other_images_are_stored_losslessly(self):
+        _, data = self.write_pdf([
+            self.write_image('diagram.png', 'RGBA', (40, 30), 'PNG'),
+            self.write_image('print.jpg', 'CMYK', (40, 30), 'JPEG'),
+        ])
+        self.assertNotIn(b'/DCTDecode', data)
+        self.assertEqual(data.count(b'/Filter /FlateDecode'), 2)
+
+    def test_pages(self):
+        import fitz
+
+        output_path, _ = self.write_pdf([
+            self.write_image('wide.jpg', 'RGB', (200, 100), 'JPEG'),
+            self.write_image('tall.png', 'RGB', (100, 300), 'PNG', color=(10, 120, 200)),
+        ])
+        with fitz.open(output_path) as doc:
+            self.assertEqual(doc.page_count, 2)
+            # Pages are sized as if the images were printed at 100 dpi
+            self.assertEqual([tuple(page.rect)[2:] for page in doc], [(144.0, 72.0), (72.0, 216.0)])
+            self.assertEqual([len(page.get_images()) for page in doc], [1, 1])
+            pixmap = fitz.Pixmap(doc, doc[1].get_images()[0][0])
+            self.assertEqual((pixmap.width, pixmap.height), (100, 300))
+            self.assertEqual(pixmap.pixel(0, 0), (10, 120, 200))
+
+
+class RangeHeaderTests(SimpleTestCase):
+    def test_no_range(self):
+        self.assertIsNone(parse_range_header(None, 100))
+        self.assertIsNone(parse_range_header('', 100))
+        self.assertIsNone(parse_range_header('items=0-10', 100))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range_header('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range_header('bytes=10-200', 100), (10, 99))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range_header('bytes=90-', 100), (90, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-500', 100), (0, 99))
+
+    def test_unsupported_or_invalid_ranges_send_the_whole_file(self):
+        self.assertIsNone(parse_range_header('bytes=0-9,20-29', 100))
+        self.assertIsNone(parse_range_header('bytes=9-0', 100))
+        self.assertIsNone(parse_range_header('bytes=a-b', 100))
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=100-', 100)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=-0', 100)
+
+
+@override_settings(FILE_DELIVERY_BACKEND='django')
+class StoredFileDeliveryTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.content = bytes(range(256)) * 4
+        self.file_path = self.write_file('stored.pdf', self.content)
+        self.etag, self.last_modified = file_validators(self.file_path)
+
+    def deliver(self, **headers):
+        request = self.factory.get('/download/', headers=headers)
+        response = deliver_stored_file(request, self.file_path, 'stored.pdf', content_type='application/pdf')
+        self.addCleanup(response.close)
+        return response
+
+    def test_whole_file(self):
+        response = self.deliver()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_range(self):
+        response = self.deliver(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+    def test_unsatisfiable_range(self):
+        response = self.deliver(Range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range_with_current_validators(self):
+        self.assertEqual(self.deliver(Range='bytes=0-9', **{'If-Range': self.etag}).status_code, 206)
+        self.assertEqual(
+            self.deliver(Range='bytes=0-9', **{'If-Range': http_date(self.last_modified)}).status_code, 206
+        )
+
+    def test_if_range_with_stale_validators_sends_the_whole_file(self):
+        self.assertEqual(self.deliver(Range='bytes=0-9', **{'If-Range': '"stale"'}).status_code, 200)
+        self.assertEqual(self.deliver(Range='bytes=0-9', **{'If-Range': f'W/{self.etag}'}).status_code, 200)
+        self.assertEqual(
+            self.deliver(Range='bytes=0-9', **{'If-Range': http_date(self.last_modified - 60)}).status_code, 200
+        )
+
+    def test_not_modified(self):
+        self.assertEqual(self.deliver(**{'If-None-Match': self.etag}).status_code, 304)
+
+
+class FileLockTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lock_path = os.path.join(self.temp_dir, 'locks', 'key.lock')
+
+    def test_exclusive(self):
+        with file_lock(self.lock_path) as acquired:
+            self.assertTrue(acquired)
+            with file_lock(self.lock_path, blocking=False) as acquired:
+                self.assertFalse(acquired)
+            with file_lock(self.lock_path, timeout=0.1) as acquired:
+                self.assertFalse(acquired)
+        with file_lock(self.lock_path, blocking=False) as acquired:
+            self.assertTrue(acquired)
+
+    def test_waiter_does_not_lock_a_removed_file(self):
+        waiter_acquired = threading.Event()
+
+        def waiter():
+            with file_lock(self.lock_path, poll_interval=0.01):
+                waiter_acquired.set()
+
+        with file_lock(self.lock_path):
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            time.sleep(0.1)
+            # The holder removes the lock file and a newcomer locks the new one right away
+            os.remove(self.lock_path)
+            newcomer = file_lock(self.lock_path, blocking=False)
+            self.assertTrue(newcomer.__enter__())
+
+        try:
+            self.assertFalse(waiter_acquired.wait(0.3))
+        finally:
+            newcomer.__exit__(None, None, None)
+        self.assertTrue(waiter_acquired.wait(5))
+        thread.join()
+
+    def test_holders_never_overlap_while_removing_the_lock_file(self):
+        lock = threading.Lock()
+        holders = []
+        overlaps = []
+
+        def worker():
+            for _ in range(50):
+                with file_lock(self.lock_path, poll_interval=0.001):
+                    with lock:
+                        holders.append(None)
+                        if len(holders) > 1:
+                            overlaps.append(None)
+                    time.sleep(0.0005)
+                    with lock:
+                        holders.pop()
+                    # Like convert_file, the holder cleans the lock file up
+                    os.remove(self.lock_path)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [])
+
+
+class ZipStreamWriterTests(TempDirMixin, SimpleTestCase):
+    def test_archive(self):
+        content = os.urandom(300 * 1024)
+        pdf_path = self.write_file('report.pdf', content)
+        txt_path = self.write_file('notes.txt', b'notes ' * 1000)
+
+        writer = ZipStreamWriter(chunk_size=64 * 1024)
+        file_chunks = list(writer.write_file(pdf_path, writer.unique_name('report.pdf')))
+        chunks = file_chunks + list(writer.write_file(txt_path, writer.unique_name('notes.txt')))
+        chunks += writer.write_bytes(b'{}', writer.unique_name('report.pdf'))
+        chunks += writer.close()
+
+        # The member is handed out while it is read, not once it is complete
+        self.assertGreater(len(file_chunks), 1)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['report.pdf', 'notes.txt', 'report (1).pdf'])
+            self.assertEqual(archive.read('report.pdf'), content)
+            self.assertEqual(archive.read('report (1).pdf'), b'{}')
+            infos = {info.filename: info for info in archive.infolist()}
+
+        self.assertEqual(infos['report.pdf'].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(infos['notes.txt'].compress_type, zipfile.ZIP_DEFLATED)
+        # Written to an unseekable sink, so sizes follow each member in a data descriptor
+        for info in infos.values():
+            self.assertTrue(info.flag_bits & 0x08)
+
+    def test_unique_name(self):
+        writer = ZipStreamWriter()
+        self.assertEqual(
+            [writer.unique_name(name) for name in ('a.pdf', 'a.pdf', 'a.pdf', 'b')],
+            ['a.pdf', 'a (1).pdf', 'a (2).pdf', 'b'],
+        )
+
+
+class OfficeBatchConversionTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        start_patch(self, 'api.utils.get_soffice_path', return_value='/usr/bin/soffice')
+        self.media_override = override_settings(MEDIA_ROOT=self.temp_dir)
+        self.media_override.enable()
+        self.addCleanup(self.media_override.disable)
+        self.paths = [
+            self.write_file('a.docx', b'a'),
+            self.write_file('b.docx', b'broken'),
+            self.write_file('c.pptx', b'c'),
+            self.write_file('d.pdf', b'%PDF'),
+        ]
+
+    def convert_one(self, input_path, cancel=None):
+        """convert_to_pdf() stand-in for the per-file fallback"""
+        with open(input_path, 'rb') as f:
+            if f.read() == b'broken':
+                raise Exception('corrupt document')
+        return f"{input_path}.single.pdf"
+
+    def test_groups_with_per_file_fallback(self):
+        with mock.patch('api.utils.run_process', side_effect=fake_soffice) as run_process, \
+                mock.patch('api.utils.convert_to_pdf', side_effect=self.convert_one) as single:
+            results = convert_office_batch_to_pdf(self.paths, group_size=2)
+
+        # The office documents go in groups of two; the rest are converted one by one
+        self.assertEqual(run_process.call_count, 2)
+        self.assertEqual([call.args[0] for call in single.call_args_list], [self.paths[1], self.paths[3]])
+
+        for path in (self.paths[0], self.paths[2]):
+            output_path, error = results[path]
+            self.assertIsNone(error)
+            with open(output_path, 'rb') as f:
+                self.assertEqual(f.read(), b'%PDF-1.4\n')
+        self.assertEqual(results[self.paths[1]], (None, 'corrupt document'))
+        self.assertEqual(results[self.paths[3]], (f"{self.paths[3]}.single.pdf", None))
+
+    def test_timed_out_group_falls_back_per_file(self):
+        timeout = subprocess.TimeoutExpired('soffice', 1)
+        with mock.patch('api.utils.run_process', side_effect=timeout), \
+                mock.patch('api.utils.convert_to_pdf', side_effect=self.convert_one) as single:
+            results = convert_office_batch_to_pdf(self.paths)
+
+        self.assertEqual(single.call_count, 4)
+        self.assertEqual(results[self.paths[0]], (f"{self.paths[0]}.single.pdf", None))
+
+    def test_without_soffice(self):
+        with mock.patch('api.utils.get_soffice_path', return_value=None), \
+                mock.patch('api.utils.run_process') as run_process, \
+                mock.patch('api.utils.convert_to_pdf', side_effect=self.convert_one) as single:
+            convert_office_batch_to_pdf(self.paths)
+
+        run_process.assert_not_called()
+        self.assertEqual(single.call_count, 4)
+
+
+class PipelineValidationTests(SimpleTestCase):
+    file_names = ['report.pdf', 'photo.png', 'scan.jpg']
+
+    def assertInvalid(self, spec, message):
+        with self.assertRaisesMessage(PipelineError, message):
+            parse_pipeline(spec, self.file_names)
+
+    def test_orders_steps_by_dependency(self):
+        pipeline = parse_pipeline({
+            'steps': [
+                {'id': 'book', 'op': 'merge_files', 'inputs': ['file:0', 'photos']},
+                {'id': 'photos', 'op': 'merge_images_to_pdf', 'inputs': ['file:1', 'file:2']},
+            ],
+            'output': 'book',
+        }, self.file_names)
+        self.assertEqual([step['id'] for step in pipeline['steps']], ['photos', 'book'])
+        self.assertEqual(pipeline['dependencies'], {'book': {'photos'}, 'photos': set()})
+
+    def test_cycle(self):
+        self.assertInvalid({
+            'steps': [
+                {'id': 'a', 'op': 'merge_files', 'inputs': ['file:0', 'b']},
+                {'id': 'b', 'op': 'merge_files', 'inputs': ['file:0', 'a']},
+            ],
+        }, 'Pipeline has a cycle between steps: a, b')
+
+    def test_self_reference(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['a']}]},
+            'Pipeline has a cycle between steps: a',
+        )
+
+    def test_file_ref_out_of_range(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['file:3']}]},
+            'file:3 does not match an uploaded file',
+        )
+
+    def test_unknown_step_ref(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['missing']}]},
+            "unknown input 'missing'",
+        )
+
+    def test_duplicate_step_id(self):
+        self.assertInvalid({
+            'steps': [
+                {'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['file:0']},
+                {'id': 'a', 'op': 'pdf_to_docx', 'inputs': ['file:0']},
+            ],
+        }, 'Duplicate step id: a')
+
+    def test_invalid_step_id(self):
+        self.assertInvalid(
+            {'steps': [{'id': '../a', 'op': 'pdf_to_txt', 'inputs': ['file:0']}]},
+            "Invalid step id: '../a'",
+        )
+
+    def test_unknown_output(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['file:0']}], 'output': 'b'},
+            "Unknown output step: 'b'",
+        )
+
+    def test_input_counts(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'pdf_to_txt', 'inputs': ['file:0', 'file:0']}]},
+            'pdf_to_txt takes exactly one input',
+        )
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'merge_files', 'inputs': ['file:0']}]},
+            'merge_files needs at least two inputs',
+        )
+
+    def test_merge_images_to_pdf_only_takes_uploaded_images(self):
+        self.assertInvalid(
+            {'steps': [{'id': 'a', 'op': 'merge_images_to_pdf', 'inputs': ['file:0', 'file:1']}]},
+            'merge_images_to_pdf inputs must be uploaded PNG or JPEG images, not file:0',
+        )
+        self.assertInvalid({
+            'steps': [
+                {'id': 'a', 'op': 'convert_to_pdf', 'inputs': ['file:0']},
+                {'id': 'b', 'op': 'merge_images_to_pdf', 'inputs': ['file:1', 'a']},
+            ],
+        }, 'merge_images_to_pdf inputs must be uploaded PNG or JPEG images, not a')
+
+
+def parse_event(chunk):
+    """(event, data) of an encoded Server-Sent Event"""
+    fields = dict(line.split(': ', 1) for line in chunk.decode('utf-8').strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+@override_settings(JOB_EVENTS_POLL_INTERVAL=0, JOB_EVENTS_HEARTBEAT=60, JOB_EVENTS_MAX_DURATION=60)
+class JobEventStreamTests(TestCase):
+    def setUp(self):
+        self.job = ProcessedFile.objects.create(
+            original_filename='report.pdf', file_type='pdf', file='uploads/report.pdf',
+            operation='pdf_to_docx', status='processing',
+        )
+
+    def test_follows_the_job_until_it_completes(self):
+        stream = job_event_stream(ProcessedFile, self.job.id, download_url='/download/')
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.assertEqual(parse_event(next(stream)), ('progress', {
+            'id': str(self.job.id), 'status': 'processing', 'stage': '', 'current': 0, 'total': 0,
+        }))
+
+        ProcessedFile.objects.filter(id=self.job.id).update(
+            progress_stage='converting', progress_current=3, progress_total=10
+        )
+        event, data = parse_event(next(stream))
+        self.assertEqual((event, data['stage'], data['current'], data['total']), ('progress', 'converting', 3, 10))
+
+        ProcessedFile.objects.filter(id=self.job.id).update(status='completed')
+        self.assertEqual(parse_event(next(stream))[1]['status'], 'completed')
+        self.assertEqual(parse_event(next(stream)), ('completed', {'id': str(self.job.id), 'download_url': '/download/'}))
+        self.assertEqual(list(stream), [])
+
+    def test_ends_with_the_error_of_a_failed_job(self):
+        ProcessedFile.objects.filter(id=self.job.id).update(status='failed', error_message='Bad PDF')
+        events = [parse_event(chunk) for chunk in list(job_event_stream(ProcessedFile, self.job.id))[1:]]
+        self.assertEqual(events[-1], ('failed', {'id': str(self.job.id), 'error': 'Bad PDF'}))
+
+    def test_unknown_job(self):
+        chunks = list(job_event_stream(MergeJob, self.job.id))
+        self.assertEqual(parse_event(chunks[-1]), ('failed', {'id': str(self.job.id), 'error': 'Job not found'}))
+
+    @override_settings(JOB_EVENTS_HEARTBEAT=0)
+    def test_keep_alive_while_nothing_changes(self):
+        stream = job_event_stream(ProcessedFile, self.job.id)
+        next(stream), next(stream)
+        self.assertEqual(next(stream), b': keep-alive\n\n')
+
+    @override_settings(JOB_EVENTS_MAX_DURATION=0)
+    def test_stream_ends_after_max_duration(self):
+        chunks = list(job_event_stream(ProcessedFile, self.job.id))
+        self.assertEqual(parse_event(chunks[-1])[0], 'progress')
+
+    def test_view(self):
+        response = self.client.get(f'/api/jobs/{self.job.id}/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.assertEqual(parse_event(next(stream))[0], 'progress')
+        response.close()
+
+        missing = MergeJob(output_filename='missing', file_type='pdf')
+        self.assertEqual(self.client.get(f'/api/jobs/{missing.id}/events/').status_code, 404)
+
+
+class CancellationTokenTests(SimpleTestCase):
+    def test_cancel(self):
+        token = CancellationToken()
+        self.assertFalse(token.cancelled)
+        token.check()
+        token.cancel('Stopped by the client')
+        self.assertTrue(token.cancelled)
+        with self.assertRaisesMessage(OperationCancelled, 'Stopped by the client'):
+            token.check()
+
+    def test_deadline(self):
+        token = CancellationToken(timeout=0.05)
+        self.assertGreater(token.remaining(), 0)
+        self.assertLessEqual(token.bound(None), 0.05)
+        self.assertEqual(token.bound(0.01), 0.01)
+        time.sleep(0.06)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(token.remaining(), 0)
+        with self.assertRaisesMessage(OperationTimedOut, 'Operation timed out after 0.05s'):
+            token.check()
+
+    def test_parent_cancellation(self):
+        parent = CancellationToken()
+        child = CancellationToken(parent=parent)
+        parent.cancel('Job was cancelled')
+        self.assertTrue(child.cancelled)
+        with self.assertRaisesMessage(OperationCancelled, 'Job was cancelled'):
+            child.check()
+
+    def test_parent_deadline(self):
+        parent = CancellationToken(timeout=0.05)
+        child = CancellationToken(timeout=60, parent=parent)
+        self.assertLessEqual(child.remaining(), 0.05)
+        self.assertLessEqual(child.bound(10), 0.05)
+        time.sleep(0.06)
+        with self.assertRaisesMessage(OperationTimedOut, 'Operation timed out after 0.05s'):
+            child.check()
+
+    def test_poll(self):
+        stop = []
+        poll = mock.Mock(side_effect=lambda: bool(stop))
+        token = CancellationToken(poll=poll, poll_interval=0)
+        self.assertFalse(token.cancelled)
+        stop.append(True)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(poll.call_count, 2)
+
+    def test_poll_is_throttled(self):
+        poll = mock.Mock(return_value=False)
+        token = CancellationToken(poll=poll, poll_interval=60)
+        for _ in range(5):
+            self.assertFalse(token.cancelled)
+        self.assertEqual(poll.call_count, 1)
+
+
+def process_gone(pid):
+    """Whether a process has exited (a zombie left unreaped in a container counts)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] == 'Z'
+    except FileNotFoundError:
+        return True
+
+
+@skipUnless(hasattr(os, 'killpg'), 'Process groups are killed with taskkill on Windows')
+@override_settings(CANCELLATION_CHECK_INTERVAL=0.05)
+class RunProcessTests(TempDirMixin, SimpleTestCase):
+    def start_process_tree(self):
+        """Command whose child starts a grandchild and writes its pid, like the soffice wrapper"""
+        pid_path = os.path.join(self.temp_dir, 'grandchild.pid')
+        script = (
+            'import subprocess, sys, time\n'
+            "grandchild = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+            f"open({pid_path!r}, 'w').write(str(grandchild.pid))\n"
+            'time.sleep(30)\n'
+        )
+        return [sys.executable, '-c', script], pid_path
+
+    def assertTreeKilled(self, pid_path):
+        with open(pid_path) as f:
+            pid = int(f.read())
+        deadline = time.monotonic() + 5
+        while not process_gone(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(process_gone(pid))
+
+    def wait_for(self, path):
+        deadline = time.monotonic() + 10
+        while not (os.path.exists(path) and os.path.getsize(path)) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_output(self):
+        result = run_process([sys.executable, '-c', 'print("converted")'], cancel=CancellationToken())
+        self.assertEqual((result.returncode, result.stdout), (0, 'converted\n'))
+
+    def test_timeout_kills_the_process_group(self):
+        cmd, pid_path = self.start_process_tree()
+        started = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            run_process(cmd, timeout=3)
+        # A surviving grandchild would hold the output pipes open until it exits
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertTreeKilled(pid_path)
+
+    def test_cancellation_kills_the_process_group(self):
+        cmd, pid_path = self.start_process_tree()
+        token = CancellationToken()
+
+        def cancel_once_started():
+            self.wait_for(pid_path)
+            token.cancel()
+
+        thread = threading.Thread(target=cancel_once_started)
+        thread.start()
+        started = time.monotonic()
+        with self.assertRaises(OperationCancelled):
+            run_process(cmd, cancel=token)
+        self.assertLess(time.monotonic() - started, 10)
+        thread.join()
+        self.assertTreeKilled(pid_path)
+
+
+async def read_streaming(response):
+    """Body of a response that streams from the event loop"""
+    try:
+        return b''.join([chunk async for chunk in response.streaming_content])
+    finally:
+        response.close()
+
+
+@override_settings(
+    ADMISSION_CONTROL_ENABLED=False, CONVERSION_CACHE_ENABLED=False, CONVERSION_EXECUTOR_OPERATIONS=[]
+)
+class AsyncViewTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        upload_dir = os.path.join(self.temp_dir, 'media', 'temp', 'uploads')
+        os.makedirs(upload_dir)
+        media_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.temp_dir, 'media'), FILE_UPLOAD_TEMP_DIR=upload_dir
+        )
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.temp_outputs = os.path.join(self.temp_dir, 'media', 'temp')
+
+    def upload(self, path, content_type='application/octet-stream'):
+        with open(path, 'rb') as f:
+            return SimpleUploadedFile(os.path.basename(path), f.read(), content_type=content_type)
+
+    def assertNoTempOutputs(self):
+        self.assertEqual([name for name in os.listdir(self.temp_outputs) if name != 'uploads'], [])
+
+    async def test_upload(self):
+        pdf_path = make_pdf(os.path.join(self.temp_dir, 'report.pdf'), 2)
+        response = await self.async_client.post(
+            '/api/async/upload/', {'file': self.upload(pdf_path), 'operation': 'pdf_to_txt'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="report.txt"')
+        text = (await read_streaming(response)).decode('utf-8')
+        self.assertIn('Page 2', text)
+        self.assertNoTempOutputs()
+
+    async def test_upload_validation(self):
+        pdf_path = make_pdf(os.path.join(self.temp_dir, 'report.pdf'), 1)
+        response = await self.async_client.post(
+            '/api/async/upload/', {'file': self.upload(pdf_path), 'operation': 'shred'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('operation', json.loads(response.content))
+
+    async def test_upload_busy_and_timed_out(self):
+        pdf_path = make_pdf(os.path.join(self.temp_dir, 'report.pdf'), 1)
+        for error, status_code in ((ExecutorBusy('busy'), 503), (OperationTimedOut('too slow'), 504)):
+            with mock.patch('api.async_views.process_file_without_db_async', side_effect=error):
+                response = await self.async_client.post(
+                    '/api/async/upload/', {'file': self.upload(pdf_path), 'operation': 'pdf_to_docx'}
+                )
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(json.loads(response.content), {'error': str(error)})
+
+    async def test_upload_queued(self):
+        pdf_path = make_pdf(os.path.join(self.temp_dir, 'report.pdf'), 1)
+        with mock.patch('api.jobs.get_job_worker_pool') as pool:
+            response = await self.async_client.post(
+                '/api/async/upload/', {'file': self.upload(pdf_path), 'operation': 'pdf_to_txt', 'mode': 'async'}
+            )
+        self.assertEqual(response.status_code, 202)
+        pool.return_value.notify.assert_called_once()
+        job = await ProcessedFile.objects.aget(id=json.loads(response.content)['id'])
+        self.assertEqual((job.status, job.operation), ('pending', 'pdf_to_txt'))
+
+    @override_settings(JOB_QUEUE_MAX_DEPTH=1, JOB_QUEUE_RETRY_AFTER=45)
+    async def test_upload_queue_full(self):
+        pdf_path = make_pdf(os.path.join(self.temp_dir, 'report.pdf'), 1)
+        with mock.patch('api.jobs.get_job_worker_pool'):
+            for expected_status in (202, 429):
+                response = await self.async_client.post(
+                    '/api/async/upload/', {'file': self.upload(pdf_path), 'operation': 'pdf_to_txt', 'mode': 'async'}
+                )
+                self.assertEqual(response.status_code, expected_status)
+        self.assertEqual(response['Retry-After'], '45')
+        self.assertEqual(await ProcessedFile.objects.acount(), 1)
+
+    async def test_images_to_pdf(self):
+        import fitz
+
+        response = await self.async_client.post('/api/async/images-to-pdf/', {
+            'files': [
+                self.upload(self.write_image('a.png', 'RGB', (40, 30), 'PNG')),
+                self.upload(self.write_image('b.jpg', 'RGB', (30, 40), 'JPEG')),
+            ],
+            'output_filename': 'album',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="album.pdf"')
+        with fitz.open(stream=await read_streaming(response), filetype='pdf') as doc:
+            self.assertEqual(doc.page_count, 2)
+        self.assertNoTempOutputs()
+
+    async def test_images_to_pdf_rejects_other_files(self):
+        response = await self.async_client.post('/api/async/images-to-pdf/', {
+            'files': [self.upload(self.write_image('a.gif', 'RGB', (4, 4), 'GIF'))],
+        })
+        self.assertEqual(response.status_code, 400)
+
+    async def test_merge_rejects_mixed_types_unless_asked(self):
+        response = await self.async_client.post('/api/async/merge/', {
+            'files': [
+                self.upload(make_pdf(os.path.join(self.temp_dir, 'a.pdf'), 1)),
+                self.upload(self.write_file('b.docx', b'docx')),
+            ],
+            'output_filename': 'merged',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    async def test_download(self):
+        job = await ProcessedFile.objects.acreate(
+            original_filename='report.pdf', file_type='pdf', file='uploads/report.pdf',
+            operation='pdf_to_txt', status='completed', processed_filename='report.txt',
+        )
+        await sync_to_async(job.processed_file.save)('report.txt', ContentFile(b'0123456789'))
+        url = f'/api/async/download/{job.id}/'
+
+        # The validators, conditional and Range handling stat the file in a worker thread
+        stat_threads = []
+        real_stat = os.stat
+
+        def stat(path, *args, **kwargs):
+            if os.fspath(path) == job.processed_file.path:
+                stat_threads.append(threading.get_ident())
+            return real_stat(path, *args, **kwargs)
+
+        with mock.patch('os.stat', stat):
+            response = await self.async_client.get(url, headers={'Range': 'bytes=0-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(stat_threads)
+        self.assertNotIn(threading.get_ident(), stat_threads)
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await read_streaming(response), b'0123456789')
+
+        response = await self.async_client.get(url, headers={'Range': 'bytes=2-4'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(await read_streaming(response), b'234')
+
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        await ProcessedFile.objects.filter(id=job.id).aupdate(status='processing')
+        self.assertEqual((await self.async_client.get(url)).status_code, 400)
+        self.assertEqual((await self.async_client.get(f'/api/async/download/{uuid.uuid4()}/')).status_code, 404)
+
+
+class AdmissionLedgerTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ledger = AdmissionLedger(
+            ledger_dir=self.temp_dir,
+            budget=10,
+            fast_lane_budget=2,
+            fast_lane_max_cost=1,
+            seconds_per_unit=5,
+            max_retry_after=120,
+            ticket_ttl=3600,
+        )
+
+    def test_admit_and_release(self):
+        ticket = self.ledger.admit('pdf_to_txt', 0.5)
+        self.assertEqual(ticket.lane, 'fast')
+        self.assertEqual(self.ledger.status()['in_use'], 0.5)
+
+        ticket.release()
+        ticket.release()
+        status = self.ledger.status()
+        self.assertEqual(status['in_use'], 0)
+        self.assertEqual(status['admitted'], 1)
+
+    def test_shared_lane_rejected_with_retry_after(self):
+        self.ledger.admit('pdf_to_docx', 6)
+        with self.assertRaises(AdmissionRejected) as context:
+            self.ledger.admit('pdf_to_docx', 4)
+        self.assertEqual(context.exception.status_code, 429)
+        # The first ticket is expected to be released after 6 units of 5 seconds
+        self.assertEqual(context.exception.retry_after, 30)
+        self.assertEqual(self.ledger.status()['rejected'], 1)
+
+    def test_fast_lane_kept_for_cheap_requests(self):
+        self.ledger.admit('pdf_to_docx', 8)
+        ticket = self.ledger.admit('pdf_to_txt', 1)
+        self.assertEqual(ticket.lane, 'fast')
+
+    def test_oversize_request_admitted_alone(self):
+        ticket = self.ledger.admit('merge_files', 50)
+        self.assertEqual(ticket.lane, 'shared')
+
+        with self.assertRaises(AdmissionRejected) as context:
+            self.ledger.admit('merge_files', 50)
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.retry_after, 120)
+
+        ticket.release()
+        self.ledger.admit('merge_files', 50)
+
+    def test_full_fast_lane_is_unavailable(self):
+        self.ledger.admit('pdf_to_docx', 8)
+        self.ledger.admit('pdf_to_txt', 1)
+        self.ledger.admit('pdf_to_txt', 1)
+        with self.assertRaises(AdmissionRejected) as context:
+            self.ledger.admit('pdf_to_txt', 1)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(context.exception.retry_after, 5)
+
+    def test_tickets_of_this_process_are_kept(self):
+        self.ledger.admit('pdf_to_docx', 4)
+        status = self.ledger.status()
+        self.assertEqual(status['in_use'], 4)
+        self.assertEqual(status['requests'], {'fast': 0, 'shared': 1})
+
+    def test_processes_are_not_signalled_on_windows(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        with open(self.ledger.ledger_path, 'w') as f:
+            json.dump({'tickets': {'other': {
+                'operation': 'pdf_to_docx', 'cost': 4, 'lane': 'shared', 'pid': process.pid,
+                'admitted': time.time(), 'expected_end': time.time() + 20,
+            }}}, f)
+
+        # os.kill() would terminate the process there, so it must not be used as a probe
+        with mock.patch('api.admission.os.name', 'nt'), \
+                mock.patch('api.admission.os.kill', side_effect=AssertionError('os.kill called')), \
+                mock.patch('api.admission._windows_process_alive', return_value=True) as alive:
+            self.ledger.admit('pdf_to_txt', 1)
+            self.assertEqual(self.ledger.status()['in_use'], 5)
+        self.assertEqual({call.args[0] for call in alive.call_args_list}, {process.pid})
+
+    def test_tickets_of_dead_processes_are_dropped(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        with open(self.ledger.ledger_path, 'w') as f:
+            json.dump({'tickets': {'stale': {
+                'operation': 'pdf_to_docx', 'cost': 8, 'lane': 'shared', 'pid': process.pid,
+                'admitted': time.time(), 'expected_end': time.time() + 40,
+            }}}, f)
+
+        self.assertEqual(self.ledger.status()['in_use'], 0)
+        self.ledger.admit('pdf_to_docx', 8)
+
+
+def executor_worker_count(cancel=None):
+    """Page-pool size of a task asking for four processes, in a conversion executor worker"""
+    return get_worker_count(4)
+
+
+class ExecutorPagePoolTests(SimpleTestCase):
+    def test_executor_tasks_do_not_start_page_pools(self):
+        self.assertEqual(executor_worker_count(), 4)
+        # The workers use the default CONVERSION_EXECUTOR_TASK_WORKERS of 1
+        executor = ConversionExecutor(1)
+        try:
+            self.assertEqual(executor.run(executor_worker_count, (), {}), 1)
+        finally:
+            executor.shutdown()
+
+    def test_page_pools_are_capped_in_executor_workers(self):
+        with mock.patch('os.cpu_count', return_value=8):
+            self.assertEqual(get_worker_count(0), 8)
+            self.assertEqual(get_worker_count(3), 3)
+            with mock.patch('api.utils.in_executor_worker', return_value=True):
+                with self.settings(CONVERSION_EXECUTOR_TASK_WORKERS=1):
+                    self.assertEqual(get_worker_count(0), 1)
+                with self.settings(CONVERSION_EXECUTOR_TASK_WORKERS=2):
+                    self.assertEqual(get_worker_count(0), 2)
+                    self.assertEqual(get_worker_count(1), 1)
@@ -0,0 +1,245 @@
+import time
+import bisect
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_current_timing = contextvars.ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Durations of the named stages of one request.
+
+    A stage can run more than once (e.g. 'convert' for every merged file); its
+    durations are added up. Labels say which operation and file type the
+    request was, so its stages can be aggregated per operation.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.labels = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, duration):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+    def server_timing(self):
+        """The stages as a Server-Timing header value, durations in milliseconds"""
+        with self._lock:
+            return ', '.join(f"{stage};dur={duration * 1000:.1f}" for stage, duration in self.stages.items())
+
+
+def current_timing():
+    """The RequestTiming of the request being handled, or None outside a request"""
+    return _current_timing.get()
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as a stage of the current request
+
+    Does nothing outside a request (job workers, management commands), so
+    converters can be instrumented unconditionally.
+    """
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.record(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_stages():
+    """
+    Record the stages of a block in a RequestTiming of its own
+
+    For work done on behalf of a request in another process (the conversion
+    executor), whose stages are sent back and added with merge_stages().
+    """
+    timing = RequestTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+def merge_stages(stages):
+    """Add stage durations collected elsewhere to the current request"""
+    timing = _current_timing.get()
+    if timing is not None:
+        for stage, duration in stages.items():
+            timing.record(stage, duration)
+
+
+def annotate(**labels):
+    """Label the current request, e.g. annotate(operation='pdf_to_docx', file_type='pdf')"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.labels.update(labels)
+
+
+class TimingHistograms:
+    """
+    Per-process histograms of stage durations, by operation, file type and stage.
+
+    Buckets are cumulative upper bounds in seconds (TIMING_HISTOGRAM_BUCKETS),
+    like Prometheus histograms, so snapshots from several worker processes can
+    be added up.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation, file_type, stage, duration):
+        key = (operation, file_type, stage)
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'count': 0, 'sum': 0.0, 'counts': [0] * (len(self.buckets) + 1)}
+            series['count'] += 1
+            series['sum'] += duration
+            series['counts'][index] += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            list: One dict per series, with cumulative bucket counts ('+Inf' last)
+        """
+        with self._lock:
+            series_items = [(key, dict(series, counts=list(series['counts']))) for key, series in self._series.items()]
+
+        snapshot = []
+        for (operation, file_type, stage), series in sorted(series_items):
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + ['+Inf'], series['counts']):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            snapshot.append({
+                'operation': operation,
+                'file_type': file_type,
+                'stage': stage,
+                'count': series['count'],
+                'sum': round(series['sum'], 6),
+                'buckets': buckets,
+            })
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+_histograms = None
+_histograms_lock = threading.Lock()
+
+
+def get_timing_histograms():
+    """The timing histograms of this process"""
+    global _histograms
+    with _histograms_lock:
+        if _histograms is None:
+            _histograms = TimingHistograms(settings.TIMING_HISTOGRAM_BUCKETS)
+        return _histograms
+
+
+def _record_request(timing, status_code):
+    operation = timing.labels.get('operation')
+    # Failed requests stop early and would skew the latencies of the stages they reach
+    if operation is None or status_code >= 400:
+        return
+    file_type = timing.labels.get('file_type', '')
+    histograms = get_timing_histograms()
+    with timing._lock:
+        stages = list(timing.stages.items())
+    for stage, duration in stages:
+        histograms.observe(operation, file_type, stage, duration)
+    logger.info(
+        f"Timing operation={operation} file_type={file_type} "
+        + ' '.join(f"{stage}={duration * 1000:.1f}ms" for stage, duration in stages)
+    )
+
+
+class ServerTimingMiddleware:
+    """
+    Time each request's stages and report them in a Server-Timing header.
+
+    Code under the request marks its stages with span(); the middleware adds a
+    'total' stage. Successful requests labelled with annotate(operation=...)
+    are also recorded in the timing histograms. A streamed response's headers
+    go out before its body, so the time spent sending it ('stream') only
+    reaches the histograms, once the server closes the response.
+
+    Runs natively under ASGI as well, so it does not push async views back
+    into a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.SERVER_TIMING_ENABLED:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self._finish(timing, start, response)
+
+    async def __acall__(self, request):
+        if not settings.SERVER_TIMING_ENABLED:
+            return await self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self._finish(timing, start, response)
+
+    def _finish(self, timing, start, response):
+        timing.record('total', time.perf_counter() - start)
+        response['Server-Timing'] = timing.server_timing()
+
+        if response.streaming:
+            stream_start = time.perf_counter()
+
+            def record_stream():
+                timing.record('stream', time.perf_counter() - stream_start)
+                _record_request(timing, response.status_code)
+
+            # The same hook Django uses to close the request once the response is done
+            response._resource_closers.append(record_stream)
+        else:
+            _record_request(timing, response.status_code)
+        return response
@@ -0,0 +1,38 @@
+import time
+import hashlib
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from .timing import current_timing
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to a temp file on disk, hashing them on the way in.
+
+    The resulting TemporaryUploadedFile has a `sha256` attribute, so the upload
+    never has to be read again just to compute the conversion cache key.
+    The time spent receiving the request body is recorded as the 'upload' stage.
+    """
+
+    def handle_raw_input(self, *args, **kwargs):
+        self.upload_started = time.perf_counter()
+        return super().handle_raw_input(*args, **kwargs)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.digest.hexdigest()
+        return uploaded_file
+
+    def upload_complete(self):
+        timing = current_timing()
+        if timing is not None:
+            timing.record('upload', time.perf_counter() - self.upload_started)
+        return super().upload_complete()
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 # Create a router for ViewSets
@@ -15,6 +15,9 @@ urlpatterns = [
     # Health check
     path('health/', views.HealthCheckView.as_view(), name='health'),
     
+    # Per-stage timing histograms of this worker process
+    path('metrics/timings/', views.TimingMetricsView.as_view(), name='timing-metrics'),
+    
     # File processing endpoints (direct streaming)
     path('upload/', views.FileUploadView.as_view(), name='upload-file'),
     path('upload-no-db/', views.FileProcessNoDBView.as_view(), name='file-upload-no-db'),
@@ -30,6 +33,25 @@ urlpatterns = [
     # Images to PDF endpoint (direct streaming)
     path('images-to-pdf/', views.ImagesToPdfView.as_view(), name='images-to-pdf'),
     
+    # Batch conversion endpoint (streamed ZIP)
+    path('batch/', views.BatchConvertView.as_view(), name='batch-convert'),
+    
+    # Chained operations endpoint (pipeline of steps, one download)
+    path('pipeline/', views.PipelineView.as_view(), name='pipeline'),
+    
+    # Progress (Server-Sent Events) and cancellation of async jobs
+    path('jobs/<uuid:job_id>/events/', views.JobEventsView.as_view(), name='job-events'),
+    path('jobs/<uuid:job_id>/cancel/', views.JobCancelView.as_view(), name='job-cancel'),
+    
+    # Download results of async jobs
+    path('download/<uuid:file_id>/', views.FileDownloadView.as_view(), name='file-download'),
+    
+    # Async versions of the upload, merge, images-to-PDF and download endpoints (for ASGI servers)
+    path('async/upload/', async_views.AsyncFileUploadView.as_view(), name='async-upload-file'),
+    path('async/merge/', async_views.AsyncMergeFilesView.as_view(), name='async-merge-files'),
+    path('async/images-to-pdf/', async_views.AsyncImagesToPdfView.as_view(), name='async-images-to-pdf'),
+    path('async/download/<uuid:file_id>/', async_views.AsyncFileDownloadView.as_view(), name='async-file-download'),
+    
     # Token endpoints
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
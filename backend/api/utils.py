@@ -1,3 +1,4 @@
+import io
 import os
 import subprocess
 import tempfile
@@ -7,22 +8,65 @@ from pathlib import Path
 from django.conf import settings
 from django.core.files import File
 from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from pdf2docx import Converter
-import fitz  # PyMuPDF
-from pypdf import PdfMerger
-from docx import Document
 import shutil
 import logging
-from pptx import Presentation
-import openpyxl
 import time
+import json
+import hashlib
+import asyncio
+import functools
+import importlib
+from contextlib import closing, contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from .cancellation import (
+    CancellationToken, OperationCancelled, check_cancelled, wait_for_result, run_process
+)
+from .capabilities import get_converter_capabilities, get_soffice_path
+from .executor import in_executor_worker, run_conversion, run_conversion_async
+from .locks import file_lock
+from .pdf_writer import StreamingPdfWriter
+from .progress import report_progress
+from .result_cache import get_result_cache
+from .soffice_pool import get_soffice_pool
+from .timing import span, annotate
+from .zip_stream import ZipStreamWriter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Conversion libraries are imported by the converters when they first run, so
+# processes that never convert (management commands, the health check) don't
+# pay for them. preload_converters imports them up front for warm workers.
+CONVERTER_LIBRARIES = ['fitz', 'pdf2docx', 'pypdf', 'docx', 'pptx', 'reportlab.pdfgen.canvas']
+
+
+def preload_converters(libraries=None):
+    """
+    Import conversion libraries ahead of the first request
+    
+    Under gunicorn --preload this runs in the master, so workers share the
+    imported modules instead of each loading them on their first conversion.
+    
+    Args:
+        libraries (list, optional): Modules to import, default CONVERTER_LIBRARIES
+    
+    Returns:
+        dict: Seconds each import took; a library that fails to import is logged and skipped
+    """
+    timings = {}
+    for library in libraries or CONVERTER_LIBRARIES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(library)
+        except Exception as e:
+            logger.warning(f"Could not preload {library}: {str(e)}")
+            continue
+        timings[library] = round(time.perf_counter() - start, 4)
+    logger.info(f"Preloaded conversion libraries in {sum(timings.values()):.2f}s: {', '.join(timings)}")
+    return timings
+
+
 def get_temp_dir():
     """Get the temporary directory path"""
     temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
@@ -35,13 +79,14 @@ def get_file_extension(file_path):
     return os.path.splitext(file_path)[1][1:].lower()
 
 
-def convert_to_pdf(input_path, output_path=None):
+def convert_to_pdf(input_path, output_path=None, cancel=None):
     """
     Convert various file formats to PDF
     
     Args:
         input_path (str): Path to the input file
         output_path (str, optional): Path for the output PDF file
+        cancel (CancellationToken, optional): Stops the conversion, and kills LibreOffice, when cancelled
     
     Returns:
         str: Path to the generated PDF file
@@ -49,6 +94,9 @@ def convert_to_pdf(input_path, output_path=None):
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.pdf")
     
+    # LibreOffice can hang on a corrupt document, so it never runs without a deadline
+    cancel = CancellationToken.for_operation('convert_to_pdf', parent=cancel)
+    
     file_ext = get_file_extension(input_path)
     
     # Office documents (docx, pptx, xlsx)
@@ -56,85 +104,71 @@ def convert_to_pdf(input_path, output_path=None):
         # First, try to use LibreOffice for conversion
         libreoffice_success = False
         try:
-            # Check if LibreOffice is available
-            user_provided_path = r"C:\Program Files\LibreOffice\program\soffice.exe"
-            libreoffice_paths = [
-                user_provided_path,
-                'soffice',  # Default PATH
-                'C:\\Program Files\\LibreOffice\\program\\soffice.exe',  # Common Windows path
-                'C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe',  # 32-bit on 64-bit Windows
-                '/usr/bin/soffice',  # Common Linux path
-                '/Applications/LibreOffice.app/Contents/MacOS/soffice',  # Mac path
-            ]
-            
-            soffice_path = None
-            for path in libreoffice_paths:
-                try:
-                    # For absolute paths, just check if they exist
-                    if os.path.isabs(path):
-                        if os.path.exists(path):
-                            soffice_path = path
-                            break
-                    # For 'soffice' in PATH, use 'where' on Windows or 'which' on Unix
-                    else:
-                        if os.name == 'nt':  # Windows
-                            check_cmd = ['where', path]
-                        else:  # Unix-like
-                            check_cmd = ['which', path]
-                        
-                        result = subprocess.run(check_cmd, capture_output=True, text=True, check=False)
-                        if result.returncode == 0 and result.stdout.strip():
-                            soffice_path = result.stdout.strip().splitlines()[0] # take the first one
-                            break
-                except Exception as e:
-                    logger.warning(f"Error checking LibreOffice path {path}: {str(e)}")
-            
+            # Discovered once per process by the capability registry
+            with span('discover'):
+                soffice_path = get_soffice_path()
+
             if soffice_path:
-                logger.info(f"Found LibreOffice at: {soffice_path}")
-                # Use LibreOffice for conversion
-                cmd = [
-                    soffice_path, 
-                    '--headless', 
-                    '--convert-to', 
-                    'pdf',
-                    '--outdir', 
-                    os.path.dirname(output_path), 
-                    input_path
-                ]
+                # Prefer a warm pooled instance over a cold soffice start
+                pool = get_soffice_pool(soffice_path)
+                if pool is not None:
+                    try:
+                        with span('soffice'):
+                            pool.convert(input_path, output_path, cancel=cancel)
+                        libreoffice_success = True
+                    except OperationCancelled:
+                        raise
+                    except Exception as pool_error:
+                        logger.warning(f"LibreOffice pool conversion failed, falling back to a new soffice process: {str(pool_error)}")
+                
+                if not libreoffice_success:
+                    # Use LibreOffice for conversion
+                    cmd = [
+                        soffice_path, 
+                        '--headless', 
+                        '--convert-to', 
+                        'pdf',
+                        '--outdir', 
+                        os.path.dirname(output_path), 
+                        input_path
+                    ]
                 
-                logger.info(f"Running LibreOffice conversion command: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True)
+                    logger.info(f"Running LibreOffice conversion command: {' '.join(cmd)}")
+                    with span('soffice'):
+                        result = run_process(cmd, cancel=cancel)
                 
-                if result.returncode == 0:
-                    # LibreOffice keeps the original filename but changes extension
-                    original_filename = os.path.basename(input_path)
-                    original_name_without_ext = os.path.splitext(original_filename)[0]
-                    generated_pdf = os.path.join(os.path.dirname(output_path), f"{original_name_without_ext}.pdf")
+                    if result.returncode == 0:
+                        # LibreOffice keeps the original filename but changes extension
+                        original_filename = os.path.basename(input_path)
+                        original_name_without_ext = os.path.splitext(original_filename)[0]
+                        generated_pdf = os.path.join(os.path.dirname(output_path), f"{original_name_without_ext}.pdf")
                     
-                    # Rename to the desired output path
-                    if generated_pdf != output_path and os.path.exists(generated_pdf):
-                        os.rename(generated_pdf, output_path)
-                        libreoffice_success = True
-                    elif os.path.exists(generated_pdf):
-                        shutil.copyfile(generated_pdf, output_path)
-                        libreoffice_success = True
+                        # Rename to the desired output path
+                        if generated_pdf != output_path and os.path.exists(generated_pdf):
+                            os.rename(generated_pdf, output_path)
+                            libreoffice_success = True
+                        elif os.path.exists(generated_pdf):
+                            shutil.copyfile(generated_pdf, output_path)
+                            libreoffice_success = True
+                        else:
+                            logger.error(f"LibreOffice conversion failed. Expected output file not found: {generated_pdf}")
+                            logger.error(f"Command output: {result.stdout}")
+                            logger.error(f"Command error: {result.stderr}")
                     else:
-                        logger.error(f"LibreOffice conversion failed. Expected output file not found: {generated_pdf}")
+                        logger.error(f"LibreOffice conversion failed with return code {result.returncode}")
                         logger.error(f"Command output: {result.stdout}")
                         logger.error(f"Command error: {result.stderr}")
-                else:
-                    logger.error(f"LibreOffice conversion failed with return code {result.returncode}")
-                    logger.error(f"Command output: {result.stdout}")
-                    logger.error(f"Command error: {result.stderr}")
             else:
                 logger.warning("LibreOffice not found. Please install it and ensure 'soffice' is in your system's PATH.")
         
+        except OperationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error during LibreOffice conversion: {str(e)}")
         
         # If LibreOffice conversion failed, try alternative methods or raise error
         if not libreoffice_success:
-            if file_ext == 'docx':
+            if file_ext == 'docx' and get_converter_capabilities()['docx2pdf']['available']:
                 try:
                     # Try docx2pdf for DOCX files
                     from docx2pdf import convert
@@ -143,20 +177,15 @@ def convert_to_pdf(input_path, output_path=None):
                 except Exception as docx_error:
                     logger.error(f"docx2pdf conversion failed: {str(docx_error)}")
                     raise Exception(f"Failed to convert DOCX to PDF. Please ensure LibreOffice is installed correctly for full support.")
-            else: # for 'pptx' and 'xlsx'
+            else: # for 'pptx' and 'xlsx', or 'docx' without docx2pdf
                 raise Exception(f"Failed to convert {file_ext.upper()} to PDF. Please ensure LibreOffice is installed correctly and accessible in the system's PATH.")
     
     # Images (png, jpg, jpeg)
     elif file_ext in ['png', 'jpg', 'jpeg']:
         try:
-            img = Image.open(input_path)
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-                
-            # Save as PDF
-            img.save(output_path, 'PDF', resolution=100.0)
+            merge_images_to_pdf([input_path], output_path, cancel=cancel)
+        except OperationCancelled:
+            raise
         except Exception as img_error:
             logger.error(f"Image conversion failed: {str(img_error)}")
             raise Exception(f"Failed to convert image to PDF: {str(img_error)}")
@@ -164,6 +193,9 @@ def convert_to_pdf(input_path, output_path=None):
     # Text files
     elif file_ext == 'txt':
         try:
+            from reportlab.pdfgen import canvas
+            from reportlab.lib.pagesizes import letter
+            
             # Create a PDF from text
             c = canvas.Canvas(output_path, pagesize=letter)
             text_file = open(input_path, 'r', encoding='utf-8', errors='ignore')
@@ -173,6 +205,7 @@ def convert_to_pdf(input_path, output_path=None):
             
             for line in text_file:
                 if y < 50:  # Create a new page when reaching bottom
+                    cancel.check()
                     c.showPage()
                     y = 750
                 
@@ -181,6 +214,8 @@ def convert_to_pdf(input_path, output_path=None):
             
             text_file.close()
             c.save()
+        except OperationCancelled:
+            raise
         except Exception as txt_error:
             logger.error(f"Text file conversion failed: {str(txt_error)}")
             raise Exception(f"Failed to convert TXT to PDF: {str(txt_error)}")
@@ -199,17 +234,174 @@ def convert_to_pdf(input_path, output_path=None):
     return output_path
 
 
-def pdf_to_docx(input_path, output_path=None):
+OFFICE_EXTENSIONS = ['docx', 'pptx', 'xlsx']
+
+
+def convert_office_batch_to_pdf(input_paths, group_size=None, cancel=None):
+    """
+    Convert many office documents to PDF with one soffice run per group
+    
+    LibreOffice accepts many input files in one invocation, which spreads its
+    startup cost over the whole group. Each run gets its own profile and output
+    directory, so runs never collide with each other or with the worker pool.
+    Any file the grouped run does not produce (or that isn't an office document)
+    is converted on its own with convert_to_pdf.
+    
+    Args:
+        input_paths (list): Paths of the files to convert
+        group_size (int, optional): Files per soffice run (LIBREOFFICE_BATCH_SIZE)
+        cancel (CancellationToken, optional): Stops the remaining conversions when cancelled
+    
+    Returns:
+        dict: input path -> (output_path, None) on success or (None, error message)
+    """
+    group_size = group_size or settings.LIBREOFFICE_BATCH_SIZE
+    office_paths = [path for path in input_paths if get_file_extension(path) in OFFICE_EXTENSIONS]
+    
+    results = {}
+    try:
+        soffice_path = get_soffice_path()
+        if soffice_path:
+            for start in range(0, len(office_paths), group_size):
+                results.update(_convert_office_group(soffice_path, office_paths[start:start + group_size], cancel))
+        
+        # Per-file fallback for anything the grouped runs did not convert
+        for input_path in input_paths:
+            if input_path in results:
+                continue
+            try:
+                results[input_path] = (convert_to_pdf(input_path, cancel=cancel), None)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Conversion of {input_path} to PDF failed: {str(e)}")
+                results[input_path] = (None, str(e))
+    except OperationCancelled:
+        _remove_temp_files([output_path for output_path, _ in results.values() if output_path])
+        raise
+    
+    return results
+
+
+def _convert_office_group(soffice_path, input_paths, cancel=None):
+    """
+    Run one soffice process over a group of office documents
+    
+    The run is killed, with everything it started, after
+    LIBREOFFICE_BATCH_TIMEOUT seconds or when `cancel` is cancelled.
+    
+    Returns:
+        dict: input path -> (output_path, None) for every file that was converted
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='soffice_batch_', dir=get_temp_dir())
+    try:
+        input_dir = os.path.join(workdir, 'in')
+        output_dir = os.path.join(workdir, 'out')
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        
+        # soffice names outputs after the input stem, so give every input a unique one
+        staged_paths = []
+        for i, input_path in enumerate(input_paths):
+            staged_path = os.path.join(input_dir, f"{i:04d}.{get_file_extension(input_path)}")
+            try:
+                os.link(input_path, staged_path)
+            except OSError:
+                shutil.copyfile(input_path, staged_path)
+            staged_paths.append(staged_path)
+        
+        cmd = [
+            soffice_path,
+            f"-env:UserInstallation={Path(workdir, 'profile').as_uri()}",
+            '--headless',
+            '--norestore',
+            '--convert-to',
+            'pdf',
+            '--outdir',
+            output_dir,
+        ] + staged_paths
+        
+        logger.info(f"Running LibreOffice batch conversion of {len(input_paths)} files")
+        try:
+            result = run_process(cmd, cancel=cancel, timeout=settings.LIBREOFFICE_BATCH_TIMEOUT)
+            if result.returncode != 0:
+                logger.error(f"LibreOffice batch conversion failed with return code {result.returncode}")
+                logger.error(f"Command error: {result.stderr}")
+        except subprocess.TimeoutExpired:
+            # Keep whatever was converted before the timeout; the rest falls back per file
+            logger.error(f"LibreOffice batch conversion timed out after {settings.LIBREOFFICE_BATCH_TIMEOUT}s")
+        
+        # Map outputs back to inputs by their staged stem
+        for i, input_path in enumerate(input_paths):
+            generated_pdf = os.path.join(output_dir, f"{i:04d}.pdf")
+            if os.path.exists(generated_pdf) and os.path.getsize(generated_pdf) > 0:
+                output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.pdf")
+                os.replace(generated_pdf, output_path)
+                results[input_path] = (output_path, None)
+            else:
+                logger.warning(f"LibreOffice batch conversion produced no output for {input_path}")
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Error during LibreOffice batch conversion: {str(e)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    return results
+
+
+def _parse_docx_page_range(input_path, start, end, json_path):
+    """Parse pages [start, end) with pdf2docx in a worker process and serialize them to JSON"""
+    from pdf2docx import Converter
+    
+    cv = Converter(input_path)
+    try:
+        convert_settings = cv.default_settings
+        cv.load_pages()
+        # Only this range is parsed; the document-level analysis still sees every page
+        for page in cv.pages:
+            page.skip_parsing = True
+        for page_num in range(start, end):
+            cv.pages[page_num].skip_parsing = False
+        cv.parse_document(**convert_settings).parse_pages(**convert_settings).serialize(json_path)
+    finally:
+        cv.close()
+
+
+def get_pdf_to_docx_options():
+    """
+    How pdf_to_docx splits documents into page ranges
+
+    Ranges are converted separately and reassembled, so the split changes the
+    output and is part of the cache key.
+    """
+    return {
+        'parallel_threshold': settings.PDF_TO_DOCX_PARALLEL_THRESHOLD,
+        'workers': get_worker_count(settings.PDF_TO_DOCX_WORKERS),
+    }
+
+
+def pdf_to_docx(input_path, output_path=None, workers=None, progress=None, cancel=None):
     """
     Convert PDF to DOCX
     
+    Documents with at least PDF_TO_DOCX_PARALLEL_THRESHOLD pages are parsed in page
+    ranges on worker processes and reassembled into a single DOCX.
+    
     Args:
         input_path (str): Path to the input PDF file
         output_path (str, optional): Path for the output DOCX file
+        workers (int, optional): Worker processes to use, 1 forces the sequential path
+        progress (callable, optional): Called as progress(stage, pages_done, page_count)
+        cancel (CancellationToken, optional): Checked between pages
     
     Returns:
         str: Path to the generated DOCX file
     """
+    import fitz
+    from pdf2docx import Converter
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.docx")
     
@@ -217,25 +409,159 @@ def pdf_to_docx(input_path, output_path=None):
     if get_file_extension(input_path) != 'pdf':
         raise ValueError("Input file must be a PDF")
     
-    # Convert PDF to DOCX
-    cv = Converter(input_path)
-    cv.convert(output_path)
-    cv.close()
+    pdf_document = fitz.open(input_path)
+    page_count = pdf_document.page_count
+    pdf_document.close()
+    
+    if workers is None:
+        if page_count >= settings.PDF_TO_DOCX_PARALLEL_THRESHOLD:
+            workers = get_worker_count(settings.PDF_TO_DOCX_WORKERS)
+        else:
+            workers = 1
+    
+    if workers <= 1 or page_count <= 1:
+        # Same steps as Converter.convert, one page at a time so progress can be reported
+        cv = Converter(input_path)
+        try:
+            convert_settings = cv.default_settings
+            cv.load_pages().parse_document(**convert_settings)
+            pages = list(cv.pages)
+            for page in pages:
+                page.skip_parsing = True
+            for page_num, page in enumerate(pages):
+                check_cancelled(cancel)
+                page.skip_parsing = False
+                cv.parse_pages(**convert_settings)
+                page.skip_parsing = True
+                report_progress(progress, 'converting', page_num + 1, page_count)
+            report_progress(progress, 'writing', 0, 0)
+            cv.make_docx(output_path, **convert_settings)
+        finally:
+            cv.close()
+        
+        return output_path
+    
+    # pdf2docx's own multi_processing mode writes its JSON files to the working
+    # directory, so concurrent conversions would clash; use a private directory
+    work_dir = tempfile.mkdtemp(dir=get_temp_dir())
+    try:
+        ranges = split_page_ranges(page_count, workers)
+        json_paths = [os.path.join(work_dir, f"pages_{i}.json") for i in range(len(ranges))]
+        logger.info(f"Converting {page_count} pages to DOCX in {len(ranges)} ranges on {workers} processes")
+        
+        with worker_process_pool(workers) as executor:
+            futures = [
+                executor.submit(_parse_docx_page_range, input_path, start, end, json_path)
+                for (start, end), json_path in zip(ranges, json_paths)
+            ]
+            for future, (start, end) in zip(futures, ranges):
+                wait_for_result(future, cancel)
+                report_progress(progress, 'converting', end, page_count)
+        
+        # Reassemble the parsed ranges into one document
+        report_progress(progress, 'writing', 0, 0)
+        cv = Converter(input_path)
+        try:
+            for json_path in json_paths:
+                cv.deserialize(json_path)
+            cv.make_docx(output_path, **cv.default_settings)
+        finally:
+            cv.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
     
     return output_path
 
 
-def pdf_to_txt(input_path, output_path=None):
+def get_worker_count(configured):
+    """
+    Resolve a configured worker count, where 0 means one per CPU core
+    
+    In a conversion executor worker the count is capped at
+    CONVERSION_EXECUTOR_TASK_WORKERS: the executor already runs a task per
+    core, and a page pool of one process per core in each of them would
+    square the processes on the host.
+    """
+    workers = configured if configured > 0 else (os.cpu_count() or 1)
+    if in_executor_worker():
+        workers = min(workers, max(1, settings.CONVERSION_EXECUTOR_TASK_WORKERS))
+    return workers
+
+
+@contextmanager
+def worker_process_pool(workers):
+    """
+    ProcessPoolExecutor that is torn down at once if the block raises
+    
+    A plain `with ProcessPoolExecutor()` waits for every submitted task on the
+    way out, so a cancelled or failed conversion would hold its CPUs until all
+    of its pages were done. Here queued tasks are dropped and the worker
+    processes killed instead.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield executor
+    except BaseException:
+        # ProcessPoolExecutor has no public way to stop running tasks before Python 3.14
+        terminate_workers = getattr(executor, 'terminate_workers', None)
+        if terminate_workers is not None:
+            terminate_workers()
+        else:
+            # shutdown() forgets the worker processes, so collect them first
+            processes = list((getattr(executor, '_processes', None) or {}).values())
+            executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.kill()
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def split_page_ranges(page_count, parts):
+    """
+    Split pages into contiguous ranges
+    
+    Args:
+        page_count (int): Number of pages
+        parts (int): Number of ranges to aim for
+    
+    Returns:
+        list: (start, end) tuples covering every page in order, end exclusive
+    """
+    chunk_size = max(1, -(-page_count // max(1, parts)))
+    return [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+
+
+def _extract_text_range(input_path, start, end):
+    """Extract the text of pages [start, end) in a worker process"""
+    import fitz
+    
+    pdf_document = fitz.open(input_path)
+    try:
+        return [pdf_document[page_num].get_text() for page_num in range(start, end)]
+    finally:
+        pdf_document.close()
+
+
+def pdf_to_txt(input_path, output_path=None, workers=None, progress=None, cancel=None):
     """
     Convert PDF to TXT
     
+    Documents with at least PDF_TO_TXT_PARALLEL_THRESHOLD pages are split into page
+    ranges that are extracted in parallel worker processes.
+    
     Args:
         input_path (str): Path to the input PDF file
         output_path (str, optional): Path for the output TXT file
+        workers (int, optional): Worker processes to use, 1 forces the sequential path
+        progress (callable, optional): Called as progress(stage, pages_done, page_count)
+        cancel (CancellationToken, optional): Checked between pages
     
     Returns:
         str: Path to the generated TXT file
     """
+    import fitz
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.txt")
     
@@ -245,77 +571,232 @@ def pdf_to_txt(input_path, output_path=None):
     
     # Extract text from PDF
     pdf_document = fitz.open(input_path)
+    page_count = pdf_document.page_count
+    
+    if workers is None:
+        if page_count >= settings.PDF_TO_TXT_PARALLEL_THRESHOLD:
+            workers = get_worker_count(settings.PDF_TO_TXT_WORKERS)
+        else:
+            workers = 1
+    
+    if workers > 1 and page_count > 1:
+        pdf_document.close()
+        
+        # More ranges than workers keeps every worker busy when pages differ in cost
+        ranges = split_page_ranges(page_count, workers * 4)
+        logger.info(f"Extracting text from {page_count} pages in {len(ranges)} ranges on {workers} processes")
+        
+        with worker_process_pool(workers) as executor:
+            futures = [executor.submit(_extract_text_range, input_path, start, end) for start, end in ranges]
+            with open(output_path, 'w', encoding='utf-8') as txt_file:
+                # Results are written in submission order, so pages stay in order
+                for future, (start, end) in zip(futures, ranges):
+                    for page_text in wait_for_result(future, cancel):
+                        txt_file.write(page_text)
+                        txt_file.write('\n\n--- Page Break ---\n\n')
+                    report_progress(progress, 'converting', end, page_count)
+        
+        return output_path
+    
     with open(output_path, 'w', encoding='utf-8') as txt_file:
-        for page_num in range(pdf_document.page_count):
+        for page_num in range(page_count):
+            check_cancelled(cancel)
             page = pdf_document[page_num]
             txt_file.write(page.get_text())
             txt_file.write('\n\n--- Page Break ---\n\n')
+            report_progress(progress, 'converting', page_num + 1, page_count)
     
     pdf_document.close()
     
     return output_path
 
 
-def pdf_to_pptx(input_path, output_path=None):
+def iter_pdf_text(input_path):
+    """
+    Yield the text of a PDF page by page, in the same format as pdf_to_txt
+    
+    Only one page is held in memory at a time and nothing is written to disk.
+    
+    Args:
+        input_path (str): Path to the input PDF file
+    
+    Yields:
+        bytes: UTF-8 text of each page followed by the page break separator
+    """
+    import fitz
+    
+    # Check if input is actually a PDF
+    if get_file_extension(input_path) != 'pdf':
+        raise ValueError("Input file must be a PDF")
+    
+    pdf_document = fitz.open(input_path)
+    try:
+        for page_num in range(pdf_document.page_count):
+            page = pdf_document[page_num]
+            yield (page.get_text() + '\n\n--- Page Break ---\n\n').encode('utf-8')
+    finally:
+        pdf_document.close()
+
+
+def _render_page_range(input_path, start, end, dpi, image_format, jpeg_quality):
+    """Render pages [start, end) to in-memory images in a worker process"""
+    import fitz
+    
+    pdf_document = fitz.open(input_path)
+    try:
+        pages = []
+        for page_num in range(start, end):
+            page = pdf_document[page_num]
+            pix = page.get_pixmap(dpi=dpi)
+            if image_format == 'jpeg':
+                # Pillow's JPEG encoder is several times faster than MuPDF's
+                buffer = io.BytesIO()
+                Image.frombytes('RGB', (pix.width, pix.height), pix.samples).save(buffer, 'JPEG', quality=jpeg_quality)
+                image_bytes = buffer.getvalue()
+            else:
+                image_bytes = pix.tobytes('png')
+            pages.append((page.rect.width, page.rect.height, image_bytes))
+        return pages
+    finally:
+        pdf_document.close()
+
+
+def render_pdf_pages(input_path, dpi=150, image_format='png', jpeg_quality=85, workers=1, cancel=None):
+    """
+    Render every page of a PDF to an image in memory
+    
+    Args:
+        input_path (str): Path to the input PDF file
+        dpi (int): Rendering resolution
+        image_format (str): 'png' or 'jpeg'
+        jpeg_quality (int): JPEG quality when image_format is 'jpeg'
+        workers (int): Worker processes to render with, 1 renders in this process
+        cancel (CancellationToken, optional): Checked between pages
+    
+    Yields:
+        tuple: (page width in points, page height in points, image bytes), in page order
+    """
+    import fitz
+    
+    if image_format not in ('png', 'jpeg'):
+        raise ValueError(f"Unsupported image format: {image_format}")
+    
+    pdf_document = fitz.open(input_path)
+    page_count = pdf_document.page_count
+    pdf_document.close()
+    
+    if workers <= 1 or page_count <= 1:
+        for page_num in range(page_count):
+            check_cancelled(cancel)
+            yield from _render_page_range(input_path, page_num, page_num + 1, dpi, image_format, jpeg_quality)
+        return
+    
+    ranges = split_page_ranges(page_count, workers * 4)
+    logger.info(f"Rendering {page_count} pages in {len(ranges)} ranges on {workers} processes")
+    
+    # Also torn down if the consumer stops early and closes this generator
+    with worker_process_pool(workers) as executor:
+        futures = [
+            executor.submit(_render_page_range, input_path, start, end, dpi, image_format, jpeg_quality)
+            for start, end in ranges
+        ]
+        # Consume in submission order so slides stay in page order
+        for future in futures:
+            yield from wait_for_result(future, cancel)
+
+
+def get_pdf_to_pptx_options():
+    """Rendering options for pdf_to_pptx; they change the output, so they are part of its cache key"""
+    return {
+        'dpi': settings.PDF_TO_PPTX_DPI,
+        'image_format': settings.PDF_TO_PPTX_IMAGE_FORMAT,
+        'jpeg_quality': settings.PDF_TO_PPTX_JPEG_QUALITY,
+    }
+
+
+def pdf_to_pptx(input_path, output_path=None, dpi=None, image_format=None, jpeg_quality=None, workers=None,
+                progress=None, cancel=None):
     """
     Convert PDF to PPTX. Each PDF page becomes an image on a slide.
     
+    Pages are rendered in parallel worker processes for documents with at least
+    PDF_TO_PPTX_PARALLEL_THRESHOLD pages, and images are handed to python-pptx
+    in memory without a round-trip through disk.
+    
     Args:
         input_path (str): Path to the input PDF file.
         output_path (str, optional): Path for the output PPTX file.
+        dpi (int, optional): Rendering resolution, defaults to PDF_TO_PPTX_DPI.
+        image_format (str, optional): 'png' or 'jpeg', defaults to PDF_TO_PPTX_IMAGE_FORMAT.
+        jpeg_quality (int, optional): JPEG quality, defaults to PDF_TO_PPTX_JPEG_QUALITY.
+        workers (int, optional): Worker processes to use, 1 forces the sequential path.
+        progress (callable, optional): Called as progress(stage, pages_done, page_count).
+        cancel (CancellationToken, optional): Checked between pages.
         
     Returns:
         str: Path to the generated PPTX file.
     """
+    import fitz
+    from pptx import Presentation
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.pptx")
 
     if get_file_extension(input_path) != 'pdf':
         raise ValueError("Input file must be a PDF")
 
+    options = get_pdf_to_pptx_options()
+    dpi = dpi or options['dpi']
+    image_format = image_format or options['image_format']
+    jpeg_quality = jpeg_quality or options['jpeg_quality']
+    
     pdf_document = fitz.open(input_path)
-    prs = Presentation()
+    page_count = pdf_document.page_count
+    pdf_document.close()
     
-    # Use a temp directory for images
-    temp_dir = tempfile.mkdtemp()
-
-    try:
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            pix = page.get_pixmap(dpi=150) # Use a reasonable DPI
-            img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-            pix.save(img_path)
+    if workers is None:
+        if page_count >= settings.PDF_TO_PPTX_PARALLEL_THRESHOLD:
+            workers = get_worker_count(settings.PDF_TO_PPTX_WORKERS)
+        else:
+            workers = 1
 
-            blank_slide_layout = prs.slide_layouts[6]  # Blank slide layout
+    prs = Presentation()
+    blank_slide_layout = prs.slide_layouts[6]  # Blank slide layout
+    
+    # Closing the generator on an error stops any rendering still in progress
+    with closing(render_pdf_pages(input_path, dpi, image_format, jpeg_quality, workers, cancel)) as pages:
+        for page_num, (width, height, image_bytes) in enumerate(pages):
+            check_cancelled(cancel)
             slide = prs.slides.add_slide(blank_slide_layout)
 
             # Set slide dimensions from PDF page dimensions
-            prs.slide_width = int(page.rect.width * 914400 / 72) # Convert points to EMU
-            prs.slide_height = int(page.rect.height * 914400 / 72)
+            prs.slide_width = int(width * 914400 / 72) # Convert points to EMU
+            prs.slide_height = int(height * 914400 / 72)
 
             # Add image to fill the slide
-            slide.shapes.add_picture(img_path, 0, 0, width=prs.slide_width, height=prs.slide_height)
-    
-    finally:
-        pdf_document.close()
-        # Clean up temporary directory
-        shutil.rmtree(temp_dir, ignore_errors=True)
+            slide.shapes.add_picture(io.BytesIO(image_bytes), 0, 0, width=prs.slide_width, height=prs.slide_height)
+            report_progress(progress, 'converting', page_num + 1, page_count)
 
+    report_progress(progress, 'writing', 0, 0)
     prs.save(output_path)
     return output_path
 
 
-def merge_pdf_files(file_paths, output_path=None):
+def merge_pdf_files(file_paths, output_path=None, progress=None, cancel=None):
     """
     Merge multiple PDF files into one
     
     Args:
         file_paths (list): List of paths to PDF files to merge
         output_path (str, optional): Path for the output merged PDF
+        progress (callable, optional): Called as progress(stage, files_done, file_count)
+        cancel (CancellationToken, optional): Checked between files
     
     Returns:
         str: Path to the merged PDF file
     """
+    from pypdf import PdfMerger
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.pdf")
     
@@ -332,14 +813,17 @@ def merge_pdf_files(file_paths, output_path=None):
         # Merge PDFs
         merger = PdfMerger()
         for i, file_path in enumerate(file_paths):
+            check_cancelled(cancel)
             try:
                 merger.append(file_path)
                 logger.info(f"Added PDF {i+1}/{len(file_paths)}: {file_path}")
             except Exception as e:
                 raise ValueError(f"Error adding PDF file {file_path}: {str(e)}")
+            report_progress(progress, 'merging', i + 1, len(file_paths))
         
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        report_progress(progress, 'writing', 0, 0)
         
         # Write merged PDF to output file
         merger.write(output_path)
@@ -359,20 +843,26 @@ def merge_pdf_files(file_paths, output_path=None):
                 os.remove(output_path)
             except:
                 pass
+        if isinstance(e, OperationCancelled):
+            raise
         raise Exception(f"Failed to merge PDF files: {str(e)}")
 
 
-def merge_docx_files(file_paths, output_path=None):
+def merge_docx_files(file_paths, output_path=None, progress=None, cancel=None):
     """
     Merge multiple DOCX files into one
     
     Args:
         file_paths (list): List of paths to DOCX files to merge
         output_path (str, optional): Path for the output merged DOCX
+        progress (callable, optional): Called as progress(stage, files_done, file_count)
+        cancel (CancellationToken, optional): Checked between files
     
     Returns:
         str: Path to the merged DOCX file
     """
+    from docx import Document
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.docx")
     
@@ -391,6 +881,7 @@ def merge_docx_files(file_paths, output_path=None):
         
         # Process each document
         for i, file_path in enumerate(file_paths):
+            check_cancelled(cancel)
             try:
                 logger.info(f"Processing DOCX {i+1}/{len(file_paths)}: {file_path}")
                 doc = Document(file_path)
@@ -405,9 +896,11 @@ def merge_docx_files(file_paths, output_path=None):
                     
             except Exception as e:
                 raise ValueError(f"Error processing DOCX file {file_path}: {str(e)}")
+            report_progress(progress, 'merging', i + 1, len(file_paths))
         
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        report_progress(progress, 'writing', 0, 0)
         
         # Save the merged document
         merged_doc.save(output_path)
@@ -426,20 +919,26 @@ def merge_docx_files(file_paths, output_path=None):
                 os.remove(output_path)
             except:
                 pass
+        if isinstance(e, OperationCancelled):
+            raise
         raise Exception(f"Failed to merge DOCX files: {str(e)}")
 
 
-def merge_pptx_files(file_paths, output_path=None):
+def merge_pptx_files(file_paths, output_path=None, progress=None, cancel=None):
     """
     Merge multiple PPTX files into one
     
     Args:
         file_paths (list): List of paths to PPTX files to merge
         output_path (str, optional): Path for the output merged PPTX
+        progress (callable, optional): Called as progress(stage, files_done, file_count)
+        cancel (CancellationToken, optional): Checked between files
     
     Returns:
         str: Path to the merged PPTX file
     """
+    from pptx import Presentation
+    
     if output_path is None:
         output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}.pptx")
     
@@ -462,7 +961,8 @@ def merge_pptx_files(file_paths, output_path=None):
             xml_slides.remove(slide)
     
     # Loop through each presentation to add its slides
-    for file_path in file_paths:
+    for i, file_path in enumerate(file_paths):
+        check_cancelled(cancel)
         try:
             # Open the presentation
             pres = Presentation(file_path)
@@ -481,8 +981,10 @@ def merge_pptx_files(file_paths, output_path=None):
         except Exception as e:
             logger.error(f"Error processing PPTX file {file_path}: {str(e)}")
             raise Exception(f"Failed to process PPTX file: {str(e)}")
+        report_progress(progress, 'merging', i + 1, len(file_paths))
     
     # Save the merged presentation
+    report_progress(progress, 'writing', 0, 0)
     try:
         merged_pres.save(output_path)
     except Exception as e:
@@ -492,7 +994,92 @@ def merge_pptx_files(file_paths, output_path=None):
     return output_path
 
 
-def merge_files(file_paths, output_filename, file_type):
+def normalize_to_pdf(file_paths, progress=None, cancel=None):
+    """
+    Convert every non-PDF file to PDF concurrently, keeping the order
+    
+    Conversions go through convert_file, so they use the result cache and
+    coalesce with identical in-flight conversions.
+    
+    Args:
+        file_paths (list): Paths of files in any convert_to_pdf input format
+        progress (callable, optional): Called as progress(stage, files_done, file_count)
+        cancel (CancellationToken, optional): Stops the conversions when cancelled
+    
+    Returns:
+        tuple: (list of PDF paths in input order, list of converted temp files to clean up)
+    """
+    pdf_paths = list(file_paths)
+    pending = [i for i, file_path in enumerate(file_paths) if get_file_extension(file_path) != 'pdf']
+    if not pending:
+        return pdf_paths, []
+    
+    converted = []
+    errors = []
+    workers = max(1, min(settings.BATCH_CONVERSION_WORKERS, len(pending)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='normalize-pdf') as executor:
+        futures = {
+            i: executor.submit(
+                convert_file, file_paths[i], os.path.basename(file_paths[i]), 'convert_to_pdf', cancel=cancel
+            )
+            for i in pending
+        }
+        # Collect every result before failing, so no converted file is left behind
+        for done, (i, future) in enumerate(futures.items(), start=1):
+            try:
+                output_path, _ = future.result()
+            except Exception as e:
+                errors.append(f"{os.path.basename(file_paths[i])}: {str(e)}")
+                continue
+            converted.append(output_path)
+            pdf_paths[i] = output_path
+            report_progress(progress, 'converting', done, len(pending))
+    
+    if errors:
+        _remove_temp_files(converted)
+        check_cancelled(cancel)
+        raise ValueError(f"Failed to convert files to PDF for merging: {'; '.join(errors)}")
+    
+    return pdf_paths, converted
+
+
+def merge_mixed_files(file_paths, output_filename, progress=None, cancel=None):
+    """
+    Merge files of mixed formats into one PDF, in the given order
+    
+    Non-PDF inputs (office documents, images, text) are converted to PDF
+    concurrently, then everything is merged with merge_pdf_files.
+    
+    Args:
+        file_paths (list): List of file paths to merge
+        output_filename (str): Name for the output file
+        progress (callable, optional): Called as progress(stage, done, total)
+        cancel (CancellationToken, optional): Checked between files
+    
+    Returns:
+        str: Path to the merged PDF file
+    """
+    logger.info(f"Starting mixed merge operation for {len(file_paths)} files")
+    
+    if len(file_paths) < 2:
+        raise ValueError("At least two files are required for merging")
+    
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise ValueError(f"File not found: {file_path}")
+    
+    safe_filename = os.path.basename(output_filename)
+    output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}_{safe_filename}.pdf")
+    
+    with span('normalize'):
+        pdf_paths, converted = normalize_to_pdf(file_paths, progress, cancel)
+    try:
+        return merge_pdf_files(pdf_paths, output_path, progress, cancel)
+    finally:
+        _remove_temp_files(converted)
+
+
+def merge_files(file_paths, output_filename, file_type, mixed=False, progress=None, cancel=None):
     """
     Merge files of the same type
     
@@ -500,10 +1087,17 @@ def merge_files(file_paths, output_filename, file_type):
         file_paths (list): List of file paths to merge
         output_filename (str): Name for the output file
         file_type (str): Type of files being merged (pdf, docx, pptx)
+        mixed (bool): Files may be any convert_to_pdf input; they are merged into a PDF
+        progress (callable, optional): Called as progress(stage, done, total)
+        cancel (CancellationToken, optional): Checked between files; the MERGE_FILES time budget applies on top
     
     Returns:
         str: Path to the merged file
     """
+    cancel = CancellationToken.for_operation('merge_files', parent=cancel)
+    if mixed:
+        return merge_mixed_files(file_paths, output_filename, progress, cancel)
+    
     logger.info(f"Starting merge operation for {len(file_paths)} files of type {file_type}")
     
     # Basic validation
@@ -526,18 +1120,18 @@ def merge_files(file_paths, output_filename, file_type):
     if safe_filename != output_filename:
         logger.warning(f"Output filename sanitized from {output_filename} to {safe_filename}")
     
-    # Determine output path
-    output_path = os.path.join(get_temp_dir(), f"{safe_filename}.{file_type}")
+    # Determine output path (unique, so concurrent merges with the same name don't collide)
+    output_path = os.path.join(get_temp_dir(), f"{uuid.uuid4()}_{safe_filename}.{file_type}")
     logger.info(f"Output path for merged file: {output_path}")
     
     try:
         # Merge based on file type
         if file_type.lower() == 'pdf':
-            return merge_pdf_files(file_paths, output_path)
+            return merge_pdf_files(file_paths, output_path, progress, cancel)
         elif file_type.lower() == 'docx':
-            return merge_docx_files(file_paths, output_path)
+            return merge_docx_files(file_paths, output_path, progress, cancel)
         elif file_type.lower() == 'pptx':
-            return merge_pptx_files(file_paths, output_path)
+            return merge_pptx_files(file_paths, output_path, progress, cancel)
         else:
             raise ValueError(f"Unsupported file type for merging: {file_type}")
     except Exception as e:
@@ -568,13 +1162,14 @@ def clean_temp_files():
                 pass
 
 
-def merge_images_to_pdf(image_paths, output_path=None):
+def merge_images_to_pdf(image_paths, output_path=None, cancel=None):
     """
     Merge multiple images into a single PDF file, preserving the order
     
     Args:
         image_paths (list): List of paths to image files
         output_path (str, optional): Path for the output PDF file
+        cancel (CancellationToken, optional): Checked between images
     
     Returns:
         str: Path to the generated PDF file
@@ -588,46 +1183,195 @@ def merge_images_to_pdf(image_paths, output_path=None):
         if ext not in ['png', 'jpg', 'jpeg']:
             raise ValueError(f"Unsupported file format: {ext}. Only PNG, JPG, and JPEG are supported")
     
-    # If there's only one image, convert it directly to PDF
-    if len(image_paths) == 1:
-        img = Image.open(image_paths[0])
+    cancel = CancellationToken.for_operation('merge_images_to_pdf', parent=cancel)
+    
+    # Pages are written one at a time, so memory is bounded by a single image
+    try:
+        with open(output_path, 'wb') as f:
+            writer = StreamingPdfWriter(f)
+            for image_path in image_paths:
+                cancel.check()
+                writer.add_image_page(image_path)
+            writer.close()
+    except OperationCancelled:
+        _remove_temp_files([output_path])
+        raise
+    
+    return output_path
+
+def save_uploaded_file(uploaded_file, destination_path):
+    """
+    Save an uploaded file to disk
+    
+    Args:
+        uploaded_file: The uploaded file object
+        destination_path (str): Path to write the file to
+    
+    Returns:
+        str: SHA-256 hex digest of the file contents
+    """
+    # Ensure the directory exists
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+    
+    # Uploads streamed to a temp file are linked into place instead of copied
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        try:
+            os.link(uploaded_file.temporary_file_path(), destination_path)
+        except OSError:
+            pass
+        else:
+            return getattr(uploaded_file, 'sha256', None) or file_sha256(destination_path)
+    
+    digest = hashlib.sha256()
+    with open(destination_path, 'wb+') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+            digest.update(chunk)
+    
+    return digest.hexdigest()
+
+def file_sha256(file_path):
+    """Compute the SHA-256 hex digest of a file on disk"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Settings that change an operation's output, hashed into its cache key so that
+# changing them does not serve results made with the old values
+CACHED_OPERATION_OPTIONS = {
+    'pdf_to_docx': get_pdf_to_docx_options,
+    'pdf_to_pptx': get_pdf_to_pptx_options,
+}
+
+def convert_file(input_path, file_name, operation, input_digest=None, progress=None, cancel=None):
+    """
+    Run a conversion operation on a file that is already on disk
+    
+    Results are served from the conversion result cache when the same input has
+    already been converted with the same operation and converter versions.
+    Concurrent identical conversions on the host are coalesced: one runs and the
+    others wait for its cached result.
+    The input file is left in place.
+    
+    Args:
+        input_path (str): Path to the input file
+        file_name (str): Original name of the file, used for the output name
+        operation (str): The operation to perform (e.g., 'convert_to_pdf')
+        input_digest (str, optional): SHA-256 of the input, computed if missing
+        progress (callable, optional): Called as progress(stage, pages_done, page_count);
+            convert_to_pdf only reports that it has started
+        cancel (CancellationToken, optional): Stops the conversion when cancelled; the
+            operation's time budget (CONVERSION_TIME_BUDGETS) applies on top
+    
+    Returns:
+        tuple: (output_path, output_filename)
+    """
+    temp_dir = get_temp_dir()
+    cancel = CancellationToken.for_operation(operation, parent=cancel)
+    
+    # Get file extension
+    extension = file_name.split('.')[-1].lower()
+    
+    # Process based on operation
+    if operation == 'convert_to_pdf':
+        # Check if file is already a PDF
+        if extension == 'pdf':
+            output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+            shutil.copyfile(input_path, output_path)
+            return output_path, file_name
+        
+        converter, output_ext = convert_to_pdf, 'pdf'
+        
+    elif operation == 'pdf_to_docx':
+        # Check if file is a PDF
+        if extension != 'pdf':
+            raise ValueError('Only PDF files can be converted to DOCX')
+        
+        converter, output_ext = pdf_to_docx, 'docx'
+        
+    elif operation == 'pdf_to_txt':
+        # Check if file is a PDF
+        if extension != 'pdf':
+            raise ValueError('Only PDF files can be converted to TXT')
+        
+        converter, output_ext = pdf_to_txt, 'txt'
+        
+    elif operation == 'pdf_to_pptx':
+        if extension != 'pdf':
+            raise ValueError('Only PDF files can be converted to PPTX')
+        
+        converter, output_ext = pdf_to_pptx, 'pptx'
+        
+    else:
+        raise ValueError(f'Unsupported operation: {operation}')
+    
+    output_filename = f"{os.path.splitext(file_name)[0]}.{output_ext}"
+    
+    # LibreOffice gives no feedback while it runs, so convert_to_pdf only reports that it started
+    if converter is convert_to_pdf:
+        converter = functools.partial(converter, cancel=cancel)
+    else:
+        converter = functools.partial(converter, progress=progress, cancel=cancel)
+    
+    # Serve repeated conversions from the result cache
+    cache = get_result_cache()
+    if cache is not None:
+        if input_digest is None:
+            input_digest = file_sha256(input_path)
+        options = CACHED_OPERATION_OPTIONS.get(operation)
+        cache_key = cache.make_key(input_digest, operation, options() if options is not None else None)
+        output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.{output_ext}")
+        with span('cache'):
+            hit = cache.get(cache_key, output_path)
+        if hit:
+            return output_path, output_filename
         
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        # Identical requests in any worker wait for the one in flight and share its result
+        lock_path = os.path.join(temp_dir, 'inflight', f"{cache_key}.lock")
+        with file_lock(lock_path, timeout=cancel.bound(settings.CONVERSION_SINGLE_FLIGHT_TIMEOUT)) as acquired:
+            cancel.check()
+            if not acquired:
+                logger.warning(f"Timed out waiting for in-flight conversion {cache_key}, converting anyway")
+            elif cache.get(cache_key, output_path, record_miss=False):
+                logger.info(f"Shared result of in-flight conversion {cache_key}")
+                return output_path, output_filename
             
-        # Save as PDF
-        img.save(output_path, 'PDF', resolution=100.0)
-        return output_path
+            try:
+                report_progress(progress, 'converting', 0, 0)
+                with span('convert'):
+                    output_path = converter(input_path)
+                with span('cache'):
+                    cache.put(cache_key, output_path)
+            finally:
+                # Remove the lock file while still holding it: file_lock makes waiters on the
+                # removed file lock whatever file is at the path next, so holders never overlap
+                if acquired:
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        # Already gone, or still open elsewhere on Windows; it is reused then
+                        pass
+        
+        return output_path, output_filename
     
-    # For multiple images, create a PDF with multiple pages
-    images = []
-    for image_path in image_paths:
-        img = Image.open(image_path)
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        images.append(img)
-    
-    # Save the first image as PDF
-    images[0].save(
-        output_path, 
-        'PDF', 
-        resolution=100.0,
-        save_all=True, 
-        append_images=images[1:]
-    )
+    report_progress(progress, 'converting', 0, 0)
+    with span('convert'):
+        output_path = converter(input_path)
     
-    return output_path
+    return output_path, output_filename
 
 # Function to process files without database dependency
-def process_file_without_db(uploaded_file, operation):
+def process_file_without_db(uploaded_file, operation, cancel=None):
     """
     Process a file without requiring database access
     
     Args:
         uploaded_file: The uploaded file object
         operation: The operation to perform (e.g., 'convert_to_pdf')
+        cancel (CancellationToken, optional): Stops the conversion, e.g. when the client goes away
     
     Returns:
         tuple: (output_path, output_filename)
@@ -637,61 +1381,23 @@ def process_file_without_db(uploaded_file, operation):
         temp_dir = get_temp_dir()
         
         # Save uploaded file to temp location
-        timestamp = int(time.time())
-        temp_input_path = os.path.join(temp_dir, f"input_{timestamp}_{uploaded_file.name}")
-        
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(temp_input_path), exist_ok=True)
-        
-        # Save the uploaded file
-        with open(temp_input_path, 'wb+') as destination:
-            for chunk in uploaded_file.chunks():
-                destination.write(chunk)
+        # Unique per request, so concurrent uploads of the same file never share a path
+        temp_input_path = os.path.join(temp_dir, f"input_{uuid.uuid4().hex}_{uploaded_file.name}")
+        annotate(operation=operation, file_type=get_file_extension(uploaded_file.name))
+        with span('save'):
+            input_digest = save_uploaded_file(uploaded_file, temp_input_path)
         
-        # Get file extension
         file_name = uploaded_file.name
-        extension = file_name.split('.')[-1].lower()
         
-        # Process based on operation
-        if operation == 'convert_to_pdf':
-            # Check if file is already a PDF
-            if extension == 'pdf':
-                return temp_input_path, file_name
-            
-            # Convert to PDF
-            output_path = convert_to_pdf(temp_input_path)
-            output_filename = f"{os.path.splitext(file_name)[0]}.pdf"
-            
-        elif operation == 'pdf_to_docx':
-            # Check if file is a PDF
-            if extension != 'pdf':
-                raise ValueError('Only PDF files can be converted to DOCX')
-            
-            # Convert PDF to DOCX
-            output_path = pdf_to_docx(temp_input_path)
-            output_filename = f"{os.path.splitext(file_name)[0]}.docx"
-            
-        elif operation == 'pdf_to_txt':
-            # Check if file is a PDF
-            if extension != 'pdf':
-                raise ValueError('Only PDF files can be converted to TXT')
-            
-            # Convert PDF to TXT
-            output_path = pdf_to_txt(temp_input_path)
-            output_filename = f"{os.path.splitext(file_name)[0]}.txt"
-            
-        elif operation == 'pdf_to_pptx':
-            if extension != 'pdf':
-                raise ValueError('Only PDF files can be converted to PPTX')
-            
-            # Convert PDF to PPTX
-            output_path = pdf_to_pptx(temp_input_path)
-            output_filename = f"{os.path.splitext(file_name)[0]}.pptx"
-            
-        else:
-            raise ValueError(f'Unsupported operation: {operation}')
+        # A PDF needs no conversion: hand over the saved input itself
+        if operation == 'convert_to_pdf' and get_file_extension(file_name) == 'pdf':
+            output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+            os.replace(temp_input_path, output_path)
+            return output_path, file_name
         
-        return output_path, output_filename
+        return run_conversion(
+            operation, convert_file, temp_input_path, file_name, operation, input_digest, cancel=cancel
+        )
         
     except Exception as e:
         logger.error(f"Error processing file without DB: {str(e)}")
@@ -704,14 +1410,202 @@ def process_file_without_db(uploaded_file, operation):
         except Exception as e:
             logger.error(f"Error cleaning up temp file: {str(e)}")
 
+# Function to stream PDF text without database dependency
+def stream_pdf_text_without_db(uploaded_file):
+    """
+    Extract text from an uploaded PDF as a stream of pages
+    
+    The uploaded PDF is saved to a temp file, which is removed once the stream is
+    exhausted or closed.
+    
+    Args:
+        uploaded_file: The uploaded file object
+    
+    Returns:
+        tuple: (iterator of bytes, output_filename)
+    """
+    if get_file_extension(uploaded_file.name) != 'pdf':
+        raise ValueError('Only PDF files can be converted to TXT')
+    
+    temp_input_path = os.path.join(get_temp_dir(), f"input_{uuid.uuid4().hex}_{uploaded_file.name}")
+    # The extraction itself happens while the response streams
+    annotate(operation='pdf_to_txt', file_type='pdf')
+    with span('save'):
+        save_uploaded_file(uploaded_file, temp_input_path)
+    
+    def stream():
+        try:
+            yield from iter_pdf_text(temp_input_path)
+        except Exception as e:
+            logger.error(f"Error streaming PDF text: {str(e)}")
+            raise
+        finally:
+            try:
+                if os.path.exists(temp_input_path):
+                    os.remove(temp_input_path)
+            except Exception as e:
+                logger.error(f"Error cleaning up temp file: {str(e)}")
+    
+    output_filename = f"{os.path.splitext(uploaded_file.name)[0]}.txt"
+    return stream(), output_filename
+
+# Function to convert a batch of files and stream the results as a ZIP
+def stream_batch_conversion_without_db(files, operation):
+    """
+    Convert many uploaded files with one operation and stream the results as a ZIP
+    
+    Files are converted concurrently on a bounded thread pool
+    (BATCH_CONVERSION_WORKERS) and each result is added to the archive as soon as
+    it is ready. The archive is built on the fly, so it is never held whole on
+    disk or in memory. A manifest.json member at the end reports the outcome of
+    every file, so a file that fails to convert does not fail the batch.
+    
+    Args:
+        files: List of uploaded file objects
+        operation (str): The operation to perform on every file
+    
+    Returns:
+        tuple: (iterator of bytes, output_filename)
+    """
+    temp_dir = get_temp_dir()
+    request_id = uuid.uuid4().hex
+    # Cancelled when the stream is closed, so running conversions stop with it
+    abort = CancellationToken()
+    
+    # Save every upload before streaming starts; the request's files are closed after
+    inputs = []
+    try:
+        for i, uploaded_file in enumerate(files):
+            temp_path = os.path.join(temp_dir, f"batch_{request_id}_{i}_{uploaded_file.name}")
+            input_digest = save_uploaded_file(uploaded_file, temp_path)
+            inputs.append((uploaded_file.name, temp_path, input_digest))
+    except Exception:
+        _remove_temp_files([temp_path for _, temp_path, _ in inputs])
+        raise
+    
+    def convert_one(index):
+        name, temp_path, input_digest = inputs[index]
+        try:
+            output_path, output_filename = run_conversion(
+                operation, convert_file, temp_path, name, operation, input_digest, cancel=abort
+            )
+            return [(index, output_path, output_filename, None)]
+        except Exception as e:
+            return [(index, None, None, str(e))]
+    
+    def convert_office_group(indices):
+        converted = convert_office_batch_to_pdf([inputs[index][1] for index in indices], cancel=abort)
+        results = []
+        for index in indices:
+            name, temp_path, input_digest = inputs[index]
+            output_path, error = converted[temp_path]
+            if output_path is not None and cache is not None:
+                cache.put(cache.make_key(input_digest, operation), output_path)
+            results.append((index, output_path, f"{os.path.splitext(name)[0]}.pdf", error))
+        return results
+    
+    cache = get_result_cache()
+    
+    def stream():
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(settings.BATCH_CONVERSION_WORKERS, len(inputs))),
+            thread_name_prefix='batch-convert',
+        )
+        futures = []
+        ready = []
+        
+        # Uncached office documents are converted a group per soffice run
+        individual = list(range(len(inputs)))
+        if operation == 'convert_to_pdf' and get_soffice_path():
+            office_misses = []
+            for index, (name, temp_path, input_digest) in enumerate(inputs):
+                if get_file_extension(name) not in OFFICE_EXTENSIONS:
+                    continue
+                if cache is not None:
+                    output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+                    if cache.get(cache.make_key(input_digest, operation), output_path):
+                        ready.append((index, output_path, f"{os.path.splitext(name)[0]}.pdf", None))
+                        individual.remove(index)
+                        continue
+                office_misses.append(index)
+            
+            if len(office_misses) > 1:
+                group_size = settings.LIBREOFFICE_BATCH_SIZE
+                # Spread the files over as many runs as there are batch workers
+                group_size = min(group_size, -(-len(office_misses) // settings.BATCH_CONVERSION_WORKERS))
+                for start in range(0, len(office_misses), group_size):
+                    futures.append(executor.submit(convert_office_group, office_misses[start:start + group_size]))
+                individual = [index for index in individual if index not in office_misses]
+        
+        futures.extend(executor.submit(convert_one, index) for index in individual)
+        
+        def completed_results():
+            # Cache hits first, then results in completion order, so the first bytes are sent early
+            yield ready
+            for future in as_completed(futures):
+                yield future.result()
+        
+        writer = ZipStreamWriter()
+        manifest_name = writer.unique_name('manifest.json')
+        manifest = [None] * len(inputs)
+        try:
+            for results in completed_results():
+                for index, output_path, output_filename, error in results:
+                    name = inputs[index][0]
+                    if error is not None:
+                        logger.error(f"Batch conversion of {name} failed: {error}")
+                        manifest[index] = {'input': name, 'status': 'failed', 'error': error}
+                        continue
+                    
+                    try:
+                        arcname = writer.unique_name(output_filename)
+                        manifest[index] = {
+                            'input': name, 'status': 'completed',
+                            'output': arcname, 'size': os.path.getsize(output_path),
+                        }
+                        yield from writer.write_file(output_path, arcname)
+                    finally:
+                        _remove_temp_files([output_path])
+            
+            manifest_data = json.dumps({'operation': operation, 'files': manifest}, indent=2)
+            yield from writer.write_bytes(manifest_data.encode('utf-8'), manifest_name)
+            yield from writer.close()
+        finally:
+            # Also runs when the client disconnects: skip queued work and stop running work
+            abort.cancel('Client disconnected')
+            executor.shutdown(wait=True, cancel_futures=True)
+            leftovers = [output_path for _, output_path, _, _ in ready]
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    leftovers.extend(output_path for _, output_path, _, _ in future.result() if output_path)
+            _remove_temp_files(leftovers)
+            _remove_temp_files([temp_path for _, temp_path, _ in inputs])
+    
+    return stream(), f"batch_{operation}.zip"
+
+def _remove_temp_files(file_paths):
+    """Remove temp files, logging instead of raising on failure"""
+    for file_path in file_paths:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except Exception as e:
+            logger.error(f"Error cleaning up temp file: {str(e)}")
+
+def _file_type_label(file_names):
+    """The common extension of some files, or 'mixed'"""
+    extensions = {get_file_extension(file_name) for file_name in file_names}
+    return extensions.pop() if len(extensions) == 1 else 'mixed'
+
 # Function to process multiple images to PDF without database dependency
-def process_images_to_pdf_without_db(files, output_filename):
+def process_images_to_pdf_without_db(files, output_filename, cancel=None):
     """
     Process multiple images to create a PDF without requiring database access
     
     Args:
         files: List of uploaded file objects
         output_filename: Name for the output file
+        cancel (CancellationToken, optional): Stops the conversion, e.g. when the client goes away
     
     Returns:
         tuple: (output_path, output_filename)
@@ -719,25 +1613,24 @@ def process_images_to_pdf_without_db(files, output_filename):
     try:
         # Create temp directory if it doesn't exist
         temp_dir = get_temp_dir()
-        timestamp = int(time.time())
+        request_id = uuid.uuid4().hex
+        
+        annotate(operation='merge_images_to_pdf', file_type=_file_type_label(file.name for file in files))
         
         # Save uploaded files to temp location
         file_paths = []
-        for i, file in enumerate(files):
-            temp_path = os.path.join(temp_dir, f"img_{timestamp}_{i}_{file.name}")
-            
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            
-            # Save the uploaded file
-            with open(temp_path, 'wb+') as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
-            
-            file_paths.append(temp_path)
+        with span('save'):
+            for i, file in enumerate(files):
+                temp_path = os.path.join(temp_dir, f"img_{request_id}_{i}_{file.name}")
+                
+                # Save the uploaded file
+                save_uploaded_file(file, temp_path)
+                
+                file_paths.append(temp_path)
         
         # Merge images to PDF
-        output_path = merge_images_to_pdf(file_paths)
+        with span('merge'):
+            output_path = run_conversion('merge_images_to_pdf', merge_images_to_pdf, file_paths, cancel=cancel)
         final_output_filename = f"{output_filename}.pdf"
         
         return output_path, final_output_filename
@@ -755,7 +1648,7 @@ def process_images_to_pdf_without_db(files, output_filename):
                 logger.error(f"Error cleaning up temp file {path}: {str(e)}")
 
 # Function to merge files without database dependency
-def merge_files_without_db(files, output_filename, file_type):
+def merge_files_without_db(files, output_filename, file_type, mixed=False, cancel=None):
     """
     Merge multiple files without requiring database access
     
@@ -763,6 +1656,8 @@ def merge_files_without_db(files, output_filename, file_type):
         files: List of uploaded file objects
         output_filename: Name for the output file
         file_type: Type of files being merged (pdf, docx, pptx)
+        mixed (bool): Files may be any convert_to_pdf input; they are merged into a PDF
+        cancel (CancellationToken, optional): Stops the merge, e.g. when the client goes away
     
     Returns:
         tuple: (output_path, output_filename)
@@ -770,26 +1665,27 @@ def merge_files_without_db(files, output_filename, file_type):
     try:
         # Create temp directory if it doesn't exist
         temp_dir = get_temp_dir()
-        timestamp = int(time.time())
+        request_id = uuid.uuid4().hex
+        
+        annotate(operation='merge_files', file_type='mixed' if mixed else file_type)
         
         # Save uploaded files to temp location
         file_paths = []
-        for i, file in enumerate(files):
-            temp_path = os.path.join(temp_dir, f"merge_{timestamp}_{i}_{file.name}")
-            
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            
-            # Save the uploaded file
-            with open(temp_path, 'wb+') as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
-            
-            file_paths.append(temp_path)
+        with span('save'):
+            for i, file in enumerate(files):
+                temp_path = os.path.join(temp_dir, f"merge_{request_id}_{i}_{file.name}")
+                
+                # Save the uploaded file
+                save_uploaded_file(file, temp_path)
+                
+                file_paths.append(temp_path)
         
         # Merge files
-        output_path = merge_files(file_paths, output_filename, file_type)
-        final_output_filename = f"{output_filename}.{file_type}"
+        with span('merge'):
+            output_path = run_conversion(
+                'merge_files', merge_files, file_paths, output_filename, file_type, mixed=mixed, cancel=cancel
+            )
+        final_output_filename = f"{output_filename}.{'pdf' if mixed else file_type}"
         
         return output_path, final_output_filename
         
@@ -803,4 +1699,100 @@ def merge_files_without_db(files, output_filename, file_type):
                 if os.path.exists(path):
                     os.remove(path)
             except Exception as e:
-                logger.error(f"Error cleaning up temp file {path}: {str(e)}") 
\ No newline at end of file
+                logger.error(f"Error cleaning up temp file {path}: {str(e)}") 
+
+# Async versions of the functions above, for the async (ASGI) views.
+# Uploads are saved and cleaned up in worker threads and the conversion is
+# awaited on the event loop, so a waiting request holds no thread.
+
+def _save_uploads(files, prefix):
+    """Save uploaded files to unique temp paths, returning the paths"""
+    temp_dir = get_temp_dir()
+    request_id = uuid.uuid4().hex
+    file_paths = []
+    try:
+        for i, file in enumerate(files):
+            temp_path = os.path.join(temp_dir, f"{prefix}_{request_id}_{i}_{file.name}")
+            file_paths.append(temp_path)
+            save_uploaded_file(file, temp_path)
+    except Exception:
+        _remove_temp_files(file_paths)
+        raise
+    return file_paths
+
+async def process_file_without_db_async(uploaded_file, operation, cancel=None):
+    """
+    process_file_without_db() for async views
+
+    Returns:
+        tuple: (output_path, output_filename)
+    """
+    temp_dir = get_temp_dir()
+    temp_input_path = os.path.join(temp_dir, f"input_{uuid.uuid4().hex}_{uploaded_file.name}")
+    annotate(operation=operation, file_type=get_file_extension(uploaded_file.name))
+    try:
+        with span('save'):
+            input_digest = await asyncio.to_thread(save_uploaded_file, uploaded_file, temp_input_path)
+        
+        file_name = uploaded_file.name
+        
+        # A PDF needs no conversion: hand over the saved input itself
+        if operation == 'convert_to_pdf' and get_file_extension(file_name) == 'pdf':
+            output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+            os.replace(temp_input_path, output_path)
+            return output_path, file_name
+        
+        return await run_conversion_async(
+            operation, convert_file, temp_input_path, file_name, operation, input_digest, cancel=cancel
+        )
+    except Exception as e:
+        logger.error(f"Error processing file without DB: {str(e)}")
+        raise
+    finally:
+        await asyncio.to_thread(_remove_temp_files, [temp_input_path])
+
+async def process_images_to_pdf_without_db_async(files, output_filename, cancel=None):
+    """
+    process_images_to_pdf_without_db() for async views
+
+    Returns:
+        tuple: (output_path, output_filename)
+    """
+    annotate(operation='merge_images_to_pdf', file_type=_file_type_label(file.name for file in files))
+    file_paths = []
+    try:
+        with span('save'):
+            file_paths = await asyncio.to_thread(_save_uploads, files, 'img')
+        with span('merge'):
+            output_path = await run_conversion_async(
+                'merge_images_to_pdf', merge_images_to_pdf, file_paths, cancel=cancel
+            )
+        return output_path, f"{output_filename}.pdf"
+    except Exception as e:
+        logger.error(f"Error processing images to PDF without DB: {str(e)}")
+        raise
+    finally:
+        await asyncio.to_thread(_remove_temp_files, file_paths)
+
+async def merge_files_without_db_async(files, output_filename, file_type, mixed=False, cancel=None):
+    """
+    merge_files_without_db() for async views
+
+    Returns:
+        tuple: (output_path, output_filename)
+    """
+    annotate(operation='merge_files', file_type='mixed' if mixed else file_type)
+    file_paths = []
+    try:
+        with span('save'):
+            file_paths = await asyncio.to_thread(_save_uploads, files, 'merge')
+        with span('merge'):
+            output_path = await run_conversion_async(
+                'merge_files', merge_files, file_paths, output_filename, file_type, mixed=mixed, cancel=cancel
+            )
+        return output_path, f"{output_filename}.{'pdf' if mixed else file_type}"
+    except Exception as e:
+        logger.error(f"Error merging files without DB: {str(e)}")
+        raise
+    finally:
+        await asyncio.to_thread(_remove_temp_files, file_paths)
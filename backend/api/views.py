@@ -1,10 +1,14 @@
 import os
+import json
 import threading
 import logging
-from django.http import FileResponse
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import connection
@@ -12,20 +16,74 @@ from django.db import connection
 from .models import ProcessedFile, MergeJob, MergeFile
 from .serializers import (
     ProcessedFileSerializer, MergeJobSerializer,
-    FileUploadSerializer, MergeFilesSerializer
+    FileUploadSerializer, MergeFilesSerializer, BatchConvertSerializer,
+    PipelineSerializer
 )
 from .utils import (
     get_file_extension, convert_to_pdf, pdf_to_docx,
     pdf_to_txt, merge_files, clean_temp_files, 
     merge_images_to_pdf, pdf_to_pptx,
     process_file_without_db, process_images_to_pdf_without_db,
-    merge_files_without_db
+    merge_files_without_db, stream_pdf_text_without_db,
+    stream_batch_conversion_without_db
 )
+from .admission import (
+    admit, admitted, release_on_close, estimate_cost, estimate_pipeline_cost, get_admission_status
+)
+from .cancellation import CancellationToken, OperationTimedOut, client_disconnect_poll
+from .capabilities import get_converter_capabilities
+from .delivery import deliver_file, deliver_stored_file
+from .executor import ExecutorBusy, get_executor_status
+from .jobs import enqueue_processed_file, enqueue_merge_job, cancel_job, get_job_queue_status
+from .pipeline import run_pipeline, PipelineError
+from .progress import job_event_stream
+from .result_cache import get_result_cache
+from .soffice_pool import get_pool_status
+from .timing import get_timing_histograms
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
+def stream_text_response(uploaded_file):
+    """Stream the text of an uploaded PDF to the client page by page as it is extracted"""
+    ticket = admit('pdf_to_txt', [uploaded_file])
+    try:
+        stream, output_filename = stream_pdf_text_without_db(uploaded_file)
+    except BaseException:
+        if ticket is not None:
+            ticket.release()
+        raise
+    response = StreamingHttpResponse(stream, content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, output_filename)
+    return release_on_close(response, ticket)
+
+
+def client_cancel_token(request):
+    """Token that is cancelled if the client disconnects while its request is being processed"""
+    return CancellationToken(poll=client_disconnect_poll(request))
+
+
+def timed_out_response(view_name, error):
+    logger.error(f"{view_name}: {str(error)}")
+    return Response(
+        {'error': str(error)},
+        status=status.HTTP_504_GATEWAY_TIMEOUT
+    )
+
+
+def busy_response(view_name, error):
+    """503 (or 429 from admission control or a full job queue) with a Retry-After hint where there is one"""
+    logger.warning(f"{view_name}: {str(error)}")
+    response = Response(
+        {'error': str(error)},
+        status=error.status_code
+    )
+    if error.retry_after is not None:
+        response['Retry-After'] = str(error.retry_after)
+    return response
+
+
 class FileUploadView(APIView):
     """View for handling file uploads and conversions - Direct streaming version"""
     
@@ -44,40 +102,40 @@ class FileUploadView(APIView):
         logger.info(f"FileUploadView: Processing file '{uploaded_file.name}' with operation '{operation}'")
         
         try:
+            # Queue the conversion and return the job for polling
+            if serializer.validated_data['mode'] == 'async':
+                job = enqueue_processed_file(uploaded_file, operation)
+                return Response(
+                    ProcessedFileSerializer(job, context={'request': request}).data,
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
+            if operation == 'pdf_to_txt' and serializer.validated_data['stream']:
+                logger.info("FileUploadView: Streaming extracted text")
+                return stream_text_response(uploaded_file)
+            
             # Skip database completely and process the file directly
             logger.info("FileUploadView: Processing file without database")
-            output_path, output_filename = process_file_without_db(uploaded_file, operation)
+            with admitted(operation, [uploaded_file]):
+                output_path, output_filename = process_file_without_db(
+                    uploaded_file, operation, cancel=client_cancel_token(request)
+                )
             
             logger.info(f"FileUploadView: Processing complete, sending response with file: {output_filename}")
             
-            # Return the file directly as a streaming response
-            response = FileResponse(
-                open(output_path, 'rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=output_filename
-            )
-            
-            # Clean up after sending
-            response.close_callback = lambda: self._cleanup_file(output_path)
-            
-            return response
+            # Return the file; it is removed once it has been delivered
+            return deliver_file(output_path, output_filename, delete_after=True)
             
+        except OperationTimedOut as e:
+            return timed_out_response('FileUploadView', e)
+        except ExecutorBusy as e:
+            return busy_response('FileUploadView', e)
         except Exception as e:
             logger.error(f"FileUploadView: Error processing file - {str(e)}")
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _cleanup_file(self, file_path):
-        """Clean up the file after it's been sent"""
-        logger.debug(f"FileUploadView: Cleaning up temporary file {file_path}")
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.error(f"FileUploadView: Error cleaning up file {file_path} - {str(e)}")
 
 
 class FileProcessNoDBView(APIView):
@@ -96,41 +154,32 @@ class FileProcessNoDBView(APIView):
         operation = serializer.validated_data['operation']
         
         try:
+            if operation == 'pdf_to_txt' and serializer.validated_data['stream']:
+                logger.info("FileProcessNoDBView: Streaming extracted text")
+                return stream_text_response(uploaded_file)
+            
             # Process the file without database
             logger.info(f"FileProcessNoDBView: Processing file '{uploaded_file.name}' with operation '{operation}'")
-            output_path, output_filename = process_file_without_db(uploaded_file, operation)
+            with admitted(operation, [uploaded_file]):
+                output_path, output_filename = process_file_without_db(
+                    uploaded_file, operation, cancel=client_cancel_token(request)
+                )
             
             logger.info(f"FileProcessNoDBView: Processing complete, sending response with file: {output_filename}")
             
-            # Return the file directly
-            response = FileResponse(
-                open(output_path, 'rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=output_filename
-            )
-            
-            # Clean up after sending
-            response.close_callback = lambda: self._cleanup_file(output_path)
-            
-            return response
+            # Return the file; it is removed once it has been delivered
+            return deliver_file(output_path, output_filename, delete_after=True)
             
+        except OperationTimedOut as e:
+            return timed_out_response('FileProcessNoDBView', e)
+        except ExecutorBusy as e:
+            return busy_response('FileProcessNoDBView', e)
         except Exception as e:
             logger.error(f"FileProcessNoDBView: Error processing file - {str(e)}")
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _cleanup_file(self, file_path):
-        """Clean up the file after it's been sent"""
-        logger.debug(f"FileProcessNoDBView: Cleaning up temporary file {file_path}")
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.error(f"FileProcessNoDBView: Error cleaning up file {file_path} - {str(e)}")
-            pass
 
 
 class MergeFilesView(APIView):
@@ -158,9 +207,12 @@ class MergeFilesView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Mixed merges normalise every file to PDF, so the output is always a PDF
+        mixed = serializer.validated_data['mixed']
+        
         # Ensure all files are of the same type
         file_types = {get_file_extension(file.name) for file in files}
-        if len(file_types) > 1:
+        if len(file_types) > 1 and not mixed:
             logger.warning(f"MergeFilesView: Files of different types - {file_types}")
             return Response(
                 {'error': 'All files must be of the same type for merging'},
@@ -168,7 +220,7 @@ class MergeFilesView(APIView):
             )
         
         # Get file type from the first file
-        file_type = get_file_extension(files[0].name).lower()
+        file_type = 'pdf' if mixed else get_file_extension(files[0].name).lower()
         
         # Check if file type is supported
         if file_type not in ['pdf', 'docx', 'pptx']:
@@ -185,40 +237,36 @@ class MergeFilesView(APIView):
             output_filename = safe_output_filename
         
         try:
+            # Queue the merge and return the job for polling
+            if serializer.validated_data['mode'] == 'async':
+                job = enqueue_merge_job(files, output_filename, file_type)
+                return Response(
+                    MergeJobSerializer(job, context={'request': request}).data,
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
             # Process the merge without database
             logger.info("MergeFilesView: Merging files without database")
-            output_path, output_filename = merge_files_without_db(files, output_filename, file_type)
+            with admitted('merge_files', files):
+                output_path, output_filename = merge_files_without_db(
+                    files, output_filename, file_type, mixed=mixed, cancel=client_cancel_token(request)
+                )
             
             logger.info(f"MergeFilesView: Merge complete, sending response with file: {output_filename}")
             
-            # Return the file directly
-            response = FileResponse(
-                open(output_path, 'rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=output_filename
-            )
-            
-            # Clean up after sending
-            response.close_callback = lambda: self._cleanup_file(output_path)
-            
-            return response
+            # Return the file; it is removed once it has been delivered
+            return deliver_file(output_path, output_filename, delete_after=True)
             
+        except OperationTimedOut as e:
+            return timed_out_response('MergeFilesView', e)
+        except ExecutorBusy as e:
+            return busy_response('MergeFilesView', e)
         except Exception as e:
             logger.error(f"MergeFilesView: Error merging files - {str(e)}")
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _cleanup_file(self, file_path):
-        """Clean up the file after it's been sent"""
-        logger.debug(f"MergeFilesView: Cleaning up temporary file {file_path}")
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            logger.error(f"MergeFilesView: Error cleaning up file {file_path} - {str(e)}")
 
 
 class ImagesToPdfView(APIView):
@@ -256,39 +304,110 @@ class ImagesToPdfView(APIView):
         try:
             # Process images to PDF without database
             logger.info("ImagesToPdfView: Converting images to PDF without database")
-            output_path, output_filename = process_images_to_pdf_without_db(files, output_filename)
+            with admitted('merge_images_to_pdf', files):
+                output_path, output_filename = process_images_to_pdf_without_db(
+                    files, output_filename, cancel=client_cancel_token(request)
+                )
             
             logger.info(f"ImagesToPdfView: Conversion complete, sending response with file: {output_filename}")
             
-            # Return the file directly
-            response = FileResponse(
-                open(output_path, 'rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=output_filename
-            )
-            
-            # Clean up after sending
-            response.close_callback = lambda: self._cleanup_file(output_path)
-            
-            return response
+            # Return the file; it is removed once it has been delivered
+            return deliver_file(output_path, output_filename, delete_after=True)
             
+        except OperationTimedOut as e:
+            return timed_out_response('ImagesToPdfView', e)
+        except ExecutorBusy as e:
+            return busy_response('ImagesToPdfView', e)
         except Exception as e:
             logger.error(f"ImagesToPdfView: Error converting images to PDF - {str(e)}")
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class BatchConvertView(APIView):
+    """View for converting many files with one operation, streamed back as a ZIP"""
     
-    def _cleanup_file(self, file_path):
-        """Clean up the file after it's been sent"""
-        logger.debug(f"ImagesToPdfView: Cleaning up temporary file {file_path}")
+    def post(self, request):
+        logger.info("BatchConvertView: Received POST request")
+        
+        serializer = BatchConvertSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            logger.warning(f"BatchConvertView: Invalid data - {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        files = serializer.validated_data['files']
+        operation = serializer.validated_data['operation']
+        
+        logger.info(f"BatchConvertView: Converting {len(files)} files with operation '{operation}'")
+        
+        try:
+            # The files are converted while the archive streams, so the ticket is held until it is closed
+            ticket = admit(operation, files, cost=sum(estimate_cost(operation, [file]) for file in files))
+        except ExecutorBusy as e:
+            return busy_response('BatchConvertView', e)
+        
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Per-file errors are reported in the archive's manifest.json
+            stream, output_filename = stream_batch_conversion_without_db(files, operation)
         except Exception as e:
-            logger.error(f"ImagesToPdfView: Error cleaning up file {file_path} - {str(e)}")
-            pass
+            if ticket is not None:
+                ticket.release()
+            logger.error(f"BatchConvertView: Error preparing batch - {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        response = StreamingHttpResponse(stream, content_type='application/zip')
+        response['Content-Disposition'] = content_disposition_header(True, output_filename)
+        return release_on_close(response, ticket)
+
+
+class PipelineView(APIView):
+    """View for running a chain of operations on uploaded files in one request"""
+    
+    def post(self, request):
+        logger.info("PipelineView: Received POST request")
+        
+        serializer = PipelineSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            logger.warning(f"PipelineView: Invalid data - {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        files = serializer.validated_data['files']
+        pipeline = serializer.validated_data['pipeline']
+        
+        logger.info(f"PipelineView: Running {len(pipeline['steps'])} steps on {len(files)} files")
+        
+        try:
+            with admitted('pipeline', files, cost=estimate_pipeline_cost(pipeline, files)):
+                output_path, output_filename = run_pipeline(files, pipeline, cancel=client_cancel_token(request))
+            
+            logger.info(f"PipelineView: Pipeline complete, sending response with file: {output_filename}")
+            
+            # Return the file; it is removed once it has been delivered
+            return deliver_file(output_path, output_filename, delete_after=True)
+            
+        except PipelineError as e:
+            logger.error(f"PipelineView: Pipeline failed - {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        except OperationTimedOut as e:
+            return timed_out_response('PipelineView', e)
+        except ExecutorBusy as e:
+            return busy_response('PipelineView', e)
+        except Exception as e:
+            logger.error(f"PipelineView: Error running pipeline - {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
 
 class ProcessedFileViewSet(viewsets.ReadOnlyModelViewSet):
@@ -303,6 +422,61 @@ class MergeJobViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = MergeJobSerializer
 
 
+class JobCancelView(APIView):
+    """View for cancelling a pending or running async job"""
+    
+    def post(self, request, job_id):
+        for model, serializer_class in ((ProcessedFile, ProcessedFileSerializer), (MergeJob, MergeJobSerializer)):
+            job = model.objects.filter(id=job_id).first()
+            if job is not None:
+                break
+        else:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not cancel_job(job):
+            return Response(
+                {'error': f'Job is already {job.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        job.refresh_from_db()
+        return Response(serializer_class(job, context={'request': request}).data)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource requests (Accept: text/event-stream) through content negotiation"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8')
+
+
+class JobEventsView(APIView):
+    """Server-Sent Events stream of an async job's progress"""
+    
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    
+    def get(self, request, job_id):
+        model = next((m for m in (ProcessedFile, MergeJob) if m.objects.filter(id=job_id).exists()), None)
+        if model is None:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        download_url = request.build_absolute_uri(reverse('file-download', args=[job_id]))
+        response = StreamingHttpResponse(job_event_stream(model, job_id, download_url), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class FileDownloadView(APIView):
     """View for downloading processed files"""
     
@@ -323,14 +497,9 @@ class FileDownloadView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Return the file
-            return FileResponse(
-                processed_file.processed_file.open('rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=processed_file.processed_filename
-            )
-        except:
+            # Return the file (supports Range and conditional requests)
+            return deliver_stored_file(request, processed_file.processed_file.path, processed_file.processed_filename)
+        except Http404:
             # If not a processed file, try a merge job
             merge_job = get_object_or_404(MergeJob, id=file_id)
             
@@ -348,12 +517,7 @@ class FileDownloadView(APIView):
             
             # Return the file
             output_filename = f"{merge_job.output_filename}.{merge_job.file_type}"
-            return FileResponse(
-                merge_job.merged_file.open('rb'),
-                content_type='application/octet-stream',
-                as_attachment=True,
-                filename=output_filename
-            )
+            return deliver_stored_file(request, merge_job.merged_file.path, output_filename)
 
 
 class HealthCheckView(APIView):
@@ -383,4 +547,42 @@ class HealthCheckView(APIView):
             health_status["database_error"] = str(e)
             logger.error(f"HealthCheckView: Database connection failed - {str(e)}")
         
-        return Response(health_status) 
\ No newline at end of file
+        # Report the converters detected at startup
+        health_status["converters"] = get_converter_capabilities()
+        
+        # Report the LibreOffice pool of this worker process
+        health_status["libreoffice_pool"] = get_pool_status()
+        
+        # Report the conversion executor and per-operation limits of this worker process
+        health_status["conversion_executor"] = get_executor_status()
+        
+        # Report the host-wide admission budget
+        health_status["admission"] = get_admission_status()
+        
+        # Report the depth of the async job queue, which needs the database
+        if health_status["database"] == "up":
+            health_status["job_queue"] = get_job_queue_status()
+        
+        # Report conversion result cache counters
+        cache = get_result_cache()
+        health_status["result_cache"] = cache.stats() if cache is not None else {"enabled": False}
+        
+        return Response(health_status) 
+
+
+class TimingMetricsView(APIView):
+    """API endpoint for the per-stage timing histograms of this worker process"""
+    
+    def get(self, request, format=None):
+        """
+        Histograms of stage durations by operation and file type
+        
+        Counts are per worker process; each process only sees the requests it
+        served, and cumulative bucket counts can be summed across processes.
+        """
+        histograms = get_timing_histograms()
+        return Response({
+            'pid': os.getpid(),
+            'buckets': histograms.buckets,
+            'series': histograms.snapshot(),
+        })
@@ -0,0 +1,94 @@
+import io
+import os
+import time
+import zipfile
+
+# Output types that are already compressed and gain nothing from deflate
+STORED_EXTENSIONS = {'pdf', 'docx', 'pptx', 'xlsx', 'png', 'jpg', 'jpeg', 'zip'}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable file object that collects written bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStreamWriter:
+    """
+    Build a ZIP archive on the fly and hand it out in chunks.
+
+    The archive is written to an unseekable sink, so zipfile uses data
+    descriptors and never needs to go back and patch headers. Neither the
+    archive nor any member is ever held whole on disk or in memory.
+
+    Usage:
+        writer = ZipStreamWriter()
+        yield from writer.write_file(path, 'name.pdf')
+        yield from writer.write_bytes(data, 'manifest.json')
+        yield from writer.close()
+    """
+
+    def __init__(self, chunk_size=1024 * 1024):
+        self.chunk_size = chunk_size
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode='w')
+        self._names = set()
+
+    def unique_name(self, name):
+        """Return `name`, or 'stem (n).ext' if the archive already has that name"""
+        stem, ext = os.path.splitext(name)
+        candidate, counter = name, 1
+        while candidate in self._names:
+            candidate = f"{stem} ({counter}){ext}"
+            counter += 1
+        self._names.add(candidate)
+        return candidate
+
+    def _zip_info(self, arcname, size):
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        extension = os.path.splitext(arcname)[1].lstrip('.').lower()
+        info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        # Lets zipfile decide up front whether the member needs ZIP64 headers
+        info.file_size = size
+        return info
+
+    def write_file(self, path, arcname):
+        """Add a file to the archive, yielding archive bytes as they are produced"""
+        info = self._zip_info(arcname, os.path.getsize(path))
+        with open(path, 'rb') as source, self._zip.open(info, mode='w') as member:
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    break
+                member.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def write_bytes(self, data, arcname):
+        """Add an in-memory member (e.g. a manifest) to the archive"""
+        info = self._zip_info(arcname, len(data))
+        with self._zip.open(info, mode='w') as member:
+            member.write(data)
+        yield self._sink.drain()
+
+    def close(self):
+        """Finish the archive, yielding the central directory"""
+        self._zip.close()
+        yield self._sink.drain()
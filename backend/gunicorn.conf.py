@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for the backend, read from the working directory by default.
+
+Command-line options (as in the Dockerfile) still take precedence.
+"""
+
+
+def post_worker_init(worker):
+    """
+    Start the job workers in each worker process once it has loaded the app
+
+    agam.wsgi leaves them to this hook under gunicorn: with --preload it is
+    imported by the master, whose threads would not survive the fork, and the
+    master would claim jobs itself.
+    """
+    from api.jobs import start_job_workers
+    start_job_workers()
@@ -33,8 +33,11 @@ export interface ProcessedFile {
   processed_filename: string | null;
   file_type: string;
   operation: string;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   error_message: string | null;
+  progress_stage: string;
+  progress_current: number;
+  progress_total: number;
   created_at: string;
   updated_at: string;
   file: string;
@@ -53,14 +56,32 @@ export interface MergeJob {
   id: string;
   output_filename: string;
   file_type: string;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   error_message: string | null;
+  progress_stage: string;
+  progress_current: number;
+  progress_total: number;
   created_at: string;
   updated_at: string;
   merged_file: string | null;
   files: MergeFile[];
 }
 
+// Progress of an async job, as sent by the job events stream
+export interface JobProgress {
+  id: string;
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
+  stage: string;
+  current: number;
+  total: number;
+}
+
+export interface JobEventHandlers {
+  onProgress?: (progress: JobProgress) => void;
+  onCompleted?: (downloadUrl: string) => void;
+  onFailed?: (error: string) => void;
+}
+
 // File upload and conversion functions
 export const uploadFile = async (file: File, operation: string): Promise<ProcessedFile> => {
   const formData = new FormData();
@@ -164,6 +185,80 @@ export const imagesToPdf = async (files: File[], outputFilename: string): Promis
   }
 };
 
+// Queue a conversion and return the job right away; follow it with waitForJob
+export const uploadFileAsync = async (file: File, operation: string): Promise<ProcessedFile> => {
+  const formData = new FormData();
+  formData.append('file', file);
+  formData.append('operation', operation);
+  formData.append('mode', 'async');
+
+  const response = await apiClient.post<ProcessedFile>('/upload/', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data;
+};
+
+// Queue a merge and return the job right away; follow it with waitForJob
+export const mergeFilesAsync = async (files: File[], outputFilename: string): Promise<MergeJob> => {
+  const formData = new FormData();
+  
+  files.forEach(file => {
+    formData.append('files', file);
+  });
+  
+  formData.append('output_filename', outputFilename);
+  formData.append('mode', 'async');
+
+  const response = await apiClient.post<MergeJob>('/merge/', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data;
+};
+
+// Follow an async job over Server-Sent Events; returns a function that stops listening.
+// The server ends each stream after a while and EventSource reconnects on its own,
+// so there is no request timeout however long the job runs.
+export const subscribeToJob = (jobId: string, handlers: JobEventHandlers): (() => void) => {
+  const source = new EventSource(`${apiBaseUrl}/jobs/${jobId}/events/`);
+
+  source.addEventListener('progress', event => {
+    handlers.onProgress?.(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('completed', event => {
+    source.close();
+    handlers.onCompleted?.(JSON.parse((event as MessageEvent).data).download_url);
+  });
+  ['failed', 'cancelled'].forEach(eventName => {
+    source.addEventListener(eventName, event => {
+      source.close();
+      handlers.onFailed?.(JSON.parse((event as MessageEvent).data).error || `Job ${eventName}`);
+    });
+  });
+
+  return () => source.close();
+};
+
+// Wait for an async job to finish, reporting progress; resolves with the download URL
+export const waitForJob = (jobId: string, onProgress?: (progress: JobProgress) => void): Promise<string> => {
+  return new Promise((resolve, reject) => {
+    subscribeToJob(jobId, {
+      onProgress,
+      onCompleted: resolve,
+      onFailed: error => reject(new Error(error)),
+    });
+  });
+};
+
+// Cancel a pending or running async job
+export const cancelJob = async (jobId: string): Promise<ProcessedFile | MergeJob> => {
+  const response = await apiClient.post<ProcessedFile | MergeJob>(`/jobs/${jobId}/cancel/`);
+  return response.data;
+};
+
 // File status check functions
 export const checkProcessedFileStatus = async (fileId: string): Promise<ProcessedFile> => {
   const response = await apiClient.get<ProcessedFile>(`/processed-files/${fileId}/`);